@@ -1,7 +1,6 @@
 """
 Simple 2d world where the player can interact with the items in the world.
 """
-from PIL.Image import FLIP_LEFT_RIGHT
 
 __author__ = "Sajjad Brohi"
 __date__ = "21-Oct-2019"
@@ -9,30 +8,57 @@ __version__ = "1.1.0"
 __copyright__ = "The University of Queensland, 2019"
 
 import math
+import random
+import time
 import tkinter as tk
 from tkinter.filedialog import askopenfilename
 
-from typing import Tuple, List
+from typing import Tuple, List, Iterable, Optional, Dict
 
 import pymunk
-import operator
-from PIL import Image, ImageTk
 
+from game.animation import Animation, Animator
 from game.block import Block, MysteryBlock
+from game.clock import FixedStepClock
 from game.entity import Entity, BoundaryWall
 from game.mob import Mob, CloudMob, Fireball
 from game.item import DroppedItem, Coin
-from game.view import GameView, ViewRenderer
-from game.world import World
-
-from level import load_world, WorldBuilder
+from game.profiler import Profiler
+from game.view import GameView, ViewRenderer, singledispatchmethod
+from game.watcher import FileWatcher
+from game.world import World, STEP_SIZE
+
+from config import Config, ConfigError, load_config, END
+from leaderboard import Leaderboard, open_scores, DEFAULT_DATABASE
+from level import load_world, load_chunked_world, WorldBuilder, LevelPrefetcher, LevelTemplates, ReloadableLevel
 from player import Player
+from replay import ReplayRecorder, RESTART_LEVEL, NEXT_LEVEL, LOAD_LEVEL
+from sprites import SpriteAtlas
 
 from game.util import get_collision_direction
 
 BLOCK_SIZE = 2 ** 4
 MAX_WINDOW_SIZE = (1080, math.inf)
 
+# Milliseconds between display frames
+FRAME_INTERVAL = 16
+
+# Frames between updates of the profiling overlay
+PROFILE_OVERLAY_FRAMES = 30
+# Seconds between writes of the profiling output file
+PROFILE_OUTPUT_INTERVAL = 5
+
+# Pixels either side of the player within which mobs and items are simulated
+# A full window width, so that things just off screen keep moving
+ACTIVATION_RANGE = MAX_WINDOW_SIZE[0]
+# Pixels either side of the player within which the chunks of chunked levels are built
+CHUNK_LOAD_DISTANCE = ACTIVATION_RANGE
+
+# Seconds before the high scores shown are read again, to include those of other stations
+LEADERBOARD_MAX_AGE = 10
+# Seconds to wait for high scores to be read or saved, when the game is not running
+LEADERBOARD_WAIT = 1
+
 GOAL_SIZES = {
     "flag": (0.2, 9),
     "tunnel": (2, 2)
@@ -55,11 +81,53 @@ ITEMS = {
     '*': 'star'
 }
 
+# Plain blocks which are merged into larger shapes for collisions when a level is built
+MERGED_BLOCKS = ('brick_base', 'cube')
+
 MOBS = {
     '&': "cloud",
     '@': "mushroom",
 }
 
+# The sprites each kind of entity can be drawn with besides its image, by entity id
+# Mystery blocks drop coins and clouds drop fireballs, so they need those sprites too
+ENTITY_SPRITES = {
+    "player": ("mario_right", "mario_left", "luigi_right", "luigi_left",
+               "character/jumping1", "character/jumping2",
+               *(f"character/{name}{number}" for name in ("running", "back_running") for number in range(1, 7))),
+    "mystery": ("coin", "coin_used", "coin_item", *(f"coin/coin{number}" for number in range(1, 5))),
+    "coin": tuple(f"coin/coin{number}" for number in range(1, 5)),
+    "mushroom": ("mushroom_mob/walking1", "mushroom_mob/walking2"),
+    "cloud": ("floaty", "fireball_down"),
+}
+
+
+def player_animations(running: range, jumping: str, still: str) -> Dict[str, Animation]:
+    """Describe the animations of a player character.
+
+    Parameters:
+        running (range): The numbers of the character's running frames.
+        jumping (str): The character's jumping frame.
+        still (str): The prefix of the character's images when standing still.
+
+    Returns:
+        (dict<str: Animation>): The animations, by how the character is moving.
+    """
+    return {
+        "running": Animation(tuple(f"character/running{number}" for number in running), 0.16),
+        "back_running": Animation(tuple(f"character/back_running{number}" for number in running), 0.16),
+        "jumping": Animation((jumping,)),
+        "still_right": Animation((f"{still}_right",)),
+        "still_left": Animation((f"{still}_left",)),
+    }
+
+
+# Mario runs in frames 1-3 of the sprite sheet and Luigi in frames 4-6
+MARIO_ANIMATIONS = player_animations(range(1, 4), "character/jumping1", "mario")
+LUIGI_ANIMATIONS = player_animations(range(4, 7), "character/jumping2", "luigi")
+COIN_ANIMATION = Animation(tuple(f"coin/coin{number}" for number in range(1, 5)), 0.4)
+MUSHROOM_ANIMATION = Animation(("mushroom_mob/walking1", "mushroom_mob/walking2"), 0.16)
+
 
 def create_block(world: World, block_id: str, x: int, y: int, *args):
     """Create a new block instance and add it to the world based on the block_id.
@@ -87,6 +155,7 @@ def create_block(world: World, block_id: str, x: int, y: int, *args):
         block = Block(block_id)
 
     world.add_block(block, x * BLOCK_SIZE, y * BLOCK_SIZE)
+    return block
 
 
 def create_item(world: World, item_id: str, x: int, y: int, *args):
@@ -107,6 +176,7 @@ def create_item(world: World, item_id: str, x: int, y: int, *args):
         item = DroppedItem(item_id)
 
     world.add_item(item, x * BLOCK_SIZE, y * BLOCK_SIZE)
+    return item
 
 
 def create_mob(world: World, mob_id: str, x: int, y: int, *args):
@@ -129,12 +199,29 @@ def create_mob(world: World, mob_id: str, x: int, y: int, *args):
         mob = Mob(mob_id, size=(1, 1))
 
     world.add_mob(mob, x * BLOCK_SIZE, y * BLOCK_SIZE)
+    return mob
 
 
 def create_unknown(world: World, entity_id: str, x: int, y: int, *args):
     """Create an unknown entity."""
-    world.add_thing(Entity(), x * BLOCK_SIZE, y * BLOCK_SIZE,
+    entity = Entity()
+    world.add_thing(entity, x * BLOCK_SIZE, y * BLOCK_SIZE,
                     size=(BLOCK_SIZE, BLOCK_SIZE))
+    return entity
+
+
+def create_world_builder(gravity: Tuple[int, int] = (0, 300)) -> WorldBuilder:
+    """Create a world builder for the blocks, items and mobs of a level.
+
+    Parameters:
+        gravity (tuple<int, int>): The gravity of the built worlds.
+    """
+    world_builder = WorldBuilder(BLOCK_SIZE, gravity=gravity, fallback=create_unknown)
+    world_builder.register_builders(BLOCKS.keys(), create_block)
+    world_builder.register_builders(ITEMS.keys(), create_item)
+    world_builder.register_builders(MOBS.keys(), create_mob)
+    world_builder.set_merged_blocks(MERGED_BLOCKS)
+    return world_builder
 
 
 BLOCK_IMAGES = {
@@ -165,227 +252,108 @@ class MarioViewRenderer(ViewRenderer):
     def __init__(self, block_images, item_images, mob_images):
         """Constructor"""
         super().__init__(block_images, item_images, mob_images)
-        self._load_sprite_sheet = SpriteSheetLoader()
-        self._timer = 1
-        self._cycle = 1
-        self._timer2 = 1
-        self._cycle2 = 1
-        self._timer3 = 1
-        self._cycle3 = 1
-        self._sprite_images = self._load_sprite_sheet.images_dic()
-
-    @ViewRenderer.draw.register(Player)
-    def _draw_player(self, instance: Player, shape: pymunk.Shape,
-                     view: tk.Canvas, offset: Tuple[int, int]) -> List[int]:
-        """Draws the player onto the canvas"""
-
-        # Checks if the player is jumping and then loads image
-        if shape.body.velocity.y < -10 or shape.body.velocity.y > 10:
-            if instance.get_name() == 'Mario':
-                image = self._sprite_images['character']["jumping1"]
-            else:
-                image = self._sprite_images['character']["jumping2"]
-
-        # Checks if the player is running right and then loads image
-        elif shape.body.velocity.x >= 10:
-            if instance.get_name() == 'Mario':
-                self._timer += 1
-                if self._timer > 10:
-                    self._cycle += 1
-                    self._timer = 1
-                if self._cycle > 3:
-                    self._cycle = 1
-                image = self._sprite_images['character'][f"running{self._cycle}"]
+        self._sprites = SpriteAtlas()
+        self._animator = Animator(self.get_animation)
+
+    def load_image(self, file: str) -> tk.PhotoImage:
+        """Load an image from the sprite atlas, or from the images directory if the
+        atlas has no sprite of that name, see SpriteAtlas"""
+        if self._sprites.has_sprite(file):
+            return self._sprites.get_sprite(file)
+        return super().load_image(file)
+
+    def preload(self, things: Iterable[Entity]):
+        """Converts the sprites the given things can be drawn with ahead of drawing them,
+        so that the first frames they appear in are not slowed down"""
+        names = {}
+        for entity_id in {thing.get_id() for thing in things}:
+            for images in (BLOCK_IMAGES, ITEM_IMAGES, MOB_IMAGES):
+                if entity_id in images:
+                    names[images[entity_id]] = None
+            names.update(dict.fromkeys(ENTITY_SPRITES.get(entity_id, ())))
+
+        self._sprites.preload(names)
+
+    @singledispatchmethod
+    def get_animation(self, instance: Entity) -> Optional[Animation]:
+        """Selects the animation the given entity is currently playing, if it is animated
+
+        Like get_image, this is overloaded by different entity types.
 
-            else:
-                self._timer += 1
-                if self._timer > 10:
-                    self._cycle += 1
-                    self._timer = 1
-                self._cycle = 4
-                if self._cycle > 6:
-                    self._cycle = 4
-                image = self._sprite_images['character'][f"running{self._cycle}"]
-
-        # Checks if the player is running left and then loads image
-        elif shape.body.velocity.x <= -10:
-            if instance.get_name() == 'Mario':
-                self._timer += 1
-                if self._timer > 10:
-                    self._cycle += 1
-                    self._timer = 1
-                if self._cycle > 3:
-                    self._cycle = 1
-                image = self._sprite_images['character'][f"back_running{self._cycle}"]
+        Parameters:
+            instance (Entity): The entity to animate
 
-            else:
-                self._timer += 1
-                if self._timer > 10:
-                    self._cycle += 1
-                    self._timer = 1
-                self._cycle = 4
-                if self._cycle > 6:
-                    self._cycle = 4
-                image = self._sprite_images['character'][f"back_running{self._cycle}"]
-
-        # Checks if the player is staying still and then loads image
-        else:
-            if shape.body.velocity.x >= 0:
-                if instance.get_name() == 'Mario':
-                    image = self.load_image("mario_right")
-                else:
-                    image = self.load_image("luigi_right")
-            else:
-                if instance.get_name() == 'Mario':
-                    image = self.load_image("mario_left")
-                else:
-                    image = self.load_image("luigi_left")
-
-        return [view.create_image(shape.bb.center().x + offset[0], shape.bb.center().y,
-                                  image=image, tags="player")]
-
-    @ViewRenderer.draw.register(MysteryBlock)
-    def _draw_mystery_block(self, instance: MysteryBlock, shape: pymunk.Shape,
-                            view: tk.Canvas, offset: Tuple[int, int]) -> List[int]:
-        """Draws the mystery block on canvas"""
+        Returns:
+            (Animation): The animation to play, or None if the entity is not animated
+        """
+        return None
+
+    @get_animation.register(Player)
+    def _get_player_animation(self, instance: Player) -> Animation:
+        """Selects the animation of the player from how they are moving"""
+        animations = MARIO_ANIMATIONS if instance.get_name() == 'Mario' else LUIGI_ANIMATIONS
+        vx, vy = instance.get_velocity()
+
+        if vy < -10 or vy > 10:
+            return animations["jumping"]
+        elif vx >= 10:
+            return animations["running"]
+        elif vx <= -10:
+            return animations["back_running"]
+        elif vx >= 0:
+            return animations["still_right"]
+        return animations["still_left"]
+
+    @get_animation.register(Coin)
+    def _get_coin_animation(self, instance: Coin) -> Animation:
+        """Selects the animation of the coin"""
+        return COIN_ANIMATION
+
+    @get_animation.register(Mob)
+    def _get_mob_animation(self, instance: Mob) -> Optional[Animation]:
+        """Selects the animation of the mobs"""
+        if instance.get_id() == 'mushroom':
+            return MUSHROOM_ANIMATION
+        return None
+
+    def step_animations(self, time_delta: float, things: Iterable[Entity]):
+        """Advances the animations of the things stepped by the world, see Animator.step"""
+        self._animator.step(time_delta, things)
+
+    def _get_frame(self, instance: Entity) -> str:
+        """(str) Returns the name of the frame an animated entity is showing, or the first
+        frame of its animation if it has not been animated yet"""
+        frame = self._animator.get_frame(instance)
+        if frame is None:
+            frame = self.get_animation(instance).frames[0]
+        return frame
+
+    @ViewRenderer.get_image.register(Player)
+    def _get_player_image(self, instance: Player, shape: pymunk.Shape) -> tk.PhotoImage:
+        """Selects the image of the player"""
+        return self.load_image(self._get_frame(instance))
+
+    @ViewRenderer.get_image.register(MysteryBlock)
+    def _get_mystery_block_image(self, instance: MysteryBlock, shape: pymunk.Shape) -> tk.PhotoImage:
+        """Selects the image of the mystery block"""
         if instance.is_active():
-            image = self.load_image("coin")
-        else:
-            image = self.load_image("coin_used")
-
-        return [view.create_image(shape.bb.center().x + offset[0], shape.bb.center().y,
-                                  image=image, tags="block")]
-
-    @ViewRenderer.draw.register(Coin)
-    def _draw_coin_block(self, instance: Coin, shape: pymunk.Shape,
-                         view: tk.Canvas, offset: Tuple[int, int]) -> List[int]:
-        """Draws the coin block on the canvas"""
-        self._timer2 += 1
-        if self._timer2 > 25:
-            self._cycle2 += 1
-            self._timer2 = 1
-        if self._cycle2 > 4:
-            self._cycle2 = 1
-        image = self._sprite_images['coin'][f"coin{self._cycle2}"]
-
-        return [view.create_image(shape.bb.center().x + offset[0], shape.bb.center().y,
-                                  image=image, tags="block")]
-
-    @ViewRenderer.draw.register(Mob)
-    def _draw_mob(self, instance: Mob, shape: pymunk.Shape,
-                  view: tk.Canvas, offset: Tuple[int, int]) -> List[int]:
-        """Draws the mobs on the canvas"""
+            return self.load_image("coin")
+        return self.load_image("coin_used")
+
+    @ViewRenderer.get_image.register(Coin)
+    def _get_coin_image(self, instance: Coin, shape: pymunk.Shape) -> tk.PhotoImage:
+        """Selects the image of the coin"""
+        return self.load_image(self._get_frame(instance))
+
+    @ViewRenderer.get_image.register(Mob)
+    def _get_mob_image(self, instance: Mob, shape: pymunk.Shape) -> tk.PhotoImage:
+        """Selects the image of the mobs"""
         image = self.load_image("fireball_down")
         if instance.get_id() == 'mushroom':
-            self._timer3 += 1
-            if self._timer3 > 10:
-                self._cycle3 += 1
-                self._timer3 = 1
-            if self._cycle3 > 2:
-                self._cycle3 = 1
-            image = self._sprite_images['mushroom_mob'][f"walking{self._cycle3}"]
+            image = self.load_image(self._get_frame(instance))
         elif instance.get_id() == 'cloud':
             image = self.load_image("floaty")
-        return [view.create_image(shape.bb.center().x + offset[0], shape.bb.center().y,
-                                  image=image, tags="block")]
-
-
-class SpriteSheetLoader(object):
-    """Loads up the spritesheet into a dictionary"""
-
-    def __init__(self):
-        """Constructor"""
-        self._character_images = {}
-        self._coin_images = {}
-        self._mob_images = {}
-        self._images = {}
-        self.character_images()
-        self.coin_images()
-        self.mob_images()
-        self._images_dic = self._images
-
-    def character_images(self):
-        """Converts the character images from the spritesheet"""
-
-        sheet = Image.open("spritesheets/characters.png")
-        count = 1
-        x = 80
-        y = 34
-        # Converts forward running pictures
-        while count < 7:
-            if count == 4:
-                x = 80
-                y = 99
-            x += 17
-            cropped_sheet = sheet.crop((x, y, x + 15, y + 15))
-            converted_image = ImageTk.PhotoImage(cropped_sheet)
-            self._character_images[f'running{count}'] = converted_image
-            count += 1
-
-        count = 1
-        x = 80
-        y = 34
-        # Converts backward running pictures
-        while count < 7:
-            if count == 4:
-                x = 80
-                y = 99
-            x += 17
-            cropped_sheet = sheet.crop((x, y, x + 15, y + 15))
-            cropped_sheet = cropped_sheet.transpose(method=FLIP_LEFT_RIGHT)
-            converted_image = ImageTk.PhotoImage(cropped_sheet)
-            self._character_images[f'back_running{count}'] = converted_image
-            count += 1
-
-        x = 148
-        y = 34
-        count = 1
-        # Converts jumping pictures
-        while count < 3:
-            x += 17
-            cropped_sheet = sheet.crop((x, y, x + 15, y + 15))
-            converted_image = ImageTk.PhotoImage(cropped_sheet)
-            self._character_images[f'jumping{count}'] = converted_image
-            x = 148
-            y = 99
-            count += 1
-
-        self._images['character'] = self._character_images
-
-    def coin_images(self):
-        """Converts coin images from spritesheet"""
-        sheet = Image.open("spritesheets/items.png")
-
-        count = 1
-        x = -15
-        y = 112
-        while count < 5:
-            x += 15
-            cropped_sheet = sheet.crop((x, y, x + 15, y + 15))
-            converted_image = ImageTk.PhotoImage(cropped_sheet)
-            self._character_images[f'coin{count}'] = converted_image
-            count += 1
-
-        self._images['coin'] = self._character_images
-
-    def mob_images(self):
-        """Converts mob images from spritesheet"""
-        sheet = Image.open("spritesheets/enemies.png")
-
-        count = 1
-        x = -15
-        y = 15
-        while count < 3:
-            x += 15
-            cropped_sheet = sheet.crop((x, y, x + 15, y + 15))
-            converted_image = ImageTk.PhotoImage(cropped_sheet)
-            self._mob_images[f'walking{count}'] = converted_image
-            count += 1
-
-        self._images['mushroom_mob'] = self._mob_images
-
-    def images_dic(self):
-        return self._images_dic
+        return image
 
 
 class StarItem(DroppedItem):
@@ -539,19 +507,10 @@ class PlayerName(object):
         self._button.pack()
 
     def save_name(self):
-        """Saves the file after receiving player name"""
-        high_scores = self._parent.get_high_scores()
-        current_score = self._parent.current_score()
-        self._parent.add_high_score(self._entry.get(), current_score)
-        current_level = self._parent.current_level()
-
-        # Write the score to the file
-        write_file = open(f'high_scores_{current_level}', 'w')
-        for i in high_scores:
-            write_file.write(f"{i}:{high_scores[i]}\n")
-        write_file.close()
-
-        self._parent.reset_world(self._parent.get_file()[f"=={self._parent.current_level()}=="]['goal'])
+        """Saves the player's score to the high scores after receiving their name"""
+        self._parent.add_high_score(self._entry.get(), self._parent.current_score())
+
+        self._parent.next_level()
         self.master.destroy()
 
 
@@ -562,22 +521,9 @@ class HighScore(object):
         """Constructor"""
         master_window = self.master = tk.Toplevel(master)
         self._parent = parent
-        high_scores = {}
-
-        # Converts high score from string to integer
-        for i in self._parent.get_high_scores():
-            high_scores[i] = int(self._parent.get_high_scores()[i])
-
-        # Orders the names by descending order
-        ordered_high_scores = dict(sorted(high_scores.items(), key=operator.itemgetter(1), reverse=True))
-        copy_high_scores = ordered_high_scores.copy()
 
-        # Pops out any name after index 9
-        for index, name in enumerate(copy_high_scores):
-            if index > 9:
-                ordered_high_scores.pop(name)
-
-        hs_items = ordered_high_scores.items()
+        # The top 10 scores, highest first
+        hs_items = self._parent.get_high_scores()
         self._level = tk.Label(master_window, text="\n".join("{!r}: {!r}".format(key, val) for key, val in hs_items))
         self._level.pack()
         self._button = tk.Button(master_window, text='Okay', command=self.resume_play)
@@ -604,8 +550,7 @@ class Popup(object):
 
     def load_level(self):
         """Loads level and destroys popup"""
-        self._parent.reset_world(self._entry.get())
-        self._parent.get_player().change_health(5)
+        self._parent.load_level(self._entry.get())
         self.master.destroy()
 
 
@@ -655,38 +600,24 @@ class MarioApp:
 
         self._master = master
         master.title("Mario")
-        self._file = file_data
+        master.protocol("WM_DELETE_WINDOW", self.exit)
+        self._setup_game(file_data)
 
-        # All the following if/else statements in this constructor check whether that particular property
-        # is given in the config file or not. If it isn't given then it proceeds with the default values
-        if 'gravity' in self._file:
-            down_gravity = int(self._file["gravity"])
-            world_builder = WorldBuilder(BLOCK_SIZE, gravity=(0, down_gravity), fallback=create_unknown)
-        else:
-            world_builder = WorldBuilder(BLOCK_SIZE, gravity=(0, 300), fallback=create_unknown)
+        # Records the game to the replay file given in the config
+        if self._config.world.record is not None:
+            self._recorder = ReplayRecorder(self._seed, self._config.to_dict(), self._current_level)
 
-        world_builder.register_builders(BLOCKS.keys(), create_block)
-        world_builder.register_builders(ITEMS.keys(), create_item)
-        world_builder.register_builders(MOBS.keys(), create_mob)
-        self._builder = world_builder
+        self._renderer = MarioViewRenderer(BLOCK_IMAGES, ITEM_IMAGES, MOB_IMAGES)
+        self._renderer.preload(self._world.get_all_things())
 
-        if 'health' in self._file:
-            self._max_health = int(self._file['health'])
-        else:
-            self._max_health = 5
+        # The levels the player can go to next are built in the background, so that
+        # going through a tunnel or reaching the flagpole does not freeze the game
+        self._prefetcher = LevelPrefetcher(lambda: create_world_builder(gravity=self._gravity))
+        self.prefetch_next_levels()
 
-        if 'character' in self._file and self._file['character'] == 'luigi':
-            self._player = Player(name='Luigi', max_health=self._max_health)
-        else:
-            self._player = Player(max_health=self._max_health)
-
-        if 'start' in self._file:
-            self._current_level = self._file['start']
-        else:
-            self._current_level = "level1.txt"
-        self._high_scores = {}
-        self.reset_world(self._current_level)
-        self._renderer = MarioViewRenderer(BLOCK_IMAGES, ITEM_IMAGES, MOB_IMAGES)
+        # Changes to the config and the current level file are applied while playing, see hot_reload
+        self._watcher = FileWatcher() if self._config.world.hot_reload else None
+        self.watch_files()
 
         # Menu-bar
         menubar = tk.Menu(master)
@@ -707,7 +638,7 @@ class MarioApp:
         self._map_size = size[0]
 
         # Canvas and binding Keys
-        self._view = GameView(master, size, self._renderer)
+        self._view = GameView(master, size, self._renderer, cull_margin=2 * BLOCK_SIZE)
         self._view.pack()
 
         self._view.focus_set()
@@ -721,6 +652,62 @@ class MarioApp:
         self._view.bind('<d>', self.bind)
         self._view.bind('<Right>', self.bind)
 
+        self._clock = FixedStepClock(STEP_SIZE)
+        self._frames = 0
+        self._last_profile_output = time.time()
+
+        # Wait for window to update before continuing
+        master.update_idletasks()
+        self.step()
+
+    def _setup_game(self, config, level=None, seed=None, templates=None):
+        """Set up the world builder, the player and the game state, then load the first level.
+
+        Parameters:
+            config (Config): The parsed config file, see config_file
+            level (str): The level file to start on, defaults to the start level of the config
+            seed (int): The seed for all randomness in the game, defaults to the seed
+                        of the config, or a random seed if it has none
+            templates (LevelTemplates): The templates to take the worlds of levels from,
+                                        rather than building them from their level files
+        """
+        self._config = config
+        self._templates = templates
+        world_config, player_config = config.world, config.player
+
+        if seed is None and world_config.seed is not None:
+            seed = world_config.seed
+        elif seed is None:
+            seed = random.randrange(2 ** 32)
+        self._seed = seed
+        self._random = random.Random(seed)
+        self._recorder = None
+
+        # Times each part of a frame when profiling is turned on in the config
+        self._profiler = Profiler(enabled=world_config.profile)
+
+        self._gravity = (0, world_config.gravity)
+        self._builder = create_world_builder(gravity=self._gravity)
+
+        self._max_health = player_config.health
+        # Read on every key press, so kept rather than looked up in the config
+        self._max_velocity = player_config.max_velocity
+
+        if player_config.character == 'luigi':
+            self._player = Player(name='Luigi', max_health=self._max_health)
+        else:
+            self._player = Player(max_health=self._max_health)
+
+        if level is not None:
+            self._current_level = level
+        else:
+            self._current_level = world_config.start
+        # High scores are saved and read on a background thread, which starts on first use
+        if world_config.leaderboard is not None:
+            self._scores = Leaderboard(open_scores(world_config.leaderboard), max_age=LEADERBOARD_MAX_AGE)
+        else:
+            self._scores = Leaderboard(open_scores(DEFAULT_DATABASE), max_age=LEADERBOARD_MAX_AGE)
+
         # Game status' and timer
         self._game_status = False
         self._tunnel_status = False
@@ -730,30 +717,23 @@ class MarioApp:
         self._block_position = None
         self._loop_check = True
         self._items_in_range = []
+        self._ticks = 0
+        self._level_chunks = None
+        # Created once there is a display to draw on, see __init__
+        self._renderer = None
+        self._prefetcher = None
+        self._watcher = None
+        self._level_reloader = None
 
-        # Wait for window to update before continuing
-        master.update_idletasks()
-        self.step()
+        self.reset_world(self._current_level)
 
-    def update_high_scores(self):
-        """Updates the highest score by reading from the level file"""
-        self._high_scores = {}
-        try:
-            read_file = open(f'high_scores_{self._current_level}', 'r')
-            for line in read_file:
-                line = line.strip()
-                name, score = line.split(':')
-                self._high_scores[name] = score
-        except FileNotFoundError:
-            print("No such file exists")
-
-    def get_high_scores(self):
-        """Retrieves the highest scores"""
-        return self._high_scores
+    def get_high_scores(self) -> List[Tuple[str, int]]:
+        """Retrieves the (name, score) of the highest scores of the current level, highest first"""
+        return self._scores.get_leaderboard(self._current_level, timeout=LEADERBOARD_WAIT)
 
     def add_high_score(self, name, score):
-        """Add's highest score to the current level"""
-        self._high_scores[name] = score
+        """Saves a score to the high scores of the current level, in the background"""
+        self._scores.add_score(self._current_level, name, score)
 
     def current_score(self):
         """Retrieves current score of the player"""
@@ -771,9 +751,9 @@ class MarioApp:
         """Retrieves the player instance"""
         return self._player
 
-    def get_file(self):
-        """Retrieves the config file"""
-        return self._file
+    def get_config(self) -> Config:
+        """Retrieves the parsed config file"""
+        return self._config
 
     def tunnel_status(self):
         """Checks if the player is colliding with the tunnel from above"""
@@ -799,10 +779,28 @@ class MarioApp:
         """Changes the level to the new level"""
         self._current_level = level
 
+    def get_ticks(self):
+        """Retrieves the number of time steps the game has advanced by"""
+        return self._ticks
+
+    def get_world(self):
+        """Retrieves the world of the current level"""
+        return self._world
+
+    def is_paused(self):
+        """Checks if the game is currently not advancing"""
+        return self._game_status
+
+    def is_game_lost(self):
+        """Checks if the player has lost all their health, while not invincible"""
+        return self._player.is_dead() and not self._player.get_invincible_value()
+
     def health(self):
         """Keeps track of the health of the player and updates status bar accordingly"""
         health = self._player.get_health() / self._player.get_max_health()
-        if not self._player.get_invincible_value():
+        if self._player.get_invincible_value():
+            self._status_display._bottom_frame.config(bg='yellow')
+        else:
             if health > 0.80:
                 self._status_display._bottom_frame.config(width=self._map_size, bg='green')
             elif 0.60 < health <= 0.80:
@@ -824,8 +822,15 @@ class MarioApp:
 
     def player_name(self):
         """Calls the class of PlayerName"""
+        # Read the high scores while the player enters their name
+        self._scores.prefetch(self._current_level)
         PlayerName(self._master, self)
 
+    def game_end(self):
+        """Calls GameEnd once the player has reached the last level"""
+        self._game_status = True
+        GameEnd(self._master, self)
+
     def game_lost_popup(self):
         """Calls GameLostPopup if the player loses all health"""
         if self._game_status:
@@ -843,39 +848,202 @@ class MarioApp:
         HighScore(self._master, self)
 
     def reset_level(self):
+        """Restarts the current level
+
+        The world is restored to the snapshot taken when the level started, rather than
+        built again from the level file, unless the level is built in chunks. The timers
+        of invincibility and switches are restored with it, but the player keeps their score.
+        """
+        if self._recorder is not None:
+            self._recorder.record_level(self._ticks, RESTART_LEVEL)
+
+        if self._level_start is None:
+            self._player.change_health(5)
+            self.reset_world(self._current_level)
+        else:
+            score = self._player.get_score()
+            self._world.restore(self._level_start)
+            self._player.change_score(score - self._player.get_score())
+            self._invincibility_time, self._ten_second_timer, self._switch_status = self._level_start_timers
+            self._player.change_health(5)
+            self._game_status = False
+
+    def next_level(self):
+        """Moves on to the goal of the current level"""
+        if self._recorder is not None:
+            self._recorder.record_level(self._ticks, NEXT_LEVEL)
+        self.reset_world(self._config.get_level(self._current_level).goal)
+
+    def load_level(self, level):
+        """Loads the given level"""
+        if self._recorder is not None:
+            self._recorder.record_level(self._ticks, LOAD_LEVEL, level)
+        self.reset_world(level)
         self._player.change_health(5)
-        self.reset_world(self._current_level)
 
     def exit(self):
         """Close the application."""
+        if self._recorder is not None:
+            self._recorder.save(self._config.world.record)
+        self._scores.close(LEADERBOARD_WAIT)
+        self._prefetcher.shutdown()
         self._master.destroy()
 
     def reset_world(self, new_level):
         """Recreates the world"""
-        if new_level == 'END':
-            self._game_status = True
-            GameEnd(self._master, self)
+        if new_level == END:
+            self.game_end()
         else:
             self._game_status = False
-            self._world = load_world(self._builder, new_level)
+
+            # Very long levels can be built a chunk of columns at a time, around the player
+            self._level_reloader = None
+            if self._config.world.chunk_width is not None:
+                self._level_chunks = load_chunked_world(self._builder, new_level, self._config.world.chunk_width,
+                                                        CHUNK_LOAD_DISTANCE)
+                self._world = self._level_chunks.get_world()
+            # Levels are built so that they can be updated in place when hot reloading
+            elif self._config.world.hot_reload:
+                self._level_chunks = None
+                self._level_reloader = ReloadableLevel(self._builder, new_level)
+                self._world = self._level_reloader.get_world()
+            else:
+                self._level_chunks = None
+                self._world = self._prefetcher.take(new_level) if self._prefetcher is not None else None
+                if self._world is None and self._templates is not None:
+                    self._world = self._templates.take(new_level)
+                if self._world is None:
+                    self._world = load_world(self._builder, new_level)
+            self._world.set_random(self._random)
+            self._world.set_profiler(self._profiler)
 
             # Recreates world based on whether coordinates and/or mass are given in the config file or not
-            if "x" in self._file and "y" in self._file:
-                self._world.add_player(self._player, int(self._file['x']), int(self._file['y']))
-            elif "mass" in self._file:
-                self._world.add_player(self._player, BLOCK_SIZE, BLOCK_SIZE, mass=int(self._file['mass']))
+            player_config = self._config.player
+            if player_config.x is not None and player_config.y is not None:
+                self._world.add_player(self._player, player_config.x, player_config.y)
+            elif player_config.mass is not None:
+                self._world.add_player(self._player, BLOCK_SIZE, BLOCK_SIZE, mass=player_config.mass)
             else:
                 self._world.add_player(self._player, BLOCK_SIZE, BLOCK_SIZE)
+            self._world.set_activation_range(ACTIVATION_RANGE)
+            if self._level_chunks is not None:
+                self._level_chunks.update(self._player.get_position()[0])
 
             self._builder.clear()
             self._setup_collision_handlers()
+
+            # Chunks are built and removed as the player moves, so chunked worlds are rebuilt instead
+            self._level_start = self._world.snapshot() if self._level_chunks is None else None
+            # The timers which run alongside the world, restored with it when the level restarts
+            self._level_start_timers = (self._invincibility_time, self._ten_second_timer, self._switch_status)
+
+            if self._renderer is not None:
+                self._renderer.preload(self._world.get_all_things())
             self.change_level(new_level)
-            self.update_high_scores()
+            self.prefetch_next_levels()
+            self.watch_files()
+
+    def get_next_levels(self, level: str) -> List[str]:
+        """Returns the levels which can be gone to from a level, through its tunnel or flagpole
+
+        Parameters:
+            level (str): The level file.
+
+        Returns:
+            (list<str>): The level files of the goal and then the tunnel, if the config names them.
+        """
+        level_config = self._config.get_level(level)
+        levels = (level_config.goal, level_config.tunnel)
+        return list(dict.fromkeys(level for level in levels if level is not None and level != END))
+
+    def prefetch_next_levels(self):
+        """Starts building the levels which can be gone to from the current level in the background
+
+        Chunked levels are built a chunk at a time as they are played instead. When hot
+        reloading, levels are not built ahead, as their files may change before they are played.
+        """
+        world_config = self._config.world
+        if self._prefetcher is not None and world_config.chunk_width is None and not world_config.hot_reload:
+            self._prefetcher.prefetch(self.get_next_levels(self._current_level))
+
+    def watch_files(self):
+        """Watches the config file and the current level file for changes, when hot reloading"""
+        if self._watcher is not None:
+            self._watcher.watch([filename for filename in (self._config.filename, self._current_level)
+                                 if filename is not None])
+
+    def hot_reload(self):
+        """Applies the changes made to the config file and the current level file since they
+        were last checked, without restarting the level"""
+        for filename in self._watcher.get_changed():
+            if filename == self._config.filename:
+                self.reload_config()
+            else:
+                self.reload_level()
+
+    def reload_level(self):
+        """Updates the world to match the current level file, keeping the player where they are
+
+        Only the cells of the level which changed are built again, see ReloadableLevel.
+        Levels which changed size, or are built in chunks, are built again in full.
+        """
+        if self._level_reloader is None or self._level_chunks is not None:
+            changed = None
+        else:
+            try:
+                changed = self._level_reloader.reload()
+            except (OSError, ValueError) as error:
+                print(f"Could not reload {self._current_level}: {error}")
+                return
+
+        if changed is None:
+            state = self._player.get_state()
+            try:
+                self.reset_world(self._current_level)
+            except (OSError, ValueError) as error:
+                print(f"Could not reload {self._current_level}: {error}")
+                return
+            self._player.set_state(state)
+        elif changed:
+            if self._renderer is not None:
+                self._renderer.preload(self._world.get_all_things())
+
+        # Restarting the level builds it again from the changed level file
+        self._level_start = None
+
+    def reload_config(self):
+        """Applies the config file again
+
+        The gravity, the player's maximum velocity and the goals and tunnels of levels
+        change immediately. Settings of how levels are built and where the player starts
+        apply from the next level, and the rest once the game is started again.
+        """
+        try:
+            config = load_config(self._config.filename)
+        except (OSError, ConfigError) as error:
+            print(f"Could not reload the config: {error}")
+            return
+
+        self._config = config
+        self._gravity = (0, config.world.gravity)
+        self._builder = create_world_builder(gravity=self._gravity)
+        self._world.set_gravity(*self._gravity)
+        self._max_velocity = config.player.max_velocity
 
     def bind(self, event):
         """Bind all the keyboard events to their event handlers."""
+        self.press(str(event.keysym))
+
+    def press(self, event):
+        """Handle a key being pressed.
+
+        Parameters:
+            event (str): The keysym of the pressed key, e.g. 'Left' or 'w'
+        """
+        if self._recorder is not None:
+            self._recorder.record_key(self._ticks, event)
+
         current_x, current_y = self._player.get_velocity()
-        event = str(event.keysym)
 
         if event == 'Up' or event == 'w' or event == 'space':
             self._jump()
@@ -888,10 +1056,12 @@ class MarioApp:
 
     def redraw(self):
         """Redraw all the entities in the game canvas."""
-        self._view.delete(tk.ALL)
-        self.health()
-        self.score()
-        self._view.draw_entities(self._world.get_all_things())
+        with self._profiler.section("status"):
+            self.health()
+            self.score()
+
+        with self._profiler.section("redraw"):
+            self._view.draw_entities(self._world.get_things_in_region(*self._view.get_viewport()))
 
     def scroll(self):
         """Scroll the view along with the player in the center unless
@@ -920,7 +1090,7 @@ class MarioApp:
             self._items_in_range = self._world.get_things_in_range(x, y, 50)
             for i in self._items_in_range:
                 if i.get_id() == 'brick' or i.get_id == 'switch':
-                    self._world.remove_block(i)
+                    self._hide_block(i)
             self._loop_check = False
 
     def switch(self):
@@ -930,15 +1100,28 @@ class MarioApp:
         if self._ten_second_timer > 450:
             for i in self._items_in_range:
                 if i.get_id() == 'brick' or i.get_id == 'switch':
-                    x, y = i.get_position()
-                    self._world.add_block(i, x, y)
+                    self._show_block(i)
             self._ten_second_timer = 0
             self.set_switch_status(False)
 
+    def _hide_block(self, block: Block):
+        """Removes a block hidden by the switch from the world until the switch wears off"""
+        if self._level_chunks is not None:
+            self._level_chunks.hide_block(block)
+        else:
+            self._world.remove_block(block)
+
+    def _show_block(self, block: Block):
+        """Adds a block hidden by the switch back to the world"""
+        if self._level_chunks is not None:
+            self._level_chunks.show_block(block)
+        else:
+            x, y = block.get_position()
+            self._world.add_block(block, x, y)
+
     def invincibility(self):
         """Called once the player is invincible"""
         self._invincibility_time += 1
-        self._status_display._bottom_frame.config(bg='yellow')
 
         # If the invincibility time expires then it resets everything that was changed
         if self._invincibility_time > self._player.get_invincibility_time():
@@ -947,29 +1130,69 @@ class MarioApp:
             current_health = self._player.get_health()
             change = old_health - current_health
             self._player.change_health(change)
-            self._status_display._bottom_frame.config(bg='green')
 
     def step(self):
-        """Step the world physics and redraw the canvas."""
-        data = (self._world, self._player)
+        """Step the world physics to catch up with wall-clock time and redraw the canvas once."""
+        profiler = self._profiler
+
+        if self._watcher is not None:
+            self.hot_reload()
+
+        with profiler.section("frame"):
+            if self._game_status:
+                self._clock.reset()
+            else:
+                for _ in range(self._clock.tick()):
+                    with profiler.section("tick"):
+                        self.tick()
+                    if self._game_status or self.is_game_lost():
+                        break
+
+                self._view.set_interpolation(self._clock.get_alpha(), STEP_SIZE)
+                with profiler.section("scroll"):
+                    self.scroll()
+                self.redraw()
+
+        if profiler.is_enabled():
+            self.report_profile()
+
+        self._master.after(FRAME_INTERVAL, self.step)
+
+    def report_profile(self):
+        """Shows the profiled frame times on the view and writes them to the config's profile output"""
+        self._frames += 1
+        if self._frames % PROFILE_OVERLAY_FRAMES == 0:
+            self._view.show_overlay([f"{'ms':<10} {'mean':>6} {'p95':>6} {'max':>6}"]
+                                    + self._profiler.format_stats())
+
+        now = time.time()
+        profile_output = self._config.world.profile_output
+        if profile_output is not None and now - self._last_profile_output >= PROFILE_OUTPUT_INTERVAL:
+            self._profiler.dump(profile_output)
+            self._last_profile_output = now
+
+    def tick(self):
+        """Advance the game by one fixed time step."""
         if self._player.get_invincible_value():
             self.invincibility()
 
         if self._switch_status:
             self.switch()
 
-        if self._game_status:
-            pass
-        else:
-            self._world.step(data)
-            self.scroll()
-            self.redraw()
+        if self._level_chunks is not None:
+            self._level_chunks.update(self._player.get_position()[0])
+
+        self._world.step((self._world, self._player))
+        if self._renderer is not None:
+            self._renderer.step_animations(STEP_SIZE, self._world.get_active_things())
+        self._ticks += 1
 
-        self._master.after(10, self.step)
+        if self._recorder is not None:
+            self._recorder.checkpoint(self._ticks, self._world, self._player)
 
     def _move(self, dx, dy):
         """Moves the player either left or right"""
-        max_velocity = int(self._file["max_velocity"])
+        max_velocity = self._max_velocity
         negative_max = -max_velocity
         if dx < 0:
             if dx > negative_max:
@@ -989,32 +1212,52 @@ class MarioApp:
     def _duck(self):
         """Goes through the tunnel if pressed on top of the tunnel"""
         if self._tunnel_status:
-            self.reset_world(self._file[f"=={self._current_level}=="]['tunnel'])
+            tunnel = self._config.get_level(self._current_level).tunnel
+            if tunnel is not None:
+                self.reset_world(tunnel)
             self._tunnel_status = False
 
     def _setup_collision_handlers(self):
         self._world.add_collision_handler("player", "item", on_begin=self._handle_player_collide_item)
         self._world.add_collision_handler("player", "block", on_begin=self._handle_player_collide_block,
                                           on_separate=self._handle_player_separate_block)
+        # Blocks which trigger changes to the game are given the app when hit
+        for block_id in ("flagpole", "tunnel"):
+            self._world.add_collision_handler("player", "block", id_b=block_id,
+                                              on_begin=self._handle_player_collide_trigger)
+        self._world.add_collision_handler("player", "block", id_b="switch",
+                                          on_begin=self._handle_player_collide_switch)
         self._world.add_collision_handler("player", "mob", on_begin=self._handle_player_collide_mob)
-        self._world.add_collision_handler("mob", "block", on_begin=self._handle_mob_collide_block)
+        self._world.add_collision_handler("mob", "block", id_a="fireball",
+                                          on_begin=self._handle_fireball_collide_block)
+        self._world.add_collision_handler("mob", "block", id_a="fireball", id_b="brick",
+                                          on_begin=self._handle_fireball_collide_brick)
+        self._world.add_collision_handler("mob", "block", id_a="mushroom",
+                                          on_begin=self._handle_mushroom_collide_block)
         self._world.add_collision_handler("mob", "mob", on_begin=self._handle_mob_collide_mob)
+        self._world.add_collision_handler("mob", "mob", id_a="fireball", on_begin=self._handle_fireball_collide_mob)
+        self._world.add_collision_handler("mob", "mob", id_b="fireball", on_begin=self._handle_fireball_collide_mob)
         self._world.add_collision_handler("mob", "item", on_begin=self._handle_mob_collide_item)
 
-    def _handle_mob_collide_block(self, mob: Mob, block: Block, data,
-                                  arbiter: pymunk.Arbiter) -> bool:
+    def _handle_fireball_collide_block(self, fireball: Mob, block: Block, data,
+                                       arbiter: pymunk.Arbiter) -> bool:
+        self._world.remove_mob(fireball)
+        return True
 
-        if mob.get_id() == "fireball":
-            if block.get_id() == "brick":
-                self._world.remove_block(block)
-            self._world.remove_mob(mob)
-        elif mob.get_id() == "mushroom":
-            collision = get_collision_direction(mob, block)
-            if collision == "R" or collision == "L":
-                if mob.get_tempo() > 0:
-                    mob.set_tempo(-20)
-                elif mob.get_tempo() < 0:
-                    mob.set_tempo(20)
+    def _handle_fireball_collide_brick(self, fireball: Mob, brick: Block, data,
+                                       arbiter: pymunk.Arbiter) -> bool:
+        self._world.remove_block(brick)
+        self._world.remove_mob(fireball)
+        return True
+
+    def _handle_mushroom_collide_block(self, mob: Mob, block: Block, data,
+                                       arbiter: pymunk.Arbiter) -> bool:
+        collision = get_collision_direction(mob, block)
+        if collision == "R" or collision == "L":
+            if mob.get_tempo() > 0:
+                mob.set_tempo(-20)
+            elif mob.get_tempo() < 0:
+                mob.set_tempo(20)
 
         return True
 
@@ -1024,10 +1267,12 @@ class MarioApp:
 
     def _handle_mob_collide_mob(self, mob1: Mob, mob2: Mob, data,
                                 arbiter: pymunk.Arbiter) -> bool:
-        if mob1.get_id() == "fireball" or mob2.get_id() == "fireball":
-            self._world.remove_mob(mob1)
-            self._world.remove_mob(mob2)
+        return False
 
+    def _handle_fireball_collide_mob(self, mob1: Mob, mob2: Mob, data,
+                                     arbiter: pymunk.Arbiter) -> bool:
+        self._world.remove_mob(mob1)
+        self._world.remove_mob(mob2)
         return False
 
     def _handle_player_collide_item(self, player: Player, dropped_item: DroppedItem,
@@ -1056,13 +1301,21 @@ class MarioApp:
 
     def _handle_player_collide_block(self, player: Player, block: Block, data,
                                      arbiter: pymunk.Arbiter) -> bool:
-        if block.get_id() == "flagpole" or block.get_id() == "tunnel" or block.get_id() == "switch":
-            block.on_hit(arbiter, self)
-        else:
-            block.on_hit(arbiter, (self._world, player))
+        block.on_hit(arbiter, (self._world, player))
+        self._player.set_jumping(False)
+        return True
+
+    def _handle_player_collide_trigger(self, player: Player, block: Block, data,
+                                       arbiter: pymunk.Arbiter) -> bool:
+        block.on_hit(arbiter, self)
+        self._player.set_jumping(False)
+        return True
+
+    def _handle_player_collide_switch(self, player: Player, switch: Block, data,
+                                      arbiter: pymunk.Arbiter) -> bool:
+        switch.on_hit(arbiter, self)
         if self._switch_status:
-            if block.get_id() == "switch":
-                return False
+            return False
         self._player.set_jumping(False)
         return True
 
@@ -1079,55 +1332,13 @@ class MarioApp:
         return True
 
 
-def config_file(filename):
-    """Opens and parses the config file"""
-
-    file_data = {}
-    fd = open(filename, 'r')
-    previous_line = ''
-    before_previous_line = ''
-    level_text = False
-    next_level = False
-    non_level = True
-
-    # Goes through a loop across every line in the file
-    for line in fd:
-        line = line.strip()
-
-        # Puts every non-level data into the file_data
-        if non_level:
-            if line != '' and line.endswith('==') is False:
-                setting, _, specification = line.split()
-                file_data[setting] = specification
-
-        # Checks if there is a tunnel in the level and adds that to the file_data
-        if next_level:
-            if line != '':
-                setting, _, specification = line.split()
-                add_dict = {setting: specification}
-                file_data[before_previous_line].update(add_dict)
-
-        # Checks if there is a goal in the level and adds that to the file_data
-        if level_text:
-            setting, _, specification = line.split()
-            add_dict = {setting: specification}
-            file_data[previous_line] = add_dict
-            before_previous_line = previous_line
-            next_level = True
-        else:
-            next_level = False
-
-        # Checks if the file ends with 'txt==' then activates the following bool so that the above if statements pass
-        if line.endswith('txt=='):
-            non_level = False
-            level_text = True
-            file_data[line] = {}
-        else:
-            level_text = False
-        previous_line = line
-    fd.close()
+def config_file(filename: str) -> Config:
+    """Opens and parses the config file, see load_config
 
-    return file_data
+    Raises:
+        ConfigError: If the config file does not match the schema of config files.
+    """
+    return load_config(filename)
 
 
 if __name__ == '__main__':
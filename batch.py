@@ -0,0 +1,125 @@
+"""
+Runs many headless games of Mario in parallel across a pool of processes.
+
+Usage:
+    python batch.py [--config config.txt] [--levels level1.txt ...] [--seeds 10]
+                    [--inputs script.txt ...] [--workers 4] [--ticks 3000]
+
+A run is made for every combination of level, seed and input script. Each run's
+summary is printed as a line of JSON as soon as it finishes.
+"""
+
+__version__ = "1.1.0"
+
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+from app import config_file, create_world_builder
+from config import Config
+from headless import HeadlessGame, load_inputs, DEFAULT_MAX_TICKS
+from level import LevelTemplates
+
+# The level templates of this process, by gravity, so that each process only builds
+# each level once and restores it for every later run of the level
+_templates: Dict[int, LevelTemplates] = {}
+
+
+class SimulationJob(NamedTuple):
+    """A single headless run of a level"""
+    level: str
+    seed: int
+    inputs: Optional[str] = None
+
+
+def get_templates(config: Config) -> LevelTemplates:
+    """(LevelTemplates) Returns the level templates of this process for the gravity of a config"""
+    gravity = config.world.gravity
+    templates = _templates.get(gravity)
+    if templates is None:
+        templates = _templates[gravity] = LevelTemplates(lambda: create_world_builder(gravity=(0, gravity)))
+    return templates
+
+
+def run_job(config: Config, job: SimulationJob, max_ticks: int = DEFAULT_MAX_TICKS) -> dict:
+    """Run a single job to completion.
+
+    The world is built inside the calling process, so only the config and the job
+    description need to be sent to a worker, and only the summary is sent back.
+    Each level is only built the first time a process runs it, and is restored from
+    its template for later runs, see LevelTemplates.
+
+    Parameters:
+        config (Config): The parsed config file, see config_file
+        job (SimulationJob): The run to make
+        max_ticks (int): The number of ticks after which the run times out
+
+    Returns:
+        (dict): The summary of the run, see HeadlessGame.get_summary, along with the job
+    """
+    inputs = load_inputs(job.inputs) if job.inputs else ()
+
+    game = HeadlessGame(config, level=job.level, seed=job.seed, templates=get_templates(config))
+    summary = game.run(inputs, max_ticks)
+
+    summary["start"] = job.level
+    summary["inputs"] = job.inputs
+    return summary
+
+
+def run_batch(config: Config, jobs: Iterable[SimulationJob], workers: int = None,
+              max_ticks: int = DEFAULT_MAX_TICKS) -> Iterator[dict]:
+    """Run jobs in parallel, yielding each summary as its run finishes.
+
+    A run only depends on its job, so its summary is the same however the jobs are
+    spread over the processes, and the same as when the job is run alone.
+
+    Parameters:
+        config (Config): The parsed config file, see config_file
+        jobs (iterable<SimulationJob>): The runs to make
+        workers (int): The number of processes to use, defaults to the number of CPUs
+        max_ticks (int): The number of ticks after which a run times out
+
+    Yield:
+        dict: The summary of a finished run, see run_job
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_job, config, job, max_ticks) for job in jobs]
+
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def config_levels(config: Config) -> List[str]:
+    """(list<str>) Returns the level files named in a parsed config that exist"""
+    return [level for level in config.levels if os.path.exists(level)]
+
+
+def main(args=None):
+    """Run a batch of headless games from the command line"""
+    parser = argparse.ArgumentParser(description="Run many games of Mario without a display.")
+    parser.add_argument("--config", default="config.txt", help="the config file to use")
+    parser.add_argument("--levels", nargs="+", help="the levels to run, defaults to every level in the config")
+    parser.add_argument("--seeds", type=int, default=1, help="the number of seeds to run each level with")
+    parser.add_argument("--inputs", nargs="+", default=[None], help="input scripts of '<tick> <keysym>' lines")
+    parser.add_argument("--workers", type=int, help="the number of processes to use")
+    parser.add_argument("--ticks", type=int, default=DEFAULT_MAX_TICKS,
+                        help="the number of ticks after which a run times out")
+    args = parser.parse_args(args)
+
+    config = config_file(args.config)
+    levels = args.levels or config_levels(config)
+
+    jobs = [SimulationJob(level, seed, inputs)
+            for level in levels
+            for seed in range(args.seeds)
+            for inputs in args.inputs]
+
+    for summary in run_batch(config, jobs, args.workers, args.ticks):
+        print(json.dumps(summary), flush=True)
+
+
+if __name__ == '__main__':
+    main()
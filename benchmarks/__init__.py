@@ -0,0 +1,73 @@
+"""Benchmarks for the hot paths of the game engine
+
+Run the suite from the root of the repository with:
+    python -m benchmarks [--output results.json]
+
+Each benchmark times a single operation many times and reports percentiles of
+the time per operation, in microseconds. Results can be written to a JSON file
+to be diffed between commits.
+"""
+
+__version__ = "1.1.0"
+
+import time
+from typing import Callable, Dict, List
+
+__all__ = ["canvas", "levels", "suite"]
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    """Returns the sample at the given fraction through the sorted samples
+
+    Parameters:
+        samples (list<float>): The samples, in ascending order
+        fraction (float): How far through the samples to look, in [0, 1]
+    """
+    index = min(len(samples) - 1, int(round(fraction * (len(samples) - 1))))
+    return samples[index]
+
+
+def summarise(samples: List[float]) -> Dict[str, float]:
+    """Summarises times per operation, in seconds, as percentiles in microseconds
+
+    Returns:
+        (dict<str, float>): The number of operations, with the mean, minimum,
+                            maximum and 50th/90th/99th percentile times.
+    """
+    samples = sorted(samples)
+    scale = 1e6
+
+    return {
+        "ops": len(samples),
+        "mean_us": round(sum(samples) / len(samples) * scale, 3),
+        "min_us": round(samples[0] * scale, 3),
+        "p50_us": round(percentile(samples, .5) * scale, 3),
+        "p90_us": round(percentile(samples, .9) * scale, 3),
+        "p99_us": round(percentile(samples, .99) * scale, 3),
+        "max_us": round(samples[-1] * scale, 3),
+    }
+
+
+def measure(operation: Callable, repeat: int, setup: Callable = None) -> List[float]:
+    """Times each of 'repeat' calls to an operation
+
+    Parameters:
+        operation (Callable<> -> *): The operation to time
+        repeat (int): The number of times to call the operation
+        setup (Callable<> -> *): Called before each operation, outside of the timing
+
+    Returns:
+        (list<float>): The time taken by each call, in seconds
+    """
+    timer = time.perf_counter
+    samples = []
+
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+
+        start = timer()
+        operation()
+        samples.append(timer() - start)
+
+    return samples
@@ -0,0 +1,113 @@
+"""
+Runs the benchmark suite, printing a table of results and optionally writing them to JSON
+
+Usage:
+    python -m benchmarks [--output results.json] [--quick] [--virtual]
+                         [--mobs 0 100] [--coins 0 100] [--scales 10 100]
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+
+import pymunk
+
+from benchmarks import suite
+from benchmarks.levels import ROOT, shipped_levels, write_scaled_level
+
+
+def git_commit() -> str:
+    """(str) Returns the commit of the repository being benchmarked, if known"""
+    try:
+        process = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                 capture_output=True, universal_newlines=True)
+    except OSError:
+        return None
+    return process.stdout.strip() or None
+
+
+def run(args) -> dict:
+    """Runs every benchmark, returning the results by benchmark name"""
+    repeat = 3 if args.quick else 10
+    ticks = 100 if args.quick else 500
+    calls = 2000 if args.quick else 20000
+    entries = 5000
+
+    levels = shipped_levels()
+    base = os.path.basename
+
+    # The synthetic levels, and the compiled caches written next to them, are removed afterwards
+    with tempfile.TemporaryDirectory(prefix="mario_levels_") as directory:
+        scaled = [write_scaled_level(levels[0], scale, directory) for scale in args.scales]
+
+        results = {}
+        for level in levels + scaled:
+            results[f"build/{base(level)}"] = suite.bench_build(level, 1 if "_x100" in level else repeat)
+
+        for level in (levels[0],) + tuple(scaled[:1]):
+            results[f"restart/{base(level)}"] = suite.bench_restart(level, repeat)
+            results[f"template/{base(level)}"] = suite.bench_template(level, repeat)
+
+        results[f"high_scores/entries={entries}"] = suite.bench_high_scores(entries, calls)
+        results[f"high_scores/sqlite/entries={entries}"] = suite.bench_high_scores(entries, calls, sqlite=True)
+
+        for level in (levels[0],) + tuple(scaled[:1]):
+            for mobs in args.mobs:
+                for coins in args.coins:
+                    results[f"step/{base(level)}/mobs={mobs},coins={coins}"] = \
+                        suite.bench_step(level, mobs, coins, ticks)
+
+        results["collision_direction"] = suite.bench_collision_direction(levels[0], calls)
+        results["collision_direction/probe"] = suite.bench_collision_direction(levels[0], calls, probe=True)
+
+        for level in (levels[0],) + tuple(scaled[:1]):
+            results[f"redraw/{base(level)}"] = suite.bench_redraw(level, ticks, virtual=args.virtual)
+
+        return results
+
+
+def main(args=None):
+    """Run the benchmark suite from the command line"""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks",
+                                     description="Benchmark the hot paths of the game engine.")
+    parser.add_argument("--output", help="a JSON file to write the results to")
+    parser.add_argument("--quick", action="store_true", help="time fewer operations")
+    parser.add_argument("--virtual", action="store_true", help="always draw on a virtual canvas")
+    parser.add_argument("--mobs", type=int, nargs="+", default=[0, 100],
+                        help="the numbers of extra mobs to step the world with")
+    parser.add_argument("--coins", type=int, nargs="+", default=[0, 100],
+                        help="the numbers of dropped coins to step the world with")
+    parser.add_argument("--scales", type=int, nargs="+", default=[10, 100],
+                        help="how many times longer than level1 to make synthetic levels")
+    args = parser.parse_args(args)
+
+    # Levels, images and high scores are loaded relative to the repository root
+    os.chdir(ROOT)
+    results = run(args)
+
+    width = max(map(len, results))
+    print(f"{'benchmark':<{width}}  {'ops':>6}  {'p50 us':>10}  {'p90 us':>10}  {'p99 us':>10}")
+    for name, summary in results.items():
+        print(f"{name:<{width}}  {summary['ops']:>6}  {summary['p50_us']:>10}  "
+              f"{summary['p90_us']:>10}  {summary['p99_us']:>10}")
+
+    if args.output:
+        report = {
+            "meta": {
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "pymunk": pymunk.version,
+            },
+            "results": results,
+        }
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2, sort_keys=True)
+            file.write("\n")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""
+Views to benchmark rendering with, on a real canvas when a display is available
+or on a virtual canvas which counts the canvas calls made otherwise
+"""
+
+import tkinter as tk
+from collections import Counter
+
+from app import MarioViewRenderer, StatusDisplay, BLOCK_IMAGES, ITEM_IMAGES, MOB_IMAGES, BLOCK_SIZE
+from game.animation import Animator
+from game.view import GameView, ViewRenderer
+
+
+class VirtualRenderer(MarioViewRenderer):
+    """A renderer which selects images by name, without loading any image files"""
+
+    def __init__(self):
+        """Constructor"""
+        ViewRenderer.__init__(self, BLOCK_IMAGES, ITEM_IMAGES, MOB_IMAGES)
+        self._animator = Animator(self.get_animation)
+
+    def load_image(self, file: str) -> str:
+        """Returns the name of the image in place of the image"""
+        return file
+
+
+class VirtualGameView(GameView):
+    """A game view which counts the canvas calls made rather than drawing anything"""
+
+    def __init__(self, size, renderer: ViewRenderer, cull_margin: int = 2 * BLOCK_SIZE):
+        """Constructor
+
+        Parameters:
+            size (tuple<int, int>): The (width, height) size of the view, in pixels
+            renderer (ViewRenderer): The renderer selecting entity images
+            cull_margin (int): See GameView
+        """
+        # The tk.Canvas constructor is skipped, so set up the view state directly
+        self._world_view_router = renderer
+        self._offset = self._drawn_offset = (0, 0)
+        self._size = size
+        self._cull_margin = cull_margin
+        self._lookahead = 0.
+        self._overlay = None
+        self._items = {}
+
+        self._calls = Counter()
+        self._next_id = 0
+
+    def get_calls(self) -> Counter:
+        """(Counter<str: int>) Returns the number of calls made to each canvas method"""
+        return self._calls
+
+    def _create(self, method: str) -> int:
+        self._calls[method] += 1
+        self._next_id += 1
+        return self._next_id
+
+    def create_image(self, *args, **kwargs) -> int:
+        return self._create("create_image")
+
+    def create_rectangle(self, *args, **kwargs) -> int:
+        return self._create("create_rectangle")
+
+    def coords(self, *args):
+        self._calls["coords"] += 1
+
+    def move(self, *args):
+        self._calls["move"] += 1
+
+    def itemconfigure(self, *args, **kwargs):
+        self._calls["itemconfigure"] += 1
+
+    def delete(self, *args):
+        self._calls["delete"] += 1
+
+    def addtag_withtag(self, *args):
+        self._calls["addtag_withtag"] += 1
+
+    def tag_lower(self, *args):
+        self._calls["tag_lower"] += 1
+
+    def winfo_width(self) -> int:
+        return self._size[0]
+
+    def winfo_height(self) -> int:
+        return self._size[1]
+
+
+class VirtualStatusDisplay:
+    """A status display which counts the updates made to it rather than showing them"""
+
+    def __init__(self, calls: Counter):
+        """Constructor
+
+        Parameters:
+            calls (Counter<str: int>): The counts to add the updates to, e.g. those of a view
+        """
+        self._calls = calls
+        # The app resizes and recolours the health bar directly
+        self._bottom_frame = self
+
+    def config(self, **kwargs):
+        self._calls["status_config"] += 1
+
+    def player_score(self, score):
+        self._calls["status_score"] += 1
+
+
+def create_status_display(view: GameView, root: tk.Tk = None):
+    """Create a status display below a view created by create_view
+
+    Returns:
+        (StatusDisplay): A status display in the root window, or a virtual one which
+                         counts its updates along with the canvas calls of a virtual view
+    """
+    if root is None:
+        return VirtualStatusDisplay(view.get_calls())
+
+    status_display = StatusDisplay(root)
+    status_display.pack(side=tk.BOTTOM, expand=True, fill=tk.BOTH)
+    return status_display
+
+
+def create_view(size, virtual: bool = False):
+    """Create a view to benchmark rendering with
+
+    Parameters:
+        size (tuple<int, int>): The (width, height) size of the view, in pixels
+        virtual (bool): Always use a virtual canvas, even if a display is available
+
+    Returns:
+        (tuple<GameView, tk.Tk>): The view, and its root window if it is a real canvas
+    """
+    if not virtual:
+        try:
+            root = tk.Tk()
+        except tk.TclError:
+            pass
+        else:
+            view = GameView(root, size, MarioViewRenderer(BLOCK_IMAGES, ITEM_IMAGES, MOB_IMAGES),
+                            cull_margin=2 * BLOCK_SIZE)
+            view.pack()
+            root.update()
+            return view, root
+
+    return VirtualGameView(size, VirtualRenderer()), None
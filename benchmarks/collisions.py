@@ -0,0 +1,93 @@
+"""
+Checks that get_collision_direction classifies collisions exactly as the probe
+algorithm it replaced, over the collisions of many simulated games
+
+Usage:
+    python -m benchmarks.collisions [--seeds 8] [--ticks 1500] [--levels level1.txt ...]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+from collections import Counter
+
+from game.block import Block
+from game.entity import DynamicEntity
+from game.mob import Mob
+from game.util import get_collision_direction, probe_collision_direction
+
+from benchmarks.levels import ROOT, SHIPPED_LEVELS
+from benchmarks.suite import create_game
+
+# The keys pressed at random while simulating, weighted towards moving right
+KEYS = ('Right', 'Right', 'Right', 'Left', 'w', 's')
+
+
+def check_arbiter(arbiter, counts: Counter, mismatches: list):
+    """Classifies a collision both ways round with both algorithms, counting the outcomes"""
+    shape_a, shape_b = arbiter.shapes
+    for entity, other in ((shape_a.object, shape_b.object), (shape_b.object, shape_a.object)):
+        if not isinstance(entity, DynamicEntity) or not isinstance(other, (Block, Mob)):
+            continue
+
+        expected = probe_collision_direction(entity, other)
+        actual = get_collision_direction(entity, other)
+        counts["collisions"] += 1
+
+        if actual != expected:
+            counts["mismatches"] += 1
+            if len(mismatches) < 10:
+                mismatches.append({"entity": repr(entity), "other": repr(other),
+                                   "probe": expected, "bbox": actual})
+
+        if expected is None:
+            counts["unknown"] += 1
+
+
+def check_level(level: str, seed: int, ticks: int, counts: Counter, mismatches: list):
+    """Simulates a game of a level with random key presses, checking every collision each tick"""
+    game = create_game(level)
+    world = game.get_world()
+    rng = random.Random(seed)
+
+    def check(arbiter):
+        check_arbiter(arbiter, counts, mismatches)
+
+    for _ in range(ticks):
+        if rng.random() < .2:
+            game.press(rng.choice(KEYS))
+        game.tick()
+
+        if game.is_game_lost() or game.get_world() is not world:
+            # Restart rather than stop, to keep collecting collisions
+            game = create_game(level)
+            world = game.get_world()
+
+        for thing in world.get_stepped_things():
+            thing.get_shape().body.each_arbiter(check)
+
+
+def main(args=None):
+    """Run the collision direction compatibility check from the command line"""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.collisions",
+                                     description="Compare collision direction algorithms.")
+    parser.add_argument("--seeds", type=int, default=8, help="the number of games of each level")
+    parser.add_argument("--ticks", type=int, default=1500, help="the number of ticks of each game")
+    parser.add_argument("--levels", nargs="+", default=SHIPPED_LEVELS, help="the levels to play")
+    args = parser.parse_args(args)
+
+    os.chdir(ROOT)
+    counts = Counter()
+    mismatches = []
+    for level in args.levels:
+        for seed in range(args.seeds):
+            check_level(level, seed, args.ticks, counts, mismatches)
+
+    print(json.dumps({"counts": counts, "mismatches": mismatches}, indent=2))
+    return 1 if counts["mismatches"] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
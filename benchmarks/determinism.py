@@ -0,0 +1,120 @@
+"""
+Checks that games are reproduced exactly from their seed and inputs, by recording
+games, saving and loading their replays, and replaying them in a fresh process,
+and that each job of a batch gives the same summary as when it is run alone
+
+Usage:
+    python -m benchmarks.determinism [--seeds 0 1 4 5 6] [--ticks 3500] [--levels level1.txt ...]
+                                     [--workers 2]
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+from app import config_file
+from batch import SimulationJob, run_batch
+from headless import HeadlessGame
+from replay import load_replay, save_replay
+
+from benchmarks.levels import ROOT
+
+# The keys pressed at random while recording, weighted towards moving right
+KEYS = ('Right', 'Right', 'Right', 'Left', 'w', 's')
+
+
+def random_inputs(seed: int, ticks: int):
+    """Returns (tick, keysym) pairs of keys pressed at random on about a fifth of ticks"""
+    rng = random.Random(seed)
+    return [(tick, rng.choice(KEYS)) for tick in range(ticks) if rng.random() < .2]
+
+
+def check_replay(level: str, seed: int, ticks: int, directory: str) -> dict:
+    """Records a game, then replays it from its saved file in a fresh process
+
+    Returns:
+        (dict): The summary of the recorded game, with the summary of the replay under 'replay'.
+    """
+    game = HeadlessGame(config_file(os.path.join(ROOT, "config.txt")), level=level, seed=seed, record=True)
+    summary = game.run(random_inputs(seed, ticks), ticks)
+
+    filename = os.path.join(directory, f"{os.path.splitext(level)[0]}_{seed}.replay")
+    save_replay(game.get_replay(), filename)
+    # Saving and loading must not change the replay
+    assert load_replay(filename) == game.get_replay(), f"{filename} did not load as it was saved"
+
+    process = subprocess.run([sys.executable, os.path.join(ROOT, "replay.py"), filename], cwd=ROOT,
+                             capture_output=True, universal_newlines=True)
+    # Pymunk prints a banner when it is imported, so the summary is the last line
+    summary["replay"] = json.loads(process.stdout.splitlines()[-1])
+    return summary
+
+
+def run_alone(job: SimulationJob, ticks: int) -> dict:
+    """(dict) Returns the summary of a job run by itself, in a fresh process"""
+    process = subprocess.run([sys.executable, os.path.join(ROOT, "headless.py"), "--level", job.level,
+                              "--seed", str(job.seed), "--inputs", job.inputs, "--ticks", str(ticks)],
+                             cwd=ROOT, capture_output=True, universal_newlines=True)
+    return json.loads(process.stdout.splitlines()[-1])
+
+
+def check_batch(jobs, ticks: int, workers: int) -> list:
+    """Runs every job twice in a batch, so most runs follow other runs in their process,
+    and once alone, returning the jobs whose summaries differ
+
+    Returns:
+        (list<dict>): The summaries alone and in the batch of each job which differed
+    """
+    config = config_file(os.path.join(ROOT, "config.txt"))
+    batched = {}
+    for summary in run_batch(config, list(jobs) * 2, workers, ticks):
+        job = SimulationJob(summary.pop("start"), summary["seed"], summary.pop("inputs"))
+        batched.setdefault(job, []).append(summary)
+
+    differed = []
+    for job, summaries in batched.items():
+        alone = run_alone(job, ticks)
+        if any(summary != alone for summary in summaries):
+            differed.append({"job": job._asdict(), "alone": alone, "batch": summaries})
+    return differed
+
+
+def main(args=None):
+    """Run the determinism check from the command line"""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.determinism",
+                                     description="Check that replays reproduce recorded games.")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0, 1, 4, 5, 6],
+                        help="the seeds of the games of each level")
+    parser.add_argument("--ticks", type=int, default=3500, help="the number of ticks of each game")
+    parser.add_argument("--levels", nargs="+", default=["level1.txt", "level2.txt"], help="the levels to play")
+    parser.add_argument("--workers", type=int, default=2, help="the number of processes to run the batch with")
+    args = parser.parse_args(args)
+
+    os.chdir(ROOT)
+    results = []
+    with tempfile.TemporaryDirectory(prefix="mario_replays_") as directory:
+        jobs = []
+        for seed in args.seeds:
+            inputs = os.path.join(directory, f"inputs_{seed}.txt")
+            with open(inputs, 'w') as file:
+                file.writelines(f"{tick} {key}\n" for tick, key in random_inputs(seed, args.ticks))
+            jobs.extend(SimulationJob(level, seed, inputs) for level in args.levels)
+
+        for level in args.levels:
+            for seed in args.seeds:
+                results.append(check_replay(level, seed, args.ticks, directory))
+
+        differed = check_batch(jobs, args.ticks, args.workers)
+
+    diverged = [summary for summary in results if summary["replay"]["diverged"] is not None]
+    print(json.dumps({"games": len(results), "diverged": diverged,
+                      "jobs": len(jobs), "batch_differed": differed}, indent=2))
+    return 1 if diverged or differed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,51 @@
+"""
+Shipped and synthetic levels to benchmark with
+"""
+
+import os
+from typing import List
+
+from level import load_level
+
+# The root of the repository, where the shipped levels are
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SHIPPED_LEVELS = ["level1.txt", "level2.txt", "bonus.txt", "small_room.txt"]
+
+
+def shipped_levels() -> List[str]:
+    """(list<str>) Returns the paths of the levels shipped with the game"""
+    return [os.path.join(ROOT, level) for level in SHIPPED_LEVELS]
+
+
+def scale_level(level: str, factor: int) -> str:
+    """Lengthens a level string by repeating it side by side
+
+    Parameters:
+        level (str): The level string, see load_level
+        factor (int): The number of times to repeat the level
+
+    Returns:
+        (str): A level string 'factor' times as long as the given level.
+    """
+    return "\n".join(line * factor for line in level.split("\n"))
+
+
+def write_scaled_level(filename: str, factor: int, directory: str) -> str:
+    """Writes a level file which is 'factor' times as long as an existing level
+
+    Parameters:
+        filename (str): The level file to scale
+        factor (int): The number of times to repeat the level
+        directory (str): The directory to write the level file in, which the caller removes
+
+    Returns:
+        (str): The path of the written level file.
+    """
+    name, extension = os.path.splitext(os.path.basename(filename))
+    path = os.path.join(directory, f"{name}_x{factor}{extension}")
+
+    with open(path, 'w') as file:
+        file.write(scale_level(load_level(filename), factor))
+
+    return path
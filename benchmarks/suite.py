@@ -0,0 +1,226 @@
+"""
+The benchmarks of the engine's hot paths
+"""
+
+import os
+import tempfile
+
+from app import create_world_builder, config_file, MarioApp, MushroomMob, BLOCK_SIZE, MAX_WINDOW_SIZE
+from game.item import Coin
+from game.util import get_collision_direction, probe_collision_direction
+from headless import HeadlessGame, DEAD
+from leaderboard import SQLiteScores
+from level import load_world, LevelTemplates
+from scores import ScoreStore
+
+from benchmarks import measure, summarise
+from benchmarks.canvas import create_status_display, create_view, VirtualGameView
+from benchmarks.levels import ROOT
+
+
+def create_game(level: str) -> HeadlessGame:
+    """Create a headless game of the given level, with the shipped config and a fixed seed"""
+    return HeadlessGame(config_file(os.path.join(ROOT, "config.txt")), level=level, seed=0)
+
+
+class RedrawGame(HeadlessGame):
+    """A headless game which draws to a view and updates a status display, as the app does"""
+
+    # The app's status bar updates, rather than ending the run once the game is lost
+    health = MarioApp.health
+
+    def __init__(self, level: str):
+        """Construct a new game of a level, with the shipped config and a fixed seed"""
+        super().__init__(config_file(os.path.join(ROOT, "config.txt")), level=level, seed=0)
+
+    def show(self, view, status_display):
+        """Draws the game to a view from now on
+
+        Parameters:
+            view (GameView): The view to draw to, see create_view
+            status_display (StatusDisplay): The status display, see create_status_display
+        """
+        self._view = view
+        self._renderer = view.get_renderer()
+        self._status_display = status_display
+        self._map_size = view.winfo_width()
+
+    def game_lost_popup(self):
+        """Ends the run once the game is lost, without a popup"""
+        self._result = DEAD
+
+
+def bench_build(level: str, repeat: int) -> dict:
+    """Times loading a level file and building its world
+
+    Parameters:
+        level (str): The path of the level file
+        repeat (int): The number of times to build the level
+    """
+    builder = create_world_builder()
+    return summarise(measure(lambda: load_world(builder, level), repeat, setup=builder.clear))
+
+
+def bench_restart(level: str, repeat: int, ticks: int = 100) -> dict:
+    """Times restarting a level part way through, which restores the world rather than building it
+
+    Parameters:
+        level (str): The path of the level file
+        repeat (int): The number of times to restart the level
+        ticks (int): The number of ticks to play, running right, before each restart
+    """
+    game = create_game(level)
+
+    def play():
+        for tick in range(ticks):
+            if tick % 10 == 0:
+                game.press('Right')
+            game.tick()
+
+    return summarise(measure(game.reset_level, repeat, setup=play))
+
+
+def bench_template(level: str, repeat: int, ticks: int = 100) -> dict:
+    """Times taking the world of a level from its template after a game of it, as the
+    batch runner does for each run after the first, rather than building it
+
+    Parameters:
+        level (str): The path of the level file
+        repeat (int): The number of times to take the level
+        ticks (int): The number of ticks to play, running right, before each take
+    """
+    templates = LevelTemplates(create_world_builder)
+    config = config_file(os.path.join(ROOT, "config.txt"))
+
+    def play():
+        game = HeadlessGame(config, level=level, seed=0, templates=templates)
+        game.run(((tick, 'Right') for tick in range(0, ticks, 10)), ticks)
+
+    return summarise(measure(lambda: templates.take(level), repeat, setup=play))
+
+
+def bench_high_scores(entries: int, repeat: int, sqlite: bool = False) -> dict:
+    """Times saving a score and then showing the leaderboard, as at the end of a level,
+    with the high scores already holding many entries
+
+    Parameters:
+        entries (int): The number of names with a score saved before timing
+        repeat (int): The number of scores to save
+        sqlite (bool): Keep the scores in an SQLite database rather than a log per level
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        store = SQLiteScores(os.path.join(directory, "scores.db")) if sqlite else ScoreStore(directory)
+        store.add_scores(("level", f"player{entry}", entry % 1000) for entry in range(entries))
+
+        save = iter(range(repeat))
+
+        def save_score():
+            entry = next(save)
+            store.add_score("level", f"player{entry * 7 % entries}", entry % 1000)
+            store.get_leaderboard("level")
+
+        try:
+            return summarise(measure(save_score, repeat))
+        finally:
+            store.close()
+
+
+def bench_step(level: str, mobs: int, coins: int, repeat: int, warmup: int = 50) -> dict:
+    """Times steady-state ticks of a game with extra mobs and dropped coins spread along the level
+
+    Every thing is stepped, rather than only those near the player, so that the extra
+    mobs and coins are stepped rather than parked, see World.set_activation_range.
+
+    Parameters:
+        level (str): The path of the level file
+        mobs (int): The number of mushroom mobs to add
+        coins (int): The number of coins to drop
+        repeat (int): The number of ticks to time
+        warmup (int): The number of ticks to let the world settle for before timing
+    """
+    game = create_game(level)
+    world = game.get_world()
+    world.set_activation_range(None)
+    width = world.get_pixel_size()[0]
+
+    for index in range(mobs):
+        world.add_mob(MushroomMob(), (index + 1) * width / (mobs + 1), 2 * BLOCK_SIZE)
+    for index in range(coins):
+        world.add_item(Coin(), (index + .5) * width / coins, BLOCK_SIZE)
+
+    for _ in range(warmup):
+        game.tick()
+
+    return summarise(measure(game.tick, repeat))
+
+
+def bench_collision_direction(level: str, repeat: int, probe: bool = False) -> dict:
+    """Times classifying the direction of the player resting on the block beneath them
+
+    Parameters:
+        level (str): The path of the level file
+        repeat (int): The number of classifications to time
+        probe (bool): Time the original probe algorithm instead
+    """
+    game = create_game(level)
+    for _ in range(100):
+        game.tick()
+
+    player = game.get_player()
+    x, _ = player.get_position()
+    block = game.get_world().get_block(x, player.get_shape().bb.top + 1)
+    if block is None:
+        raise ValueError(f"The player does not come to rest on a block in {level}")
+
+    classify = probe_collision_direction if probe else get_collision_direction
+    return summarise(measure(lambda: classify(player, block), repeat))
+
+
+def bench_redraw(level: str, frames: int, virtual: bool = False) -> dict:
+    """Times redrawing the game while the view scrolls along the level, one tick per frame
+
+    Each frame is redrawn by MarioApp.redraw, so updating the status display is timed
+    along with drawing the entities in view.
+
+    Parameters:
+        level (str): The path of the level file
+        frames (int): The number of frames to time
+        virtual (bool): Always draw on a virtual canvas, even if a display is available
+
+    Returns:
+        (dict): The summary of frame times, with the canvas calls per frame when the
+                canvas is virtual and whether the canvas was virtual
+    """
+    game = RedrawGame(level)
+    width = game.get_world().get_pixel_size()[0]
+    size = tuple(map(min, zip(MAX_WINDOW_SIZE, game.get_world().get_pixel_size())))
+    view, root = create_view(size, virtual=virtual)
+    game.show(view, create_status_display(view, root))
+
+    scroll = max(0, width - size[0])
+    frame = [0]
+
+    def setup():
+        # The game is drawn as it was when lost, as the app does
+        if game.get_result() is None:
+            game.tick()
+        view.set_offset((-scroll * frame[0] // frames, 0))
+        frame[0] += 1
+
+    def draw():
+        game.redraw()
+        if root is not None:
+            root.update_idletasks()
+
+    try:
+        summary = summarise(measure(draw, frames, setup=setup))
+    finally:
+        if root is not None:
+            root.destroy()
+
+    summary["virtual"] = isinstance(view, VirtualGameView)
+    if summary["virtual"]:
+        calls = view.get_calls()
+        summary["canvas_calls_per_frame"] = round(sum(calls.values()) / frames, 2)
+
+    return summary
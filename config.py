@@ -0,0 +1,286 @@
+"""
+The config file of the game, parsed once into typed settings.
+
+A config file is made of sections of 'setting : value' lines. The ==World==
+section holds the settings of the game and the ==Player== section those of the
+player. Every other section is named after a level file, and holds the levels
+its flagpole (goal) and tunnel lead to, e.g.
+
+    ==World==
+    gravity : 300
+    start : level1.txt
+
+    ==Player==
+    character : mario
+    health : 4
+
+    ==level1.txt==
+    tunnel : bonus.txt
+    goal : level2.txt
+
+Each value is converted to the type of its setting as the file is parsed. A
+setting which is not part of its section, or a value of the wrong type, is a
+ConfigError that gives the line of the mistake.
+"""
+
+__version__ = "1.1.0"
+
+import os
+from typing import Callable, Dict, Iterable, NamedTuple, Optional, Tuple
+
+WORLD_SECTION = "World"
+PLAYER_SECTION = "Player"
+
+CHARACTERS = ("mario", "luigi")
+
+# The level a flagpole or tunnel leads to when the game should end instead
+END = "END"
+
+
+class ConfigError(ValueError):
+    """A config which does not match the schema of config files"""
+
+    def __init__(self, message: str, filename: str = None, line: int = None):
+        """Constructor
+
+        Parameters:
+            message (str): What is wrong with the config.
+            filename (str): The config file, if the config was read from a file.
+            line (int): The number of the line which is wrong, counting from one.
+        """
+        if filename is not None and line is not None:
+            message = f"{filename}, line {line}: {message}"
+        elif filename is not None:
+            message = f"{filename}: {message}"
+        super().__init__(message)
+        self.filename = filename
+        self.line = line
+
+
+def integer(value: str) -> int:
+    """(int) Returns the whole number a value is written as"""
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError("expected a whole number") from None
+
+
+def on_off(value: str) -> bool:
+    """(bool) Returns True for 'on' and False for 'off'"""
+    if value not in ("on", "off"):
+        raise ValueError("expected 'on' or 'off'")
+    return value == "on"
+
+
+def character(value: str) -> str:
+    """(str) Returns the name of a playable character"""
+    if value not in CHARACTERS:
+        raise ValueError(f"expected one of {', '.join(CHARACTERS)}")
+    return value
+
+
+class WorldConfig(NamedTuple):
+    """The settings of the ==World== section"""
+    gravity: int = 300
+    start: str = "level1.txt"
+    seed: Optional[int] = None
+    chunk_width: Optional[int] = None
+    record: Optional[str] = None
+    profile: bool = False
+    profile_output: Optional[str] = None
+    leaderboard: Optional[str] = None
+    hot_reload: bool = False
+
+
+class PlayerConfig(NamedTuple):
+    """The settings of the ==Player== section
+
+    The player starts at (x, y) if both are given, and otherwise in the top left
+    of the level with the given mass.
+    """
+    character: str = "mario"
+    x: Optional[int] = None
+    y: Optional[int] = None
+    mass: Optional[int] = None
+    health: int = 5
+    max_velocity: int = 100
+
+
+class LevelConfig(NamedTuple):
+    """The settings of the section of a level"""
+    goal: str = END
+    tunnel: Optional[str] = None
+
+
+# The settings of each kind of section and the conversion of their values, by setting
+WORLD_SCHEMA: Dict[str, Callable[[str], object]] = {
+    "gravity": integer,
+    "start": str,
+    "seed": integer,
+    "chunk_width": integer,
+    "record": str,
+    "profile": on_off,
+    "profile_output": str,
+    "leaderboard": str,
+    "hot_reload": on_off,
+}
+PLAYER_SCHEMA: Dict[str, Callable[[str], object]] = {
+    "character": character,
+    "x": integer,
+    "y": integer,
+    "mass": integer,
+    "health": integer,
+    "max_velocity": integer,
+}
+LEVEL_SCHEMA: Dict[str, Callable[[str], object]] = {
+    "goal": str,
+    "tunnel": str,
+}
+
+
+class Config(NamedTuple):
+    """A parsed config file"""
+    world: WorldConfig
+    player: PlayerConfig
+    # The settings of each level with a section, by level file
+    levels: Dict[str, LevelConfig]
+    # The config file the config was parsed from, if any
+    filename: Optional[str] = None
+
+    def get_level(self, level: str) -> LevelConfig:
+        """(LevelConfig) Returns the settings of a level, or the defaults if it has no section"""
+        return self.levels.get(level, LevelConfig())
+
+    def to_dict(self) -> dict:
+        """Returns the config in the form config files were parsed to before the schema,
+        which is how replays store it, see config_from_dict
+
+        Returns:
+            (dict): The value of each given World and Player setting as a string, by setting,
+                    and the settings of each level, by '==<level>=='.
+        """
+        data = {}
+        for settings in (self.world, self.player):
+            for setting, value in settings._asdict().items():
+                if isinstance(value, bool):
+                    data[setting] = "on" if value else "off"
+                elif value is not None:
+                    data[setting] = str(value)
+
+        for level, settings in self.levels.items():
+            data[f"=={level}=="] = {setting: value for setting, value in settings._asdict().items()
+                                    if value is not None}
+        return data
+
+
+def _convert(schema: Dict[str, Callable[[str], object]], section: str, setting: str, value: str,
+             filename: str = None, line: int = None) -> object:
+    """Converts the value of a setting to its type, raising a ConfigError if it cannot be"""
+    convert = schema.get(setting)
+    if convert is None:
+        raise ConfigError(f"unknown setting '{setting}' in the =={section}== section", filename, line)
+
+    try:
+        return convert(value)
+    except ValueError as error:
+        raise ConfigError(f"invalid value '{value}' for '{setting}': {error}", filename, line) from None
+
+
+def _build_config(sections: Dict[str, Dict[str, object]], filename: str = None) -> Config:
+    """(Config) Returns the config of the converted settings of each section, by section name"""
+    return Config(WorldConfig(**sections.pop(WORLD_SECTION, {})),
+                  PlayerConfig(**sections.pop(PLAYER_SECTION, {})),
+                  {level: LevelConfig(**settings) for level, settings in sections.items()},
+                  filename)
+
+
+def _schema(section: str) -> Dict[str, Callable[[str], object]]:
+    """Returns the schema of the section of the given name"""
+    if section == WORLD_SECTION:
+        return WORLD_SCHEMA
+    if section == PLAYER_SECTION:
+        return PLAYER_SCHEMA
+    return LEVEL_SCHEMA
+
+
+def parse_config(lines: Iterable[str], filename: str = None) -> Config:
+    """Parse the lines of a config file
+
+    Parameters:
+        lines (iterable<str>): The lines of the config file.
+        filename (str): The name of the config file, to report the location of mistakes.
+
+    Raises:
+        ConfigError: If a line is not a section or a setting of its section, or a
+                     section or setting is given twice.
+    """
+    sections = {}
+    section = None
+
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+
+        if len(line) > 4 and line.startswith("==") and line.endswith("=="):
+            section = line[2:-2]
+            if section in sections:
+                raise ConfigError(f"the =={section}== section is given twice", filename, number)
+            sections[section] = {}
+            continue
+
+        setting, separator, value = line.partition(":")
+        setting, value = setting.strip(), value.strip()
+        if not separator or not setting or not value:
+            raise ConfigError(f"expected a '==section==' or a 'setting : value', not '{line}'", filename, number)
+        if section is None:
+            raise ConfigError(f"the setting '{setting}' is not in a section", filename, number)
+        if setting in sections[section]:
+            raise ConfigError(f"the setting '{setting}' is given twice", filename, number)
+
+        sections[section][setting] = _convert(_schema(section), section, setting, value, filename, number)
+
+    return _build_config(sections, filename)
+
+
+def config_from_dict(data: dict) -> Config:
+    """Convert a config from the form returned by Config.to_dict, e.g. as stored by replays
+
+    Settings outside of the level sections may be of either the World or the Player section.
+
+    Raises:
+        ConfigError: If a setting is not of any section or its value is of the wrong type.
+    """
+    sections = {WORLD_SECTION: {}, PLAYER_SECTION: {}}
+    for key, value in data.items():
+        if key.startswith("==") and key.endswith("=="):
+            level = key[2:-2]
+            sections[level] = {setting: _convert(LEVEL_SCHEMA, level, setting, str(value))
+                               for setting, value in value.items()}
+        elif key in PLAYER_SCHEMA:
+            sections[PLAYER_SECTION][key] = _convert(PLAYER_SCHEMA, PLAYER_SECTION, key, str(value))
+        else:
+            sections[WORLD_SECTION][key] = _convert(WORLD_SCHEMA, WORLD_SECTION, key, str(value))
+
+    return _build_config(sections)
+
+
+# The config parsed from each file, with the (modification time, size) of the file when it was parsed
+_parsed: Dict[str, Tuple[Tuple[int, int], Config]] = {}
+
+
+def load_config(filename: str) -> Config:
+    """Parse a config file, or return the config parsed from it before if it has not changed since
+
+    Raises:
+        ConfigError: If the config file does not match the schema, see parse_config.
+    """
+    path = os.path.abspath(filename)
+    stat = os.stat(path)
+    key = (stat.st_mtime_ns, stat.st_size)
+
+    parsed = _parsed.get(path)
+    if parsed is None or parsed[0] != key:
+        with open(path, 'r') as file:
+            parsed = _parsed[path] = (key, parse_config(file, filename))
+    return parsed[1]
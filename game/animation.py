@@ -0,0 +1,71 @@
+"""
+Animation of entities, driven by the time simulated rather than by drawing
+"""
+
+from typing import Callable, Dict, Iterable, NamedTuple, Optional, Tuple
+
+from game.entity import Entity
+
+
+class Animation(NamedTuple):
+    """A looping sequence of frames, each shown for the same amount of time
+
+    An animation of a single frame is a still image.
+    """
+    frames: Tuple[str, ...]
+    frame_time: float = 1.
+
+
+class Animator:
+    """Keeps an animation clock for each animated entity, which is advanced by the
+    time simulated each step, and the frame each entity is currently showing.
+
+    The animation an entity plays is chosen each step by a selector, e.g. by how the
+    entity is moving. An entity's clock starts again whenever its animation changes,
+    and is forgotten once the entity is no longer stepped.
+    """
+
+    def __init__(self, select: Callable[[Entity], Optional[Animation]]):
+        """Constructor
+
+        Parameters:
+            select (Callable<Entity> -> Animation): Returns the animation an entity
+                                                    should play, or None if it has none
+        """
+        self._select = select
+
+        # The animation of each entity and how long it has been playing for, in seconds
+        self._clocks: Dict[Entity, Tuple[Animation, float]] = {}
+        # The frame of its animation each entity is currently showing
+        self._frames: Dict[Entity, str] = {}
+
+    def step(self, time_delta: float, entities: Iterable[Entity]):
+        """Advances the animations of entities by one step, in a single pass
+
+        Parameters:
+            time_delta (float): The time simulated by the step, in seconds
+            entities (iterable<Entity>): The entities which were stepped
+        """
+        select = self._select
+        previous = self._clocks
+        clocks = {}
+        frames = {}
+
+        for entity in entities:
+            animation = select(entity)
+            if animation is None:
+                continue
+
+            clock = previous.get(entity)
+            elapsed = clock[1] + time_delta if clock is not None and clock[0] is animation else 0.
+            clocks[entity] = animation, elapsed
+
+            animation_frames = animation.frames
+            frames[entity] = animation_frames[int(elapsed / animation.frame_time) % len(animation_frames)]
+
+        self._clocks = clocks
+        self._frames = frames
+
+    def get_frame(self, entity: Entity) -> Optional[str]:
+        """(str) Returns the frame an entity is showing, or None if it was not animated last step"""
+        return self._frames.get(entity)
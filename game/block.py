@@ -48,6 +48,29 @@ class Block(Entity):
         return f"{self.__class__.__name__}({self._id})"
 
 
+class MergedBlock(Block):
+    """A rectangle of identical plain blocks which collide as a single shape
+
+    The member blocks keep their own shapes for drawing and grid lookups, but only
+    the merged block's shape is in the world's physical space. See World.merge_blocks.
+    """
+
+    def __init__(self, members: Tuple[Block, ...], cell_size: Tuple[int, int]):
+        """Construct a merged block from the blocks it replaces for collisions.
+
+        Parameters:
+            members (tuple<Block, ...>): The merged blocks, all with the same id
+            cell_size (tuple<int, int>): The (columns, rows) size of the rectangle
+        """
+        super().__init__(members[0].get_id())
+        self._members = tuple(members)
+        self._cell_size = cell_size
+
+    def get_members(self) -> Tuple[Block, ...]:
+        """(tuple<Block, ...>) Returns the blocks this block was merged from"""
+        return self._members
+
+
 class MysteryBlock(Block):
     """A mystery block drops items when the player hits its underside.
 
@@ -70,13 +93,16 @@ class MysteryBlock(Block):
         self._drop_range = drop_range
         self._active = True
 
-    def get_drops(self) -> Tuple[str, ...]:
+    def get_drops(self, rng: random.Random = random) -> Tuple[str, ...]:
         """Get the drops of the mystery block
 
+        Parameters:
+            rng (random.Random): The source of randomness for the number of drops.
+
         Returns:
             tuple<str, ...>: The item identifiers of the dropped items.
         """
-        return (self._drop,) * random.randint(*self._drop_range)
+        return (self._drop,) * rng.randint(*self._drop_range)
 
     def _drop_items(self, world, drops: Tuple[str]):
         """Drop each of the dropped items into the world.
@@ -86,10 +112,11 @@ class MysteryBlock(Block):
             drops (tuple<str>): A tuple of item identifiers to place.
         """
         x, y = self.get_position()
+        rng = world.get_random()
         for drop in drops:
             if drop is not None:
                 # world.add_item(create_item(drop), TODO: Make this non-hardcoded
-                world.add_item(Coin(), x + random.randint(-10, 10), y - 25)
+                world.add_item(Coin(), x + rng.randint(-10, 10), y - 25)
 
     def on_hit(self, event, data):
         """Callback collision with player event handler."""
@@ -101,11 +128,20 @@ class MysteryBlock(Block):
             self._active = False
 
             # Drop items into the game world
-            drops = self.get_drops()
-            self._drop_items(data[0], drops)
+            drops = self.get_drops(world.get_random())
+            self._drop_items(world, drops)
 
     def is_active(self) -> bool:
         """(bool): Returns true if the block has not yet dropped items."""
         return self._active
 
+    def get_state(self) -> dict:
+        state = super().get_state()
+        state["active"] = self._active
+        return state
+
+    def set_state(self, state: dict):
+        super().set_state(state)
+        self._active = state["active"]
+
 
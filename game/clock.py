@@ -0,0 +1,66 @@
+"""
+A clock to advance the game world in fixed time steps, independent of how often
+it is rendered
+"""
+
+import time
+
+# The maximum number of steps released by a single tick, to prevent a slow frame
+# from causing ever more steps to be needed to catch up
+MAX_STEPS_PER_TICK = 5
+
+
+class FixedStepClock:
+    """Accumulates elapsed wall-clock time and releases it in fixed size steps.
+
+    Each call to tick returns the number of whole steps which have elapsed since
+    the previous tick. Time which does not make up a whole step is carried over
+    to the next tick, and is available as an interpolation factor through get_alpha.
+    """
+
+    def __init__(self, step_size: float, max_steps: int = MAX_STEPS_PER_TICK, timer=time.perf_counter):
+        """Constructor
+
+        Parameters:
+            step_size (float): The size of each step, in seconds
+            max_steps (int): The maximum number of steps released by a single tick
+            timer (Callable<> -> float): Returns the current time, in seconds
+        """
+        self._step_size = step_size
+        self._max_steps = max_steps
+        self._timer = timer
+
+        self._last_time = timer()
+        self._accumulator = 0.
+
+    def get_step_size(self) -> float:
+        """(float) Returns the size of each step, in seconds"""
+        return self._step_size
+
+    def reset(self):
+        """Discards any accumulated time, e.g. after the game has been paused"""
+        self._last_time = self._timer()
+        self._accumulator = 0.
+
+    def tick(self) -> int:
+        """Accumulates the time elapsed since the last tick
+
+        Returns:
+            (int): The number of whole steps to advance by
+        """
+        now = self._timer()
+        self._accumulator += now - self._last_time
+        self._last_time = now
+
+        steps = int(self._accumulator // self._step_size)
+        if steps > self._max_steps:
+            # Drop the time that cannot be caught up with
+            steps = self._max_steps
+            self._accumulator = self._step_size * steps
+
+        self._accumulator -= steps * self._step_size
+        return steps
+
+    def get_alpha(self) -> float:
+        """(float) Returns the fraction of a step accumulated since the last whole step, in [0, 1)"""
+        return self._accumulator / self._step_size
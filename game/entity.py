@@ -72,6 +72,15 @@ class Entity:
         """
         pass
 
+    def get_state(self) -> dict:
+        """(dict) Returns the state this entity has gained since it was created,
+        e.g. its position, so that it can be recreated later, see set_state"""
+        return {}
+
+    def set_state(self, state: dict):
+        """Restores the state of this entity from a dict returned by get_state"""
+        pass
+
 
 class DynamicEntity(Entity):
     """An entity that has the ability to move with a velocity.
@@ -134,6 +143,19 @@ class DynamicEntity(Entity):
         """Set whether the player is currently jumping."""
         self._jumping = jumping
 
+    def get_state(self) -> dict:
+        state = super().get_state()
+        state.update(position=self.get_position(), velocity=tuple(self.get_velocity()),
+                     health=self._health, jumping=self._jumping)
+        return state
+
+    def set_state(self, state: dict):
+        super().set_state(state)
+        self.get_shape().body.position = state["position"]
+        self.set_velocity(state["velocity"])
+        self._health = state["health"]
+        self._jumping = state["jumping"]
+
 
 class BoundaryWall(Entity):
     """A boundary wall to prevent movement off the edge of the game world"""
@@ -2,9 +2,7 @@
 Classes to represent non-playable computer-controlled moving entity.
 """
 
-import random
 import pymunk
-import time
 
 from game.entity import DynamicEntity
 from game.util import get_collision_direction
@@ -13,6 +11,9 @@ from game.item import Coin
 MOB_DEFAULT_TEMPO = 30
 MOB_DEFAULT_WEIGHT = 100
 
+# Seconds between a cloud mob's drops
+CLOUD_DROP_DELAY = 2
+
 
 class Mob(DynamicEntity):
     """An abstract representation of a creature in the sandbox game
@@ -85,6 +86,16 @@ class Mob(DynamicEntity):
         vx = self.get_tempo()
         self.set_velocity((vx, self.get_velocity()[1]))
 
+    def get_state(self) -> dict:
+        state = super().get_state()
+        state.update(tempo=self._tempo, steps=self._steps)
+        return state
+
+    def set_state(self, state: dict):
+        super().set_state(state)
+        self._tempo = state["tempo"]
+        self._steps = state["steps"]
+
     def __repr__(self):
         return f"{self.__class__.__name__}({self._id!r})"
 
@@ -120,13 +131,15 @@ class CloudMob(Mob):
                               the cloud will start firing.
         """
         super().__init__(self._id, size=(16, 24), weight=0, tempo=80)
-        self._last_drop = time.time()
+        # Time since the last drop, in seconds
+        self._last_drop = 0
         self._fire_range = fire_range
 
     def step(self, time_delta, game_data):
         """Move towards the player and fire when within range."""
         world, player = game_data
         vx, vy = self.get_velocity()
+        self._last_drop += time_delta
 
         mob_x, mob_y = self.get_position()
         player_x, player_y = player.get_position()
@@ -135,10 +148,10 @@ class CloudMob(Mob):
         if abs(player_x - mob_x) < self._fire_range:
             vx = 0
             # only fire after a delay
-            if time.time() - self._last_drop >= 2:
+            if self._last_drop >= CLOUD_DROP_DELAY:
                 x, y = self.get_position()
 
-                rand_val = random.randint(1, 10)
+                rand_val = world.get_random().randint(1, 10)
                 # occasionally drop a coin instead
                 if rand_val == 1:
                     drop = Coin()
@@ -146,7 +159,7 @@ class CloudMob(Mob):
                 else:
                     drop = Fireball()
                     world.add_mob(drop, x, y + 22)
-                self._last_drop = time.time()
+                self._last_drop = 0
 
         # move towards the player
         elif player_x < mob_x:
@@ -155,3 +168,12 @@ class CloudMob(Mob):
             vx = self.get_tempo()
 
         self.set_velocity((vx, 0))
+
+    def get_state(self) -> dict:
+        state = super().get_state()
+        state["last_drop"] = self._last_drop
+        return state
+
+    def set_state(self, state: dict):
+        super().set_state(state)
+        self._last_drop = state["last_drop"]
@@ -0,0 +1,152 @@
+"""
+Instrumentation to time the named sections of each step of the game
+"""
+
+import json
+import time
+from collections import deque
+from typing import Dict, List
+
+# The number of recent samples of each section kept
+DEFAULT_WINDOW = 300
+
+# Upper bounds, in milliseconds, of the histogram buckets of section times
+HISTOGRAM_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, float('inf'))
+
+
+class _Section:
+    """Context manager timing one named section into its samples"""
+
+    __slots__ = ('_samples', '_start')
+
+    def __init__(self, samples: deque):
+        self._samples = samples
+        self._start = 0.
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self._samples.append(time.perf_counter() - self._start)
+
+
+class _NullSection:
+    """Context manager for sections of a disabled profiler, which does nothing"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NULL_SECTION = _NullSection()
+
+
+class Profiler:
+    """Times named sections of code, keeping a rolling window of recent samples of each.
+
+    Sections are timed with a with statement:
+        with profiler.section("physics"):
+            ...
+
+    A disabled profiler hands out a shared section which does nothing, so that
+    instrumented code costs next to nothing when it is not being profiled.
+    """
+
+    def __init__(self, enabled: bool = True, window: int = DEFAULT_WINDOW):
+        """Constructor
+
+        Parameters:
+            enabled (bool): Whether sections are timed
+            window (int): The number of recent samples kept for each section
+        """
+        self._enabled = enabled
+        self._window = window
+        self._samples = {}
+        self._sections = {}
+
+    def is_enabled(self) -> bool:
+        """(bool) Returns True iff sections are being timed"""
+        return self._enabled
+
+    def set_enabled(self, enabled: bool):
+        """Sets whether sections are timed"""
+        self._enabled = enabled
+
+    def section(self, name: str):
+        """Returns a context manager which times the named section
+
+        Parameters:
+            name (str): The name of the section, e.g. 'physics'
+        """
+        if not self._enabled:
+            return _NULL_SECTION
+
+        section = self._sections.get(name)
+        if section is None:
+            samples = self._samples[name] = deque(maxlen=self._window)
+            section = self._sections[name] = _Section(samples)
+        return section
+
+    def get_stats(self) -> Dict[str, dict]:
+        """Summarises the recent samples of each section
+
+        Returns:
+            (dict<str: dict>): For each section, the number of samples kept, the mean,
+                               50th/95th percentile and maximum times in milliseconds,
+                               and a histogram counting samples up to each bucket bound
+        """
+        stats = {}
+        for name, samples in self._samples.items():
+            if not samples:
+                continue
+
+            times = sorted(sample * 1000 for sample in samples)
+            histogram = [0] * len(HISTOGRAM_BUCKETS)
+            bucket = 0
+            for value in times:
+                while value > HISTOGRAM_BUCKETS[bucket]:
+                    bucket += 1
+                histogram[bucket] += 1
+
+            stats[name] = {
+                "samples": len(times),
+                "mean_ms": sum(times) / len(times),
+                "p50_ms": times[len(times) // 2],
+                "p95_ms": times[min(len(times) - 1, int(len(times) * .95))],
+                "max_ms": times[-1],
+                "histogram": histogram,
+            }
+
+        return stats
+
+    def format_stats(self) -> List[str]:
+        """(list<str>) Returns a line summarising the recent samples of each section"""
+        return [f"{name:<10} {stat['mean_ms']:6.2f} {stat['p95_ms']:6.2f} {stat['max_ms']:6.2f}"
+                for name, stat in self.get_stats().items()]
+
+    def dump(self, filename: str):
+        """Writes the summary of each section to a JSON file
+
+        Parameters:
+            filename (str): The name of the file to write
+        """
+        report = {
+            "time": time.time(),
+            "histogram_buckets_ms": [str(bound) for bound in HISTOGRAM_BUCKETS],
+            "sections": self.get_stats(),
+        }
+        with open(filename, 'w') as file:
+            json.dump(report, file, indent=2)
+
+    def clear(self):
+        """Discards the samples of every section"""
+        for samples in self._samples.values():
+            samples.clear()
+
+
+# A disabled profiler, for things which are not being profiled
+NULL_PROFILER = Profiler(enabled=False)
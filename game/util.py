@@ -2,6 +2,9 @@
 Some utility & miscellany for the game engine
 """
 
+import os
+import tempfile
+
 from game.entity import DynamicEntity, Entity
 
 ABOVE = "A"
@@ -13,6 +16,54 @@ LEFT = "L"
 def get_collision_direction(entity: DynamicEntity, other: Entity):
     """Get the direction where from which a collision event occurred.
 
+    Classifies the collision in constant time from the bounding boxes of the two
+    entities, testing the same probe points as probe_collision_direction. Every
+    shape in the game is an axis-aligned rectangle, so a probe point is inside the
+    other entity's shape exactly when it is inside its bounding box.
+
+    Parameters:
+        entity (DynamicEntity): Colliding entity.
+        other (Entity): The entity with which the colliding entity collided.
+
+    Returns:
+        (str): The direction the collision occurred in, or None if it is unknown.
+
+        "A" for Above
+        "B" for Below
+        "R" for Right
+        "L" for Left
+    """
+    bb = entity.get_shape().bb
+    left, right, top, bottom = bb.left, bb.right, bb.top, bb.bottom
+    cx = (left + right) / 2
+    cy = (bottom + top) / 2
+    lx = cx - (cx - left) / 2
+    rx = cx + (cx - left) / 2
+
+    other_bb = other.get_shape().bb
+    other_left, other_right = other_bb.left, other_bb.right
+    other_bottom, other_top = other_bb.bottom, other_bb.top
+
+    if other_bottom < top < other_top and (other_left < cx < other_right or other_left < lx < other_right
+                                           or other_left < rx < other_right):
+        return ABOVE
+    if other_bottom < bottom < other_top and (other_left < cx < other_right or other_left < lx < other_right
+                                              or other_left < rx < other_right):
+        return BELOW
+    if other_bottom < cy < other_top:
+        if other_left < left < other_right:
+            return RIGHT
+        if other_left < right < other_right:
+            return LEFT
+
+
+def probe_collision_direction(entity: DynamicEntity, other: Entity):
+    """Get the direction where from which a collision event occurred.
+
+    Queries the other entity's shape at up to eight points on the edges of the
+    colliding entity. This is the reference for get_collision_direction, which is
+    faster and should be preferred.
+
     Parameters:
         entity (DynamicEntity): Colliding entity.
         other (Entity): The entity with which the colliding entity collided.
@@ -72,3 +123,22 @@ def positions_in_range(position1, position2, max_distance):
         max_distance (float): The maximum distance between position1 & position2
     """
     return euclidean_square_distance(position1, position2) <= max_distance ** 2
+
+
+def write_atomic(filename: str, data: bytes):
+    """Write a file so that readers only ever see its old or its new contents
+
+    The data is written to a temporary file next to it, which then replaces the file.
+    The directory of the file is created if it does not exist.
+    """
+    directory = os.path.dirname(os.path.abspath(filename))
+    os.makedirs(directory, exist_ok=True)
+
+    descriptor, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(data)
+        os.replace(temporary, filename)
+    except BaseException:
+        os.unlink(temporary)
+        raise
@@ -3,7 +3,7 @@ View classes for the sandbox game
 """
 
 import tkinter as tk
-from typing import Iterable, Tuple, List
+from typing import Iterable, Tuple, List, Optional
 from functools import singledispatch, update_wrapper
 
 import pymunk
@@ -13,6 +13,12 @@ from game.block import Block
 from game.item import DroppedItem
 from game.mob import Mob
 
+# Canvas tag shared by the items of all drawn entities
+ENTITY_TAG = "entity"
+
+# Default distance, in pixels, beyond the view edges within which entities are drawn
+DEFAULT_CULL_MARGIN = 32
+
 
 # Warning: You do not need to understand how this function works
 def singledispatchmethod(func):
@@ -38,17 +44,17 @@ class ViewRenderer:
     Renderer class that informs the view of how entities within the game should
     be rendered.
 
-    The draw method is the main rendering router. It utilizes single method
-    dispatch to appropriately render entities.
+    The get_image method is the main rendering router. It utilizes single method
+    dispatch to select the image an entity should currently be displayed with.
+    Entities without an image fall back to the draw method, which creates
+    their canvas elements directly.
 
-    Each entity draw method must take the following parameters:
+    Each entity get_image method must take the following parameters:
         instance (Entity): The entity to draw
         shape (pymunk.Shape): The entities shape in the world
-        view (tk.Canvas): The canvas on which to draw the entity
-        offset (tuple<int, int>): The offset of the logical view from the canvas.
 
-    To implement a new view method, add a decorator to the draw method of the form:
-        @ViewRenderer.draw.register(Type)
+    To implement a new view method, add a decorator to the get_image method of the form:
+        @ViewRenderer.get_image.register(Type)
     Where Type would be the class of the entity you wish to render.
     """
 
@@ -86,51 +92,61 @@ class ViewRenderer:
         return image
 
     @singledispatchmethod
-    def draw(self, instance: Entity, shape: pymunk.Shape,
-             view: tk.Canvas, offset: Tuple[int, int]) -> List[int]:
-        """Method to draw the canvas elements for the given entity.
+    def get_image(self, instance: Entity, shape: pymunk.Shape) -> Optional[tk.PhotoImage]:
+        """Method to select the image the given entity is currently displayed with.
 
-        Using the singledispatchmethod annotation the functionality of the draw
+        Using the singledispatchmethod annotation the functionality of the get_image
         method is overloaded by different entity types.
-        Any methods registered to this method using the @draw.register annotation
+        Any methods registered to this method using the @get_image.register annotation
         will overload the instance parameter.
 
         Parameters:
             instance (Entity): The entity to draw
             shape (pymunk.Shape): The entities shape in the world
-            view (tk.Canvas): The canvas on which to draw the entity
-            offset (tuple<int, int>): The offset of the logical view from the canvas.
+
+        Returns:
+            (tk.PhotoImage): The image to display, or None if the entity should
+                             be drawn by the draw method instead.
         """
-        return [view.create_rectangle(shape.bb.left + offset[0], shape.bb.top,
-                                      shape.bb.right + offset[0], shape.bb.bottom,
-                                      fill='black', tag='undefined')]
+        return None
 
-    @draw.register(Block)
-    def _draw_block(self, instance: Block, shape: pymunk.Shape,
-                    view: tk.Canvas, offset: Tuple[int, int]) -> List[int]:
-        image = self.load_image(self._block_images[instance.get_id()])
-        return [view.create_image(shape.bb.center().x + offset[0], shape.bb.center().y,
-                                  image=image, tags="block")]
+    @get_image.register(Block)
+    def _get_block_image(self, instance: Block, shape: pymunk.Shape) -> tk.PhotoImage:
+        return self.load_image(self._block_images[instance.get_id()])
 
-    @draw.register(DroppedItem)
-    def _draw_physical_item(self, instance: DroppedItem, shape: pymunk.Shape,
-                            view: tk.Canvas, offset: Tuple[int, int]) -> List[int]:
-        image = self.load_image(self._item_images[instance.get_id()])
-        return [view.create_image(shape.bb.center().x + offset[0], shape.bb.center().y,
-                                  image=image, tags="item")]
+    @get_image.register(DroppedItem)
+    def _get_physical_item_image(self, instance: DroppedItem, shape: pymunk.Shape) -> tk.PhotoImage:
+        return self.load_image(self._item_images[instance.get_id()])
 
-    @draw.register(Mob)
-    def _draw_mob(self, instance: Mob, shape: pymunk.Shape,
-                        view: tk.Canvas, offset: Tuple[int, int]) -> List[int]:
-        image = self.load_image(self._mob_images[instance.get_id()])
-        return [view.create_image(shape.bb.center().x + offset[0], shape.bb.center().y,
-                                  image=image, tags="mob")]
+    @get_image.register(Mob)
+    def _get_mob_image(self, instance: Mob, shape: pymunk.Shape) -> tk.PhotoImage:
+        return self.load_image(self._mob_images[instance.get_id()])
+
+    def draw(self, instance: Entity, shape: pymunk.Shape,
+             view: tk.Canvas, offset: Tuple[int, int]) -> List[int]:
+        """Draw the canvas elements for an entity which has no image.
+
+        Parameters:
+            instance (Entity): The entity to draw
+            shape (pymunk.Shape): The entities shape in the world
+            view (tk.Canvas): The canvas on which to draw the entity
+            offset (tuple<int, int>): The offset of the logical view from the canvas.
+        """
+        return [view.create_rectangle(shape.bb.left + offset[0], shape.bb.top + offset[1],
+                                      shape.bb.right + offset[0], shape.bb.bottom + offset[1],
+                                      fill='black', tag='undefined')]
 
 
 class GameView(tk.Canvas):
-    """A view class for the sandbox game, with convenience methods to draw various parts of the UI"""
+    """A view class for the sandbox game, with convenience methods to draw various parts of the UI
+
+    Entities are drawn in retained mode: each entity keeps a single canvas item for
+    as long as it is drawn, which is only moved or reconfigured when the entity's
+    position or image changes, and deleted once the entity is no longer drawn.
+    """
 
-    def __init__(self, master, size, physical_view_router: ViewRenderer):
+    def __init__(self, master, size, physical_view_router: ViewRenderer,
+                 cull_margin: int = DEFAULT_CULL_MARGIN):
         """Constructor
 
         Parameters:
@@ -138,14 +154,29 @@ class GameView(tk.Canvas):
             size (tuple<int, int>): The (width, height) size of the view, in pixels
             physical_view_router (ViewRenderer):
                     View router that facilitates drawing of physical items through
-                    calling draw method with:
-                        (entity, entities shape, self (canvas), offset)
+                    calling get_image method with:
+                        (entity, entities shape)
+            cull_margin (int): The distance, in pixels, beyond the edges of the view
+                               within which entities are still drawn
         """
         width, height = size
         super().__init__(master, width=width, height=height, bg="#6080ff")
 
         self._world_view_router = physical_view_router
         self._offset = (0, 0)
+        self._size = size
+        self._cull_margin = cull_margin
+
+        # How far ahead of the last world step, in seconds, moving entities are drawn
+        self._lookahead = 0.
+
+        # The canvas id of the text overlay, if shown
+        self._overlay = None
+
+        # The offset at which the entity canvas items are currently placed
+        self._drawn_offset = (0, 0)
+        # Mapping of drawn entities to their [canvas ids, image, x, y] record
+        self._items = {}
 
     def shift(self, offset: Tuple[int, int]):
         """Shift the view offset by the given offset.
@@ -164,13 +195,152 @@ class GameView(tk.Canvas):
         """(tuple<int, int>): Return the X and Y pixel offsets of the view."""
         return self._offset
 
+    def get_renderer(self) -> ViewRenderer:
+        """(ViewRenderer): Return the renderer selecting how entities are drawn."""
+        return self._world_view_router
+
+    def set_cull_margin(self, margin: int):
+        """Sets the distance, in pixels, beyond the view edges within which entities are drawn."""
+        self._cull_margin = margin
+
+    def set_interpolation(self, alpha: float, step_size: float):
+        """Sets how far between world steps the view is being drawn.
+
+        Moving entities are drawn ahead of their last stepped position by their velocity
+        over this fraction of a step, which keeps motion smooth when the display and the
+        world step at different rates.
+
+        Parameters:
+            alpha (float): The fraction of a step elapsed since the last world step, in [0, 1)
+            step_size (float): The size of a world step, in seconds
+        """
+        self._lookahead = alpha * step_size
+
+    def get_viewport(self) -> Tuple[float, float, float, float]:
+        """Returns the region of the world currently visible in the view, extended by the cull margin
+
+        Return:
+            tuple<float, float, float, float>: The (left, top, right, bottom) world coordinates
+        """
+        width = self.winfo_width()
+        height = self.winfo_height()
+        # The canvas reports a size of 1 until it has been mapped
+        if width <= 1 or height <= 1:
+            width, height = self._size
+
+        margin = self._cull_margin
+        left = -self._offset[0] - margin
+        top = -self._offset[1] - margin
+
+        return left, top, left + width + 2 * margin, top + height + 2 * margin
+
     def draw_entities(self, things: Iterable[Entity]):
-        """Draws all entities, according to their draw method (on the view renderer)
+        """Draws all entities, according to their get_image method (on the view renderer)
+
+        Canvas items are only created for entities which were not drawn by the
+        previous call, and deleted for entities which are no longer given. To
+        only draw the entities in view, see get_viewport.
 
         Parameters:
             things (iterable<Entity>): The entities to draw.
         """
+        offset_x, offset_y = offset = self._offset
+
+        # Scrolling moves every entity item with a single canvas call
+        dx = offset_x - self._drawn_offset[0]
+        dy = offset_y - self._drawn_offset[1]
+        if dx or dy:
+            self.move(ENTITY_TAG, dx, dy)
+            self._drawn_offset = offset
+
+        previous = self._items
+        items = {}
+        get_image = self._world_view_router.get_image
+        lookahead = self._lookahead
+
         for thing in things:
             shape = thing.get_shape()
+            x, y = shape.bb.center()
+            if lookahead:
+                velocity_x, velocity_y = shape.body.velocity
+                x += velocity_x * lookahead
+                y += velocity_y * lookahead
+            x, y = round(x), round(y)
+            image = get_image(thing, shape)
+
+            record = previous.pop(thing, None)
+            if record is None:
+                record = [self._create_item(thing, shape, image, x, y), image, x, y]
+            else:
+                ids, old_image, old_x, old_y = record
+                if x != old_x or y != old_y:
+                    if image is None:
+                        for item in ids:
+                            self.move(item, x - old_x, y - old_y)
+                    else:
+                        self.coords(ids[0], x + offset_x, y + offset_y)
+                    record[2] = x
+                    record[3] = y
+
+                if image is not old_image:
+                    if old_image is None or image is None:
+                        self.delete(*ids)
+                        record[0] = self._create_item(thing, shape, image, x, y)
+                    else:
+                        self.itemconfigure(ids[0], image=image)
+                    record[1] = image
+
+            items[thing] = record
+
+        # Anything left over is no longer in the world
+        for ids, *_ in previous.values():
+            self.delete(*ids)
+
+        self._items = items
+
+    def _create_item(self, thing: Entity, shape: pymunk.Shape,
+                     image: Optional[tk.PhotoImage], x: int, y: int) -> List[int]:
+        """Create the canvas items for an entity which is not yet drawn.
+
+        Returns:
+            (list<int>): The ids of the created canvas items.
+        """
+        offset_x, offset_y = self._offset
+        if image is not None:
+            ids = [self.create_image(x + offset_x, y + offset_y, image=image, tags=ENTITY_TAG)]
+        else:
+            ids = self._world_view_router.draw(thing, shape, self, self._offset)
+            for item in ids:
+                self.addtag_withtag(ENTITY_TAG, item)
 
-            self._world_view_router.draw(thing, shape, self, self._offset)
+        # Static things scroll into view after moving things were drawn, keep them underneath
+        if shape.body.body_type == pymunk.Body.STATIC:
+            for item in ids:
+                self.tag_lower(item)
+
+        return ids
+
+    def show_overlay(self, lines: List[str]):
+        """Shows lines of text in the top left corner of the view, above everything else
+
+        Parameters:
+            lines (list<str>): The lines of text to show
+        """
+        text = "\n".join(lines)
+        if self._overlay is None:
+            self._overlay = self.create_text(4, 4, anchor=tk.NW, text=text,
+                                             font=("Courier", 9), fill="white")
+        else:
+            self.itemconfigure(self._overlay, text=text)
+        self.tag_raise(self._overlay)
+
+    def hide_overlay(self):
+        """Hides the text overlay, if shown"""
+        if self._overlay is not None:
+            self.delete(self._overlay)
+            self._overlay = None
+
+    def clear(self):
+        """Delete every entity drawn on the view."""
+        self.delete(ENTITY_TAG)
+        self._items = {}
@@ -0,0 +1,51 @@
+"""
+Watching files for changes, by polling their modification time and size
+"""
+
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+def file_key(filename: str) -> Optional[Tuple[int, int]]:
+    """Returns the (modification time (ns), size) of a file, or None if it does not exist"""
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class FileWatcher:
+    """Reports the files which have changed since they were last checked.
+
+    Files are polled rather than watched by the operating system, so the watcher
+    needs no extra dependencies and only costs a stat of each file when checked.
+    """
+
+    def __init__(self, filenames: Iterable[str] = ()):
+        """Constructor
+
+        Parameters:
+            filenames (iterable<str>): The files to watch
+        """
+        self._keys: Dict[str, Optional[Tuple[int, int]]] = {}
+        self.watch(filenames)
+
+    def watch(self, filenames: Iterable[str]):
+        """Watch the given files, instead of those watched before
+
+        Files which were already watched keep the key they were last checked with,
+        so changes which have not been checked yet are still reported.
+        """
+        self._keys = {filename: self._keys[filename] if filename in self._keys else file_key(filename)
+                      for filename in filenames}
+
+    def get_changed(self) -> List[str]:
+        """(list<str>) Returns the watched files which have changed since they were last checked"""
+        changed = []
+        for filename, key in self._keys.items():
+            current = file_key(filename)
+            if current != key:
+                self._keys[filename] = current
+                changed.append(filename)
+        return changed
@@ -2,15 +2,18 @@
 A class to represent a world made up of physical things
 """
 
+import bisect
+import math
+import random
 import pymunk
-import time
-from typing import Tuple, Iterable
+from typing import Tuple, Iterable, List, Optional
 
 from game.entity import BoundaryWall, Entity
 from player import Player
 from game.item import DroppedItem
-from game.block import Block
+from game.block import Block, MergedBlock
 from game.mob import Mob
+from game.profiler import Profiler, NULL_PROFILER
 
 # The intention with the following constants is to express a finite range of values that
 # can effectively be treated as their own type in this code. We have used collections of
@@ -45,6 +48,10 @@ COLLISION_HANDLER_CALLBACKS = {'begin', 'separate', 'pre_solve', 'post_solve'}
 # The size of a time delta between steps
 STEP_SIZE = 0.02
 
+# The categories of things which are stepped, in the order they are stepped each tick
+# Things added with any other query category are registered as 'other'
+STEPPED_CATEGORIES = ('player', 'mob', 'item', 'other')
+
 
 class World:
     """Game world that contains things in physical space.
@@ -92,6 +99,11 @@ class World:
 
         self._space.gravity = gravity
 
+        # Walls and blocks are attached to a static body of the world's own, as the space's
+        # static body is freed with the space, which is replaced when the world is restored
+        self._static_body = pymunk.Body(body_type=pymunk.Body.STATIC)
+        self._walls = []
+
         self._grid_size = grid_size
         self._cell_expanse = cell_expanse
 
@@ -99,7 +111,61 @@ class World:
 
         self._create_boundaries(boundary_thickness)
 
-        self._last_time = time.time()
+        # Dense row-major index of the block occupying each grid cell, or None
+        columns, rows = grid_size
+        self._block_grid = [None] * (columns * rows)
+        # The grid cells occupied by each block in the world
+        self._block_cells = {}
+        # The blocks occupying each grid cell occupied by more than one block, e.g. the
+        # flagpole and the blocks beside it, in the order they were added; the grid holds the last
+        self._cell_owners = {}
+        # The merged block which collides in place of each merged member block
+        self._merged = {}
+        # Shapes of blocks waiting to be added to the space, see defer_blocks
+        self._deferred_blocks = None
+        # Things with lower keys were added to the space before the deferred blocks were
+        self._deferred_key = 0
+
+        # The pymunk handler of each pair of collision types, with the rules and
+        # resolved handlers of each of its events, see add_collision_handler
+        self._collision_dispatch = {}
+
+        self._random = random.Random()
+        self._profiler = NULL_PROFILER
+
+        # Things which are stepped, by category, in the order they were added
+        # Static blocks and walls do nothing when stepped, so they are never registered
+        self._stepped = {category: {} for category in STEPPED_CATEGORIES}
+
+        self._player = None
+        # The horizontal distance from the player within which things are active
+        self._activation_range = None
+        # The order each stepped thing in the space is stepped in, a (category, addition) pair
+        self._unparked = {}
+        # The (x position, step order) of each thing out of the activation range, whose body
+        # is taken out of the space so does not move until it is back within range
+        self._parked = {}
+        # The (x position, step order, thing) of each parked thing, sorted by position
+        self._parked_index = []
+        self._next_step_order = 0
+        # The things stepped by the last step
+        self._active_things = []
+        # The objects added to or removed from the space while it is being stepped, e.g.
+        # by collision callbacks, with whether each was in the space before the step and
+        # whether it should be after, in the order they were first changed; see step
+        self._space_changes = None
+
+        # The key identifying each thing in snapshots, for things in the world and
+        # things removed from it which a snapshot may need to add back, see snapshot
+        self._keys = {}
+        self._next_key = 0
+        # Removed things which were in the world when the last snapshot was taken, by key
+        self._retired = {}
+        self._snapshot_key = 0
+        # The grid placement (column, row, width, height) of each block added to the grid
+        self._block_placements = {}
+        # The ids of blocks which are merged, see merge_blocks
+        self._merged_ids = set()
 
     def get_space(self) -> pymunk.Space:
         """(pymunk.Space): Return the space used by the world."""
@@ -117,10 +183,56 @@ class World:
         ]
 
         for wall_id, top_left, bottom_right in walls:
-            wall = BoundaryWall(wall_id, self._space.static_body,
+            wall = BoundaryWall(wall_id, self._static_body,
                                 top_left, bottom_right, thickness)
 
             self._space.add(wall.get_shape())
+            self._walls.append(wall.get_shape())
+
+    def get_random(self) -> random.Random:
+        """(random.Random): Return the source of randomness for things in the world."""
+        return self._random
+
+    def set_random(self, rng: random.Random):
+        """Sets the source of randomness for things in the world
+
+        Sharing a seeded generator between worlds makes a game reproducible.
+
+        Parameters:
+            rng (random.Random): The random number generator to use
+        """
+        self._random = rng
+
+    def set_profiler(self, profiler: Profiler):
+        """Sets the profiler which times the 'entities', 'physics' and 'collisions' sections
+        of each step
+
+        Parameters:
+            profiler (Profiler): The profiler to use
+        """
+        self._profiler = profiler
+
+    def set_activation_range(self, distance: float = None):
+        """Sets the horizontal distance from the player within which things are active
+
+        Things outside of this range are parked: they are no longer stepped and their
+        bodies are taken out of the space, so they are not simulated, until they come
+        back within range. They are still part of the world, see get_all_things.
+
+        Pymunk's own sleeping is not used, since putting bodies to sleep by hand can
+        corrupt the space when they are touching other bodies.
+
+        Parameters:
+            distance (float): The activation range in pixels, or None to keep everything active
+        """
+        self._activation_range = distance
+
+        if distance is None:
+            self._unpark_all()
+
+    def get_activation_range(self) -> float:
+        """(float) Returns the distance from the player within which things are active, or None"""
+        return self._activation_range
 
     def set_gravity(self, gravity_x, gravity_y):
         """Sets the gravity of the world
@@ -144,27 +256,192 @@ class World:
         return self._cell_expanse
 
     def step(self, game_data):
-        """Steps the game world forward by one time step
+        """Steps the game world forward by one fixed time step of STEP_SIZE seconds
 
         1. Advances all things in the game world forward by one time step
             step method is called on each thing, with:
-                - time_delta: the time (in seconds) since the last step
+                - time_delta: the size of the time step (in seconds)
                 - game_data: the game_data parameter supplied to this method
         2. Applies/resolves physics
 
+        The world is stepped by the same amount of time regardless of how long it has
+        been since the last step. To keep pace with wall-clock time, see FixedStepClock.
+
+        If an activation range is set, only the things within range of the player are
+        stepped, see set_activation_range.
+
         Parameters:
             game_data (tuple<World, Player>): Arbitrary data to be passed on to all things
         """
-        now = time.time()
-        time_delta = now - self._last_time
-        for shape in self._space.shapes:
-            thing = shape.object
+        profiler = self._profiler
+
+        with profiler.section("entities"):
+            if self._activation_range is None or self._player is None:
+                things = self.get_stepped_things()
+            else:
+                things = self._activate()
+            self._active_things = things
+
+            for thing in things:
+                # Things may be removed by those stepped before them, e.g. a fireball
+                if self.is_stepped(thing):
+                    thing.step(STEP_SIZE, game_data)
+
+        with profiler.section("physics"):
+            self._space_changes = {}
+            try:
+                self._space.step(STEP_SIZE)
+            finally:
+                changes, self._space_changes = self._space_changes, None
+
+            # Pymunk defers changes made during a step into sets, which it applies in an
+            # order that depends on object ids, so replays would not reproduce a game
+            for obj, (present, wanted) in changes.items():
+                if wanted and not present:
+                    self._space.add(obj)
+                elif present and not wanted:
+                    self._space.remove(obj)
+
+    def _activate(self) -> List[Entity]:
+        """Returns the things within the activation range of the player to the space
+        and parks the things which have left it
+
+        Only the things in the space are checked for leaving the range. Parked things
+        do not move, so those entering the range are found from their position in the
+        parked index, and the cost of a step does not grow with the number of them.
+
+        Returns:
+            (list<Entity>): The things within the activation range, in the order they are stepped
+        """
+        x, _ = self._player.get_position()
+        left = x - self._activation_range
+        right = x + self._activation_range
+        unparked = self._unparked
+
+        leaving = [thing for thing in unparked if not left <= thing.get_shape().body.position.x <= right]
+        for thing in leaving:
+            self._park(thing)
+
+        index = self._parked_index
+        start = bisect.bisect_left(index, (left,))
+        end = bisect.bisect_right(index, (right, (math.inf,)))
+        for _, order, thing in index[start:end]:
+            del self._parked[thing]
+            self._return_parked(thing, order)
+        del index[start:end]
+
+        return sorted(unparked, key=unparked.__getitem__)
+
+    def _park(self, thing: Entity):
+        """Takes the body of a stepped thing out of the space until it is back within range"""
+        shape = thing.get_shape()
+        key = shape.body.position.x, self._unparked.pop(thing)
+        self._parked[thing] = key
+        bisect.insort(self._parked_index, key + (thing,))
+        self._space.remove(shape.body, shape)
+
+    def _return_parked(self, thing: Entity, order: Tuple[int, int]):
+        """Puts the body of a thing taken out of the parked things back into the space"""
+        shape = thing.get_shape()
+        self._space.add(shape.body, shape)
+        self._unparked[thing] = order
+
+    def _unpark_all(self):
+        """Puts the bodies of all parked things back into the space"""
+        for thing, (_, order) in self._parked.items():
+            self._return_parked(thing, order)
+        self._parked.clear()
+        self._parked_index.clear()
+
+    def _add_to_space(self, *objs):
+        """Adds bodies and shapes to the space, or once the space has been stepped if it
+        is being stepped"""
+        self._change_space(objs, True)
+
+    def _remove_from_space(self, *objs):
+        """Removes bodies and shapes from the space, or once the space has been stepped if
+        it is being stepped"""
+        self._change_space(objs, False)
+
+    def _change_space(self, objs, wanted: bool):
+        """Adds objects to the space if 'wanted', otherwise removes them, see step"""
+        changes = self._space_changes
+        if changes is None:
+            if wanted:
+                self._space.add(*objs)
+            else:
+                self._space.remove(*objs)
+            return
+
+        for obj in objs:
+            present, _ = changes.get(obj, (not wanted, None))
+            changes[obj] = present, wanted
+
+    def _add_stepped(self, category: str, thing: Entity, shape: pymunk.Shape):
+        """Steps a thing whose body has been added to the space, after those already stepped"""
+        self._stepped[category][thing] = shape
+        self._unparked[thing] = (STEPPED_CATEGORIES.index(category), self._next_step_order)
+        self._next_step_order += 1
+
+    def _remove_stepped(self, thing: Entity) -> Optional[pymunk.Shape]:
+        """Stops stepping a thing
+
+        Returns:
+            (pymunk.Shape): The shape the thing was added to this world with, which may no
+                            longer be its shape if it has since been added to another world,
+                            or None if the thing was parked, so its shape is not in the space
+        """
+        shapes = [things.pop(thing) for things in self._stepped.values() if thing in things]
+        shape = shapes[0] if shapes else thing.get_shape()
 
-            if thing:
-                thing.step(time_delta, game_data)
+        if self._unparked.pop(thing, None) is not None:
+            return shape
+
+        key = self._parked.pop(thing, None)
+        if key is None:
+            return shape
+
+        index = self._parked_index
+        del index[bisect.bisect_left(index, key)]
+        return None
+
+    def _get_stepped_category(self, categories) -> str:
+        """(str) Returns the category a thing with the given query categories is stepped in"""
+        for category in STEPPED_CATEGORIES:
+            if self._thing_categories.get(category) == categories:
+                return category
+        return 'other'
+
+    def get_stepped_things(self, category: str = None) -> List[Entity]:
+        """Returns the things which are stepped each tick, in the order they are stepped
+
+        Parameters:
+            category (str): Only return things of this category, one of STEPPED_CATEGORIES
+
+        Returns:
+            (list<Entity>): A snapshot of the stepped things, which is safe to iterate while
+                            things are added to or removed from the world
+        """
+        if category is not None:
+            return list(self._stepped[category])
 
-        self._space.step(STEP_SIZE)
-        self._last_time = now
+        return [thing for things in self._stepped.values() for thing in things]
+
+    def get_active_things(self) -> List[Entity]:
+        """Returns the things which were stepped by the last step and are still in the world
+
+        With an activation range set, these are the things within range of the player
+        rather than all of the stepped things, see set_activation_range.
+        """
+        return [thing for thing in self._active_things if self.is_stepped(thing)]
+
+    def is_stepped(self, thing: Entity) -> bool:
+        """(bool) Returns True iff the thing is in the world and is stepped each tick"""
+        return any(thing in things for things in self._stepped.values())
+
+    def has_thing(self, thing: Entity) -> bool:
+        """(bool) Returns True iff the thing is a block, the player or another thing in the world"""
+        return thing in self._block_cells or self.is_stepped(thing)
 
     def xy_to_grid(self, x: float, y: float) -> Tuple[int, int]:
         """Converts pixel position (xy) to grid position"""
@@ -178,33 +455,85 @@ class World:
         """Converts grid position to pixel position of its centre"""
         return int((x + .5) * self._cell_expanse), int((y + .5) * self._cell_expanse)
 
-    def _wrap_callback(self, callback):
-        """Wraps a pymunk collision callback into a more OOP form"""
-
-        def wrapped_callback(arbiter, space, data):
-            thing_a, thing_b = [s.object for s in arbiter.shapes]
-            return callback(thing_a, thing_b, data['data'], arbiter)
-
-        return wrapped_callback
-
     def add_collision_handler(self, collision_type_a, collision_type_b, data=None,
-                              on_begin=None, on_separate=None, on_pre_solve=None, on_post_solve=None):
+                              on_begin=None, on_separate=None, on_pre_solve=None, on_post_solve=None,
+                              id_a: str = None, id_b: str = None):
         """Adds a collision handler to the game world
 
+        Handlers can be limited to things with particular ids. For each collision, the
+        callback of each event is looked up by the ids of the two things, preferring a
+        handler for both ids, then the first id, then the second id, then any ids. The
+        handler found for each pair of ids is remembered, so later collisions between
+        things with the same ids are dispatched by a single lookup.
+
+        Adding a handler for the same collision types and ids again replaces the
+        callbacks it is given for each event.
+
         Parameters:
-            collision_type_a (str): A collision type in
+            collision_type_a (str): A collision type in self._collision_types, e.g. 'player'
+            collision_type_b (str): A collision type in self._collision_types, e.g. 'block'
+            data: Arbitrary data passed to the callbacks
+            on_begin, on_separate, on_pre_solve, on_post_solve (Callable):
+                    The callback for each event, called as callback(thing_a, thing_b, data, arbiter)
+            id_a (str): Only handle collisions where the first thing has this id
+            id_b (str): Only handle collisions where the second thing has this id
         """
-        handler = self._space.add_collision_handler(self._collision_types[collision_type_a],
-                                                    self._collision_types[collision_type_b])
+        pair = (self._collision_types[collision_type_a], self._collision_types[collision_type_b])
 
-        handler.data['data'] = data
+        if pair not in self._collision_dispatch:
+            self._collision_dispatch[pair] = (self._space.add_collision_handler(*pair), {})
+        handler, dispatch = self._collision_dispatch[pair]
 
         local_variables = locals()
 
         for key in COLLISION_HANDLER_CALLBACKS:
             callback = local_variables[f"on_{key}"]
-            if callback:
-                setattr(handler, key, self._wrap_callback(callback))
+            if not callback:
+                continue
+
+            # Events without handlers are left to pymunk, so they cost nothing
+            if key not in dispatch:
+                dispatch[key] = ({}, {})
+                setattr(handler, key, self._create_dispatcher(*dispatch[key]))
+
+            rules, resolved = dispatch[key]
+            rules[id_a, id_b] = (callback, data)
+            resolved.clear()
+
+    def _create_dispatcher(self, rules: dict, resolved: dict):
+        """Creates a pymunk collision callback which dispatches to the handler for the
+        ids of the colliding things
+
+        Parameters:
+            rules (dict<tuple<str, str>: tuple<Callable, *>>):
+                    The callback and data of each (id_a, id_b) handler, with None for any id
+            resolved (dict<str: dict<str: tuple<Callable, *>>>):
+                    The handler found for each id_a, then id_b, or None if there is no handler
+        """
+
+        def dispatch(arbiter, space, data):
+            shape_a, shape_b = arbiter.shapes
+            thing_a = shape_a.object
+            thing_b = shape_b.object
+            id_a = thing_a.get_id()
+            id_b = thing_b.get_id()
+
+            try:
+                rule = resolved[id_a][id_b]
+            except KeyError:
+                rule = resolved.setdefault(id_a, {})[id_b] = (rules.get((id_a, id_b))
+                                                              or rules.get((id_a, None))
+                                                              or rules.get((None, id_b))
+                                                              or rules.get((None, None)))
+
+            if rule is None:
+                return True
+
+            callback, callback_data = rule
+            with self._profiler.section("collisions"):
+                return callback(thing_a, thing_b, callback_data, arbiter)
+
+        return dispatch
 
     def get_all_things(self) -> Iterable[Entity]:
         """Yields all physical things in this world, including boundary walls
@@ -215,9 +544,13 @@ class World:
         for shape in self._space.shapes:
             thing = shape.object
 
-            if thing:
+            if isinstance(thing, MergedBlock):
+                yield from thing.get_members()
+            elif thing:
                 yield thing
 
+        yield from list(self._parked)
+
     def add_thing(self, thing: Entity, x: float, y: float, size: Tuple[float, float], collision_type=None,
                   categories=None, mass: float = 1, friction: float = 1):
         """Adds a thing to the game world centred at the position ('x', 'y')
@@ -254,11 +587,18 @@ class World:
         shape.friction = friction
 
         thing.set_shape(shape)
-        self._space.add(body, shape)
+        self._add_to_space(body, shape)
+
+        self._add_stepped(self._get_stepped_category(categories), thing, shape)
+        self._register(thing)
 
     def remove_thing(self, thing: Entity):
         """Removes a thing from the world"""
-        self._space.remove(thing.get_shape())
+        shape = self._remove_stepped(thing)
+        if shape is not None:
+            self._remove_from_space(shape, shape.body)
+
+        self._retire(thing)
 
     def add_player(self, player: Player, x: float, y: float, mass: float = 100, friction: float = .5):
         """Adds a player to game world at the position ('x', 'y')"""
@@ -275,11 +615,201 @@ class World:
 
         player.set_shape(shape)
 
-        self._space.add(body, shape)
+        self._add_to_space(body, shape)
+        self._player = player
+
+        self._add_stepped('player', player, shape)
+        self._register(player)
 
     def remove_player(self, player: Player):
         """Removes the player from the game world"""
-        self._space.remove(player.get_shape())
+        shape = self._remove_stepped(player)
+        if shape is not None:
+            self._remove_from_space(shape, shape.body)
+        if player is self._player:
+            self._player = None
+
+        self._retire(player)
+
+    def _register(self, thing: Entity):
+        """Gives a thing added to the world a key, or takes it back from the retired things"""
+        key = self._keys.get(thing)
+        if key is None:
+            self._keys[thing] = self._next_key
+            self._next_key += 1
+        else:
+            self._retired.pop(key, None)
+
+    def _retire(self, thing: Entity):
+        """Keeps a removed thing if a snapshot may need to add it back, or forgets it"""
+        key = self._keys.get(thing)
+        if key is None:
+            return
+
+        if key < self._snapshot_key:
+            self._retired[key] = thing
+        else:
+            del self._keys[thing]
+            self._block_placements.pop(thing, None)
+
+    def snapshot(self) -> dict:
+        """Captures the state of the world, to return to later with restore
+
+        The snapshot holds the key of each thing in the world with its state (see
+        Entity.get_state), and the state of the world's source of randomness. It only
+        holds lists, numbers, strings and dicts, so can be serialised, e.g. as JSON.
+
+        Things removed from the world after a snapshot is taken are kept by the world,
+        so that they can be added back when it is restored.
+
+        Returns:
+            (dict): The snapshot
+        """
+        self._snapshot_key = self._next_key
+
+        version, internal, gauss = self._random.getstate()
+        return {
+            "things": [[key, thing.get_state()] for thing, key in self._keys.items()
+                       if key not in self._retired],
+            "random": [version, list(internal), gauss],
+            "next_key": self._next_key,
+        }
+
+    def restore(self, snapshot: dict):
+        """Returns the world to the state captured by a snapshot of it
+
+        Things added since the snapshot was taken are removed, things removed since are
+        added back, and the state of every thing is restored. This is much cheaper than
+        building the world again.
+
+        Snapshots taken after the restored one can no longer be restored, so the things
+        kept for them are forgotten.
+
+        Parameters:
+            snapshot (dict): A snapshot of this world, see snapshot
+
+        Raises:
+            ValueError: If the snapshot holds things the world has forgotten, e.g. a
+                        snapshot of another world
+        """
+        things = {key: thing for thing, key in self._keys.items()}
+        states = {key: state for key, state in snapshot["things"]}
+
+        missing = [key for key in states if key not in things]
+        if missing:
+            raise ValueError(f"Unable to restore snapshot, no things with keys {missing[:5]}")
+
+        # Restoring moves parked things, so they are parked again from their new positions
+        self._unpark_all()
+
+        for thing, key in list(self._keys.items()):
+            if key not in states and key not in self._retired:
+                self._remove(thing)
+
+        blocks_added = False
+        for key, state in states.items():
+            thing = things[key]
+            if key in self._retired:
+                self._add_back(thing)
+                blocks_added = blocks_added or isinstance(thing, Block)
+            thing.set_state(state)
+
+        # Merging all of the blocks again merges them into the same rectangles as when built
+        if blocks_added and self._merged_ids:
+            for merged in dict.fromkeys(self._merged.values()):
+                self._split_block(merged)
+            self.merge_blocks(self._merged_ids)
+
+        # The bias velocities the last step left to push overlapping bodies apart are
+        # cleared by integrating each body over no time, as a newly built body has none
+        for things in self._stepped.values():
+            for shape in things.values():
+                body = shape.body
+                position, angle = body.position, body.angle
+                pymunk.Body.update_position(body, 0)
+                body.position, body.angle = position, angle
+
+        self._replace_space()
+
+        version, internal, gauss = snapshot["random"]
+        self._random.setstate((version, tuple(internal), gauss))
+
+        self._snapshot_key = snapshot["next_key"]
+        for key in [key for key in self._retired if key >= self._snapshot_key]:
+            thing = self._retired.pop(key)
+            del self._keys[thing]
+            self._block_placements.pop(thing, None)
+
+    def _replace_space(self):
+        """Moves every body and shape into a new space, adding them in the order a newly
+        built world adds them, so that the world plays out as a newly built one would
+
+        Pymunk keeps state between steps which no longer holds for a restored world, e.g.
+        the contacts between shapes, and collisions are found in an order which depends
+        on the id pymunk gave each shape when it was added. The ids are counted up from
+        zero in each space, so a space things have been added to and removed from never
+        finds collisions quite as a new space would.
+        """
+        old = self._space
+        old.remove(*old.shapes, *old.bodies)
+
+        self._space = space = pymunk.Space()
+        space.gravity = old.gravity
+        for pair, (_, dispatch) in self._collision_dispatch.items():
+            handler = space.add_collision_handler(*pair)
+            for key, tables in dispatch.items():
+                setattr(handler, key, self._create_dispatcher(*tables))
+            self._collision_dispatch[pair] = (handler, dispatch)
+
+        # Things are stepped in the order they were added, as in a newly built world
+        keys = self._keys
+        stepped = sorted(((keys[thing], category, thing, shape) for category, things in self._stepped.items()
+                          for thing, shape in things.items()), key=lambda entry: entry[0])
+        self._stepped = {category: {} for category in STEPPED_CATEGORIES}
+        self._unparked.clear()
+        self._next_step_order = 0
+        for _, category, thing, shape in stepped:
+            self._add_stepped(category, thing, shape)
+
+        # Blocks are added after the things built with them, see defer_blocks
+        blocks = sorted((block for block in self._block_cells if block not in self._merged), key=keys.__getitem__)
+        shapes = [block.get_shape() for block in blocks]
+        shapes.extend(merged.get_shape() for merged in dict.fromkeys(self._merged.values()))
+        random.Random(len(shapes)).shuffle(shapes)
+
+        space.add(*self._walls)
+        for key, _, _, shape in stepped:
+            if key < self._deferred_key:
+                space.add(shape.body, shape)
+        space.add(*shapes)
+        for key, _, _, shape in stepped:
+            if key >= self._deferred_key:
+                space.add(shape.body, shape)
+
+    def _remove(self, thing: Entity):
+        """Removes a thing of any kind from the world"""
+        if isinstance(thing, Block):
+            self.remove_block(thing)
+        elif isinstance(thing, Player):
+            self.remove_player(thing)
+        else:
+            self.remove_thing(thing)
+
+    def _add_back(self, thing: Entity):
+        """Adds a retired thing back to the world, as it was when it was removed"""
+        shape = thing.get_shape()
+
+        if isinstance(thing, Block):
+            self.add_block_to_grid(thing, *self._block_placements[thing], friction=shape.friction)
+            return
+
+        self._add_to_space(shape.body, shape)
+        if isinstance(thing, Player):
+            self._add_stepped('player', thing, shape)
+            self._player = thing
+        else:
+            self._add_stepped(self._get_stepped_category(shape.filter.categories), thing, shape)
+        self._register(thing)
 
     def add_block_to_grid(self, entity, column: int, row: int,
                          width: int, height: int, friction: float = 1.):
@@ -294,12 +824,20 @@ class World:
             friction (float): The friction on the surface of the block
         """
 
+        self._add_block_shape(entity, column, row, width, height, friction)
+        self._index_block(entity, column, row, width, height)
+        self._block_placements[entity] = (column, row, width, height)
+        self._register(entity)
+
+    def _add_block_shape(self, entity, column: int, row: int,
+                         width: int, height: int, friction: float):
+        """Adds a static shape for a block covering the given grid cells to the space"""
         left = column * self._cell_expanse
         right = (column + width) * self._cell_expanse
         top = row * self._cell_expanse
         bottom = (row + height) * self._cell_expanse
 
-        shape = pymunk.Poly(self._space.static_body, [(left, top), (left, bottom), (right, bottom), (right, top)])
+        shape = pymunk.Poly(self._static_body, [(left, top), (left, bottom), (right, bottom), (right, top)])
         shape.object = entity
         shape.group = 2
 
@@ -308,7 +846,88 @@ class World:
         shape.filter = pymunk.ShapeFilter(categories=self._thing_categories["block"])
 
         entity.set_shape(shape)
-        self._space.add(shape)
+        self._insert_block_shape(shape)
+
+    def _insert_block_shape(self, shape: pymunk.Shape):
+        """Adds the static shape of a block to the space, or to the deferred blocks"""
+        if self._deferred_blocks is None:
+            self._add_to_space(shape)
+        else:
+            # Drawing and grid lookups need the bounding box before the shape is added
+            shape.cache_bb()
+            self._deferred_blocks[shape] = None
+
+    def _remove_block_shape(self, shape: pymunk.Shape):
+        """Removes the static shape of a block from the space, or from the deferred blocks"""
+        if self._deferred_blocks is not None and shape in self._deferred_blocks:
+            del self._deferred_blocks[shape]
+        else:
+            self._remove_from_space(shape)
+
+    def defer_blocks(self):
+        """Holds back the shapes of blocks added from now on until add_deferred_blocks is called
+
+        Pymunk keeps static shapes in a bounding box tree which it does not rebalance.
+        Adding the blocks of a level one by one in grid order builds a badly unbalanced
+        tree, which makes building a long level take time quadratic in its length.
+        """
+        if self._deferred_blocks is None:
+            self._deferred_blocks = {}
+
+    def add_deferred_blocks(self):
+        """Adds the shapes of all blocks held back by defer_blocks to the space at once"""
+        shapes = list(self._deferred_blocks or ())
+        self._deferred_blocks = None
+
+        # Scrambling the order keeps the tree balanced; a fixed seed keeps builds reproducible
+        random.Random(len(shapes)).shuffle(shapes)
+        self._space.add(*shapes)
+        self._deferred_key = self._next_key
+
+    def _index_block(self, block: Block, column: int, row: int, width: float, height: float):
+        """Records a block in every grid cell its (possibly fractional) cell size covers"""
+        columns, rows = self._grid_size
+
+        grid = self._block_grid
+
+        cells = []
+        for cell_row in range(max(row, 0), min(row + math.ceil(height), rows)):
+            start = cell_row * columns
+            for cell in range(start + max(column, 0), start + min(column + math.ceil(width), columns)):
+                occupant = grid[cell]
+                if occupant is not None and occupant is not block:
+                    self._cell_owners.setdefault(cell, [occupant]).append(block)
+                grid[cell] = block
+                cells.append(cell)
+
+        self._block_cells[block] = cells
+
+    def _unindex_block(self, block: Block):
+        """Removes a block from the grid cells it covers, giving each cell back to the
+        block which occupied it before, if any"""
+        grid = self._block_grid
+
+        for cell in self._block_cells.pop(block, ()):
+            owners = self._cell_owners.get(cell)
+            if owners is None:
+                if grid[cell] is block:
+                    grid[cell] = None
+                continue
+
+            if block in owners:
+                owners.remove(block)
+            grid[cell] = owners[-1]
+            if len(owners) == 1:
+                del self._cell_owners[cell]
+
+    def _get_hidden_blocks(self, first_column: int, last_column: int, first_row: int, last_row: int):
+        """Yields the blocks occupying grid cells within the given columns and rows
+        which share their cells with other blocks, so may not be held by the grid"""
+        columns, _ = self._grid_size
+        for cell, owners in self._cell_owners.items():
+            row, column = divmod(cell, columns)
+            if first_row <= row <= last_row and first_column <= column <= last_column:
+                yield from owners
 
     def add_block(self, block: Block, x: float, y: float, *args, **kwargs):
         """Adds a block to the game world at the grid cell that contains ('x', 'y')
@@ -331,14 +950,182 @@ class World:
         Note: It is technically possible for multiple blocks to overlap, in which case
               this method will return one of those. This should never happen, though.
         """
-        blocks = self._space.point_query((x, y), 0, pymunk.ShapeFilter(mask=self._thing_categories["block"]))
+        block = self.get_block_at(*self.xy_to_grid(x, y))
+
+        # Blocks narrower than a cell, like the flagpole, only cover part of their cells
+        if block is not None and block.get_shape().bb.contains_vect((x, y)):
+            return block
 
-        if blocks:
-            return blocks[0].shape.object
+    def get_block_at(self, column: int, row: int):
+        """(Block) Returns the block occupying the grid cell at ('column', 'row'), or None"""
+        columns, rows = self._grid_size
+        if 0 <= column < columns and 0 <= row < rows:
+            return self._block_grid[row * columns + column]
+
+    def get_blocks_around(self, column: int, row: int, radius: int = 1) -> List[Block]:
+        """Returns the blocks occupying the grid cells around the cell at ('column', 'row')
+
+        Parameters:
+            column (int): The column of the centre cell
+            row (int): The row of the centre cell
+            radius (int): The number of cells either side of the centre cell to include
+
+        Returns:
+            (list<Block>): Each block in the square neighbourhood once, in row-major order,
+                           then any blocks overlapped by others in the neighbourhood
+        """
+        columns, rows = self._grid_size
+        grid = self._block_grid
+
+        blocks = {}
+        for cell_row in range(max(row - radius, 0), min(row + radius + 1, rows)):
+            start = cell_row * columns
+            for block in grid[start + max(column - radius, 0):start + min(column + radius + 1, columns)]:
+                if block is not None:
+                    blocks[block] = None
+
+        if self._cell_owners:
+            blocks.update(dict.fromkeys(self._get_hidden_blocks(column - radius, column + radius,
+                                                                 row - radius, row + radius)))
+
+        return list(blocks)
 
     def remove_block(self, block: Block):
-        """Removes a block from the game world"""
-        self.remove_thing(block)
+        """Removes a block from the game world
+
+        Removing a member of a merged block splits the merged block, and the remaining
+        members are merged again. Removing a merged block removes all of its members.
+        """
+        if isinstance(block, MergedBlock):
+            for member in self._split_block(block):
+                self.remove_block(member)
+            return
+
+        merged = self._merged.get(block)
+        if merged is not None:
+            self._split_block(merged)
+
+        self._unindex_block(block)
+
+        self._remove_block_shape(block.get_shape())
+        self._retire(block)
+
+        if merged is not None:
+            self._merge([member for member in merged.get_members() if member is not block])
+
+    def remove_blocks(self, blocks: Iterable[Block]):
+        """Removes many blocks from the game world, as if by remove_block
+
+        The remaining members of merged blocks are only merged again once, after all
+        of the blocks have been removed.
+        """
+        blocks = list(blocks)
+
+        remaining = {}
+        for block in blocks:
+            merged = self._merged.get(block)
+            if merged is not None:
+                remaining.update(dict.fromkeys(self._split_block(merged)))
+
+        for block in blocks:
+            self.remove_block(block)
+
+        self._merge([block for block in remaining if block in self._block_cells])
+
+    def merge_blocks(self, block_ids: Iterable[str]) -> int:
+        """Merges rectangles of adjacent blocks with the given ids into single collision shapes
+
+        Only plain blocks filling a single grid cell are merged. The merged blocks stay
+        in the grid, so get_block and drawing still see each individual block, but the
+        physical space only holds one shape for each merged rectangle.
+
+        Parameters:
+            block_ids (iterable<str>): The ids of the blocks to merge, e.g. 'brick_base'
+
+        Returns:
+            (int): The number of shapes removed from the space by merging
+        """
+        block_ids = set(block_ids)
+        self._merged_ids.update(block_ids)
+        blocks = [block for block, cells in self._block_cells.items()
+                  if type(block) is Block and block.get_id() in block_ids
+                  and len(cells) == 1 and block not in self._merged]
+
+        merged = self._merge(blocks)
+        return sum(len(block.get_members()) - 1 for block in merged)
+
+    def _merge(self, blocks: Iterable[Block]) -> List[MergedBlock]:
+        """Greedily covers the cells of the given blocks with rectangles of blocks with the
+        same id, row by row, merging each rectangle of more than one block
+
+        Returns:
+            (list<MergedBlock>): The merged blocks created
+        """
+        columns, _ = self._grid_size
+        cells = {self._block_cells[block][0]: block for block in blocks}
+
+        merged = []
+        for cell in sorted(cells):
+            block = cells.pop(cell, None)
+            if block is None:
+                continue
+            block_id = block.get_id()
+
+            width = 1
+            while (cell + width) % columns and cell + width in cells \
+                    and cells[cell + width].get_id() == block_id:
+                width += 1
+
+            height = 1
+            while all(cell + height * columns + offset in cells
+                      and cells[cell + height * columns + offset].get_id() == block_id
+                      for offset in range(width)):
+                height += 1
+
+            if width * height == 1:
+                continue
+
+            members = [block]
+            for offset in range(1, width * height):
+                row, column = divmod(offset, width)
+                members.append(cells.pop(cell + row * columns + column))
+
+            merged.append(self._merge_rectangle(members, cell, (width, height)))
+
+        return merged
+
+    def _merge_rectangle(self, members: List[Block], cell: int,
+                         size: Tuple[int, int]) -> MergedBlock:
+        """Replaces the shapes of the member blocks with one shape covering them all
+
+        Parameters:
+            members (list<Block>): The blocks to merge, in row-major order
+            cell (int): The index of the grid cell of the top-left member
+            size (tuple<int, int>): The (columns, rows) size of the rectangle
+        """
+        merged = MergedBlock(members, size)
+        row, column = divmod(cell, self._grid_size[0])
+
+        for member in members:
+            self._remove_block_shape(member.get_shape())
+            self._merged[member] = merged
+
+        self._add_block_shape(merged, column, row, *size, members[0].get_shape().friction)
+        return merged
+
+    def _split_block(self, merged: MergedBlock) -> Tuple[Block, ...]:
+        """Puts the shapes of a merged block's members back in place of its own shape
+
+        Returns:
+            (tuple<Block, ...>): The members of the merged block
+        """
+        self._remove_block_shape(merged.get_shape())
+
+        for member in merged.get_members():
+            del self._merged[member]
+            self._insert_block_shape(member.get_shape())
+
+        return merged.get_members()
 
     def add_item(self, item: DroppedItem, x: float, y: float, size: Tuple[float, float] = (8, 8),
                  mass: float = 2, friction: float = 1.):
@@ -379,7 +1166,55 @@ class World:
         queries = self._space.point_query((x, y), distance, pymunk.ShapeFilter(
             mask=pymunk.ShapeFilter.ALL_MASKS ^ self._thing_categories["wall"]))
 
-        return [q.shape.object for q in queries]
+        things = []
+        for query in queries:
+            thing = query.shape.object
+
+            if isinstance(thing, MergedBlock):
+                things.extend(member for member in thing.get_members()
+                              if member.get_shape().point_query((x, y))[0] <= distance)
+            else:
+                things.append(thing)
+
+        return things
+
+    def get_things_in_region(self, left: float, top: float, right: float, bottom: float) -> [Entity]:
+        """(list<Entity>) Returns all things whose bounding boxes intersect the given region,
+        excluding boundary walls
+
+        Blocks are found from the grid cells covering the region, so merged blocks are
+        returned as their individual members.
+
+        Parameters:
+            left (float): The minimum x-coordinate of the region
+            top (float): The minimum y-coordinate of the region
+            right (float): The maximum x-coordinate of the region
+            bottom (float): The maximum y-coordinate of the region
+        """
+        columns, rows = self._grid_size
+        width, height = self._pixel_size
+        cell = self._cell_expanse
+        grid = self._block_grid
+
+        first_column = int(max(left, 0) // cell)
+        last_column = min(int(min(right, width) // cell), columns - 1)
+        first_row = int(max(top, 0) // cell)
+        last_row = min(int(min(bottom, height) // cell), rows - 1)
+
+        blocks = {}
+        for row in range(first_row, last_row + 1):
+            start = row * columns
+            for block in grid[start + first_column:start + last_column + 1]:
+                if block is not None:
+                    blocks[block] = None
+
+        if self._cell_owners:
+            blocks.update(dict.fromkeys(self._get_hidden_blocks(first_column, last_column, first_row, last_row)))
+
+        queries = self._space.bb_query(pymunk.BB(left, top, right, bottom), pymunk.ShapeFilter(
+            mask=pymunk.ShapeFilter.ALL_MASKS ^ self._thing_categories["wall"] ^ self._thing_categories["block"]))
+
+        return list(blocks) + [shape.object for shape in queries if shape.object]
 
     def get_things(self, x: float, y: float) -> [Entity]:
         """(list<Entity>) Returns all things on the point ('x', 'y')"""
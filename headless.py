@@ -0,0 +1,182 @@
+"""
+Runs a game of Mario without a display, as fast as the simulation allows.
+
+Usage:
+    python headless.py [--config config.txt] [--level level1.txt]
+                       [--inputs script.txt] [--ticks 3000]
+
+An input script lists one key press per line as '<tick> <keysym>', e.g. '12 Right'.
+Each key is pressed before the given tick is stepped. Blank lines and lines
+starting with '#' are ignored.
+"""
+
+__version__ = "1.1.0"
+
+import argparse
+import json
+from typing import Iterable, Tuple, List
+
+from app import MarioApp, config_file
+from config import Config
+from level import LevelTemplates
+from replay import Replay, ReplayRecorder, state_digest
+
+# The maximum number of ticks a game is run for by default
+DEFAULT_MAX_TICKS = 3000
+
+# Results of a finished run
+GOAL = "goal"
+END = "end"
+DEAD = "dead"
+TIMEOUT = "timeout"
+
+
+class HeadlessGame(MarioApp):
+    """A game of Mario driven by a scripted input stream rather than a keyboard and a display.
+
+    Uses the same world building, collision handling and game logic as MarioApp.
+    Popups are replaced by ending the run with a result.
+    """
+
+    def __init__(self, config: Config, level: str = None, seed: int = None, record: bool = False,
+                 templates: LevelTemplates = None):
+        """Construct a new headless game.
+
+        Parameters:
+            config (Config): The parsed config file, see config_file
+            level (str): The level file to start on, defaults to the start level of the config
+            seed (int): The seed for all randomness in the game, see MarioApp._setup_game
+            record (bool): Record the game, to be replayed later, see get_replay
+            templates (LevelTemplates): The templates to take the worlds of levels from, see
+                                        MarioApp._setup_game
+        """
+        self._master = None
+        self._result = None
+        self._damaged_by = None
+        self._setup_game(config, level=level, seed=seed, templates=templates)
+
+        if record:
+            self._recorder = ReplayRecorder(self._seed, config.to_dict(), self._current_level)
+
+    def get_replay(self) -> Replay:
+        """(Replay) Returns the game recorded so far, or None if it is not being recorded"""
+        return self._recorder.get_replay() if self._recorder is not None else None
+
+    def get_result(self):
+        """(str) Returns how the run finished, or None if it is still running"""
+        return self._result
+
+    def health(self):
+        """Ends the run once the player has lost all health"""
+        if self.is_game_lost():
+            self._game_status = True
+            self._result = DEAD
+
+    def _handle_player_collide_mob(self, player, mob, data, arbiter) -> bool:
+        """Keeps track of the last mob to damage the player, as the cause of death"""
+        health = player.get_health()
+        result = super()._handle_player_collide_mob(player, mob, data, arbiter)
+        if player.get_health() < health:
+            self._damaged_by = mob.get_id()
+        return result
+
+    def player_name(self):
+        """Ends the run once the player reaches the flagpole"""
+        self._game_status = True
+        self._result = GOAL
+
+    def game_end(self):
+        """Ends the run once the player has reached the last level"""
+        self._game_status = True
+        self._result = END
+
+    def run(self, inputs: Iterable[Tuple[int, str]] = (), max_ticks: int = DEFAULT_MAX_TICKS) -> dict:
+        """Step the game until it finishes or 'max_ticks' ticks have passed
+
+        Parameters:
+            inputs (iterable<tuple<int, str>>): (tick, keysym) pairs of keys to press, in tick order
+            max_ticks (int): The number of ticks after which the run times out
+
+        Returns:
+            (dict): A summary of the run, see get_summary
+        """
+        inputs = iter(inputs)
+        pending = next(inputs, None)
+
+        while not self._game_status and self._ticks < max_ticks:
+            while pending is not None and pending[0] <= self._ticks:
+                self.press(pending[1])
+                pending = next(inputs, None)
+
+            # Pressing keys can move the game on to another level, or past the last one
+            if self._game_status:
+                break
+
+            self.tick()
+            self.health()
+
+        if self._result is None:
+            self._result = TIMEOUT
+
+        return self.get_summary()
+
+    def get_summary(self) -> dict:
+        """Returns a summary of the game's current state
+
+        Runs which end with the same 'digest' (see replay.state_digest) end with every
+        moving thing in the same place, so runs can be compared beyond their result.
+        """
+        return {
+            "level": self._current_level,
+            "result": self._result,
+            "ticks": self._ticks,
+            "seed": self._seed,
+            "score": self._player.get_score(),
+            "health": self._player.get_health(),
+            "cause": self._damaged_by if self._result == DEAD else None,
+            "digest": state_digest(self._world, self._player).hex(),
+        }
+
+
+def load_inputs(filename: str) -> List[Tuple[int, str]]:
+    """Load an input script of key presses.
+
+    Parameters:
+        filename (str): The name of the input script file to load.
+
+    Returns:
+        (list<tuple<int, str>>): (tick, keysym) pairs, sorted by tick.
+    """
+    inputs = []
+    with open(filename, 'r') as file:
+        for line in file:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+
+            tick, key = line.split()
+            inputs.append((int(tick), key))
+
+    inputs.sort(key=lambda event: event[0])
+    return inputs
+
+
+def main(args=None):
+    """Run a single headless game from the command line and print its summary as JSON"""
+    parser = argparse.ArgumentParser(description="Run a game of Mario without a display.")
+    parser.add_argument("--config", default="config.txt", help="the config file to use")
+    parser.add_argument("--level", help="the level to start on, instead of the config's start level")
+    parser.add_argument("--inputs", help="an input script of '<tick> <keysym>' lines")
+    parser.add_argument("--ticks", type=int, default=DEFAULT_MAX_TICKS,
+                        help="the number of ticks after which the run times out")
+    parser.add_argument("--seed", type=int, help="the seed for all randomness in the game")
+    args = parser.parse_args(args)
+
+    inputs = load_inputs(args.inputs) if args.inputs else ()
+
+    game = HeadlessGame(config_file(args.config), level=args.level, seed=args.seed)
+    print(json.dumps(game.run(inputs, args.ticks)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,417 @@
+"""
+A leaderboard of the high scores of every level, which can be shared by several
+game stations.
+
+Scores are kept by a backend:
+    SQLiteScores, in an SQLite database, which is the default
+    HTTPScores, by a leaderboard server shared by the stations, see below
+    ScoreStore, in an append-only log per level, see scores.py
+
+Games use a backend through a Leaderboard. A Leaderboard saves scores on a
+background thread, so the game loop never waits on the disk or the network.
+Leaderboards are read from a cached snapshot of each level's top scores.
+
+The leaderboard server is a small HTTP service in front of an SQLite database.
+It queues the scores sent by the stations and saves them in batches, one
+transaction per batch.
+
+Usage:
+    python leaderboard.py [--db high_scores.db] [--host 127.0.0.1] [--port 8765]
+"""
+
+__version__ = "1.1.0"
+
+import argparse
+import glob
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from http.client import HTTPException
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from scores import LevelScores, ScoreStore, HIGH_SCORES_PREFIX, TOP_SCORES
+
+DEFAULT_DATABASE = "high_scores.db"
+DEFAULT_PORT = 8765
+
+# Seconds to wait for a leaderboard server to respond
+HTTP_TIMEOUT = 5.0
+# Seconds to wait before saving scores again after a backend has failed
+RETRY_DELAY = 2.0
+
+# The errors a backend raises when it cannot be reached or read
+BACKEND_ERRORS = (OSError, sqlite3.Error, HTTPException, ValueError)
+
+# Scores waiting to be saved are (level, name, score), and levels waiting to be
+# read are (level, None, None). CLOSE stops the background thread.
+CLOSE = None
+
+
+class SQLiteScores:
+    """The high scores of every level, in an SQLite database.
+
+    Scores which tie are ranked in the order their names were first saved, as in ScoreStore.
+    """
+
+    def __init__(self, filename: str = DEFAULT_DATABASE, top: int = TOP_SCORES):
+        """Open the database, creating it if it does not exist yet.
+
+        A new database starts with the scores of any logs of high scores in the
+        same directory, see ScoreStore.
+
+        Parameters:
+            filename (str): The path of the database.
+            top (int): The number of scores on each leaderboard.
+        """
+        self._top = top
+        self._connection = sqlite3.connect(filename)
+        # Lets the server read while it writes, and only syncs at checkpoints
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.execute("PRAGMA synchronous = NORMAL")
+
+        with self._connection:
+            created = self._connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'scores'").fetchone() is None
+
+            # The id orders names by when they were first saved, which breaks ties in score
+            self._connection.execute("""CREATE TABLE IF NOT EXISTS scores (
+                                            id INTEGER PRIMARY KEY,
+                                            level TEXT NOT NULL,
+                                            name TEXT NOT NULL,
+                                            score INTEGER NOT NULL,
+                                            UNIQUE (level, name))""")
+            # Leaderboards are read in order from this index, without sorting the level's scores
+            self._connection.execute("CREATE INDEX IF NOT EXISTS scores_by_rank ON scores (level, score DESC, id)")
+
+            if created:
+                directory = os.path.dirname(os.path.abspath(filename))
+                for log in sorted(glob.glob(os.path.join(glob.escape(directory), HIGH_SCORES_PREFIX + "*"))):
+                    level = os.path.basename(log)[len(HIGH_SCORES_PREFIX):]
+                    self._save(((level, name, score) for name, score in LevelScores(log).get_scores().items()))
+
+    def _save(self, scores: Iterable[Tuple[str, str, int]]):
+        """Save scores within the current transaction"""
+        self._connection.executemany("""INSERT INTO scores (level, name, score) VALUES (?, ?, ?)
+                                        ON CONFLICT (level, name) DO UPDATE SET score = excluded.score""",
+                                     scores)
+
+    def add_score(self, level: str, name: str, score: int):
+        """Save a score for a level, replacing the earlier score of the same name"""
+        self.add_scores([(level, name, score)])
+
+    def add_scores(self, scores: Iterable[Tuple[str, str, int]]):
+        """Save the (level, name, score) of many scores, in order, in a single transaction"""
+        with self._connection:
+            self._save(scores)
+
+    def get_leaderboard(self, level: str) -> List[Tuple[str, int]]:
+        """(list<tuple<str, int>>) Returns the (name, score) of the top scores of a level, highest first"""
+        return self._connection.execute("""SELECT name, score FROM scores WHERE level = ?
+                                           ORDER BY score DESC, id LIMIT ?""", (level, self._top)).fetchall()
+
+    def close(self):
+        """Close the database"""
+        self._connection.close()
+
+
+class HTTPScores:
+    """The high scores of every level, kept by a leaderboard server"""
+
+    def __init__(self, url: str, timeout: float = HTTP_TIMEOUT):
+        """Constructor
+
+        Parameters:
+            url (str): The address of the server, e.g. 'http://127.0.0.1:8765'.
+            timeout (float): Seconds to wait for the server to respond.
+        """
+        self._url = url.rstrip("/")
+        self._timeout = timeout
+
+    def add_scores(self, scores: Iterable[Tuple[str, str, int]]):
+        """Send the (level, name, score) of many scores to the server, in a single request"""
+        request = urllib.request.Request(self._url + "/scores", method="POST",
+                                         data=json.dumps([list(score) for score in scores]).encode('utf-8'),
+                                         headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self._timeout):
+            pass
+
+    def add_score(self, level: str, name: str, score: int):
+        """Send a score for a level to the server"""
+        self.add_scores([(level, name, score)])
+
+    def get_leaderboard(self, level: str) -> List[Tuple[str, int]]:
+        """(list<tuple<str, int>>) Returns the (name, score) of the top scores of a level, highest first"""
+        url = self._url + "/leaderboard?" + urllib.parse.urlencode({"level": level})
+        with urllib.request.urlopen(url, timeout=self._timeout) as response:
+            return [(str(name), int(score)) for name, score in json.load(response)]
+
+    def close(self):
+        """Does nothing, as a connection is only open for each request"""
+
+
+def open_scores(setting: str) -> Callable:
+    """Returns a function which opens the backend described by the leaderboard setting
+    of the config, see Leaderboard.
+
+    Parameters:
+        setting (str): 'files' for a log per level, the URL of a leaderboard server,
+                       or otherwise the path of an SQLite database.
+    """
+    if setting == "files":
+        return ScoreStore
+    if setting.startswith(("http://", "https://")):
+        return lambda: HTTPScores(setting)
+    return lambda: SQLiteScores(setting)
+
+
+class Leaderboard:
+    """Saves and reads the high scores of a backend on a background thread.
+
+    Saving a score only queues it. The background thread saves every queued score
+    in one batch, then updates the snapshot of the leaderboards it changed.
+    Reading a leaderboard only reads its snapshot. If the snapshot is missing or
+    older than max_age, the background thread reads the leaderboard again.
+    If the backend fails, queued scores are kept and saved again after RETRY_DELAY.
+    Unexpected errors are printed, and the backend is opened again before retrying.
+
+    The backend is opened on the background thread, which starts on first use,
+    and is started again if it has stopped before the leaderboard is closed.
+    """
+
+    def __init__(self, open_backend: Callable, max_age: Optional[float] = None):
+        """Constructor
+
+        Parameters:
+            open_backend (Callable<> -> *): Opens the backend, e.g. see open_scores
+            max_age (float): Seconds before a snapshot is read again, or None to only
+                             read it again when scores are saved through this leaderboard
+        """
+        self._open_backend = open_backend
+        self._max_age = max_age
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._closed = False
+
+        # The time each level's snapshot was read and its (name, score) top scores, by level
+        self._snapshots: Dict[str, Tuple[float, List[Tuple[str, int]]]] = {}
+        # Notified whenever a snapshot is updated
+        self._updated = threading.Condition()
+
+    def _start(self):
+        """Start the background thread, if it has not started yet or has stopped unexpectedly"""
+        with self._start_lock:
+            if self._thread is None or (not self._closed and not self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._run, name="leaderboard", daemon=True)
+                self._thread.start()
+
+    def add_score(self, level: str, name: str, score: int):
+        """Queue a score to be saved, replacing the earlier score of the same name"""
+        self._start()
+        self._queue.put((level, name, score))
+
+    def prefetch(self, level: str):
+        """Queue a level's leaderboard to be read, so that it is ready when it is needed"""
+        self._start()
+        self._queue.put((level, None, None))
+
+    def get_leaderboard(self, level: str, timeout: float = 0.) -> List[Tuple[str, int]]:
+        """Returns a level's top scores from its snapshot, reading it again if it is stale
+
+        Parameters:
+            level (str): The level.
+            timeout (float): Seconds to wait for the leaderboard to be read, if there is
+                             no snapshot of it yet.
+
+        Returns:
+            (list<tuple<str, int>>): The (name, score) of the top scores, highest first,
+                                     or no scores if the leaderboard has not been read.
+        """
+        snapshot = self._snapshots.get(level)
+        if snapshot is None or (self._max_age is not None and time.monotonic() - snapshot[0] > self._max_age):
+            self.prefetch(level)
+
+        if snapshot is None and timeout > 0:
+            with self._updated:
+                self._updated.wait_for(lambda: level in self._snapshots, timeout)
+            snapshot = self._snapshots.get(level)
+
+        return [] if snapshot is None else list(snapshot[1])
+
+    def close(self, timeout: float = None):
+        """Save the queued scores and stop the background thread
+
+        Parameters:
+            timeout (float): Seconds to wait for the queued scores to be saved, or None to wait
+                             until they are. Scores which are not saved in time are lost.
+        """
+        self._closed = True
+        if self._thread is not None:
+            self._queue.put(CLOSE)
+            self._thread.join(timeout)
+
+    def _run(self):
+        """Save and read scores as they are queued, until the leaderboard is closed"""
+        backend = None
+        # The scores to save and the levels to read, which are kept until the backend succeeds
+        scores = []
+        levels = {}
+        closing = False
+
+        while True:
+            try:
+                # Until the backend succeeds, wait for RETRY_DELAY at most before trying again
+                item = self._queue.get(timeout=RETRY_DELAY if scores or levels else None)
+            except queue.Empty:
+                pass
+            else:
+                # Everything queued meanwhile is handled in the same batch
+                items = [item]
+                while True:
+                    try:
+                        items.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                for item in items:
+                    if item is CLOSE:
+                        closing = True
+                        continue
+                    level, name, score = item
+                    if name is not None:
+                        scores.append(item)
+                    levels[level] = None
+
+            try:
+                if backend is None:
+                    backend = self._open_backend()
+                if scores:
+                    backend.add_scores(scores)
+                    scores = []
+                while levels:
+                    level = next(iter(levels))
+                    leaderboard = backend.get_leaderboard(level)
+                    with self._updated:
+                        self._snapshots[level] = (time.monotonic(), leaderboard)
+                        self._updated.notify_all()
+                    del levels[level]
+            except BACKEND_ERRORS:
+                # Wait for the backend to recover, unless the leaderboard is closing
+                if not closing:
+                    continue
+            except Exception as error:
+                # Keep the thread alive, and start again from a newly opened backend
+                print(f"Leaderboard error: {error!r}", file=sys.stderr)
+                if backend is not None:
+                    try:
+                        backend.close()
+                    except Exception:
+                        pass
+                    backend = None
+                if not closing:
+                    continue
+
+            if closing:
+                if backend is not None:
+                    backend.close()
+                return
+
+
+class LeaderboardRequestHandler(BaseHTTPRequestHandler):
+    """Handles requests to a LeaderboardServer.
+
+    GET /leaderboard?level=<level> responds with the [name, score] of the level's top
+    scores as JSON. POST /scores queues a JSON list of [level, name, score] scores to be saved.
+    """
+
+    def do_GET(self):
+        """Respond with a level's leaderboard"""
+        url = urllib.parse.urlsplit(self.path)
+        levels = urllib.parse.parse_qs(url.query).get("level")
+        if url.path != "/leaderboard" or not levels:
+            self.send_error(404)
+            return
+
+        leaderboard = self.server.get_leaderboard().get_leaderboard(levels[0], timeout=HTTP_TIMEOUT)
+        self._respond(200, json.dumps(leaderboard).encode('utf-8'))
+
+    def do_POST(self):
+        """Queue scores to be saved"""
+        if self.path != "/scores":
+            self.send_error(404)
+            return
+
+        try:
+            scores = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            scores = [(str(level), str(name), int(score)) for level, name, score in scores]
+        except (ValueError, TypeError):
+            self.send_error(400)
+            return
+
+        leaderboard = self.server.get_leaderboard()
+        for score in scores:
+            leaderboard.add_score(*score)
+        self._respond(202, b"")
+
+    def _respond(self, status: int, body: bytes):
+        """Send a response with a JSON body"""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Does not log each request, as every station polls the server"""
+
+
+class LeaderboardServer(ThreadingHTTPServer):
+    """A leaderboard server, which handles each request on its own thread"""
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], leaderboard: Leaderboard):
+        """Constructor
+
+        Parameters:
+            address (tuple<str, int>): The (host, port) to serve on.
+            leaderboard (Leaderboard): The leaderboard requests are served from.
+        """
+        super().__init__(address, LeaderboardRequestHandler)
+        self._leaderboard = leaderboard
+
+    def get_leaderboard(self) -> Leaderboard:
+        """(Leaderboard) Returns the leaderboard requests are served from"""
+        return self._leaderboard
+
+
+def main(args=None):
+    """Run a leaderboard server from the command line"""
+    parser = argparse.ArgumentParser(description="Serve a leaderboard shared by several game stations.")
+    parser.add_argument("--db", default=DEFAULT_DATABASE, help="the SQLite database to keep scores in")
+    parser.add_argument("--host", default="127.0.0.1", help="the address to serve on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="the port to serve on")
+    args = parser.parse_args(args)
+
+    leaderboard = Leaderboard(lambda: SQLiteScores(args.db))
+    server = LeaderboardServer((args.host, args.port), leaderboard)
+    print(f"Serving the leaderboard on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        leaderboard.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
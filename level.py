@@ -4,10 +4,32 @@ tokens of entities.
 
 __version__ = "1.1.0"
 
-from typing import Tuple, Callable, Iterable
-
+import hashlib
+import os
+import struct
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Tuple, Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from game.block import Block
+from game.entity import DynamicEntity, Entity
+from game.item import DroppedItem
+from game.mob import Mob
+from game.util import write_atomic
 from game.world import World
 
+# The directory, next to each level file, in which compiled levels are cached
+LEVEL_CACHE_DIR = "__levelcache__"
+LEVEL_CACHE_EXTENSION = ".lvl"
+
+COMPILED_MAGIC = b"MLVL"
+COMPILED_VERSION = 2
+
+# magic, version, source mtime (ns), source size, source sha1, columns, rows, palette size
+COMPILED_HEADER = struct.Struct("<4sBQQ20sIIB")
+# x, y, palette index of each entity
+COMPILED_ENTITY = struct.Struct("<IIB")
+COMPILED_COUNT = struct.Struct("<I")
+
 
 class WorldBuilder:
     """World builder class that can be used to construct a world from
@@ -36,6 +58,17 @@ class WorldBuilder:
         self._gravity = gravity
         self._width = 0
         self._height = 0
+        self._merged_blocks = ()
+
+    def set_merged_blocks(self, block_ids: Iterable[str]):
+        """Set the ids of the blocks to merge into larger collision shapes once built.
+
+        Only plain blocks which do nothing when hit should be merged, see World.merge_blocks.
+
+        Parameters:
+            block_ids (<str, ...>): Iterable of block ids, e.g. 'brick_base'.
+        """
+        self._merged_blocks = tuple(block_ids)
 
     def register_builder(self, entity_id: str, builder: Callable):
         """Register a new builder process for an entity id.
@@ -44,9 +77,10 @@ class WorldBuilder:
         is encountered during world construction.
 
         The signature of the builder method should be as follows:
-            builder(world: World, entity_id: str, x: int, y: int, *args) -> None
+            builder(world: World, entity_id: str, x: int, y: int, *args) -> Entity
         The args passed to the builder callback is determined by what is given
-        to the add_entity method.
+        to the add_entity method. The builder should return the entity it added,
+        so that the entity can be removed again when building chunked worlds.
 
         Parameters:
             entity_id (str): String identifier for an entity.
@@ -94,6 +128,33 @@ class WorldBuilder:
 
         return self
 
+    def add_entities(self, entities: Iterable[Tuple[str, int, int]], *args):
+        """Add many entities to the world at once, as if by add_entity.
+
+        Parameters:
+            entities (<tuple<str, int, int>, ...>): The (entity_id, x, y) of each entity.
+            *args: Any additional arguments, passed to the builder for every entity.
+
+        Returns:
+            (WorldBuilder): self, allows for chained method calls.
+        """
+        width, height = self._width, self._height
+        half_block = self._block_size // 2
+        append = self._entities.append
+
+        for entity_id, x, y in entities:
+            # resize the world accordingly
+            if x >= width:
+                width = x + half_block
+            if y >= height:
+                height = y + half_block
+
+            append((entity_id, x, y, args))
+
+        self._width, self._height = width, height
+
+        return self
+
     def build(self) -> World:
         """Construct a new world containing all the added entities.
 
@@ -105,22 +166,61 @@ class WorldBuilder:
             KeyError: If there is no associated builder for an entity id and no
                       fallback builder has been set.
         """
-        world = World((self._width, self._height), self._block_size, gravity=self._gravity)
+        world = self.create_world()
+        world.defer_blocks()
+
         for entity in self._entities:
-            entity_id, x, y, args = entity
+            self.build_entity(world, entity)
 
-            if entity_id not in self._builders:
-                if self._fallback is None:
-                    raise KeyError(f"Unable to build world,"
-                                   f"no matching processor for entity id of {entity_id}")
-                self._fallback(world, *entity)
-                continue
+        if self._merged_blocks:
+            world.merge_blocks(self._merged_blocks)
 
-            processor = self._builders[entity_id]
-            processor(world, entity_id, x, y, *args)
+        world.add_deferred_blocks()
 
         return world
 
+    def create_world(self) -> World:
+        """Construct a new, empty world big enough for all the added entities."""
+        return World((self._width, self._height), self._block_size, gravity=self._gravity)
+
+    def build_entity(self, world: World, entity: Tuple[str, int, int, tuple]) -> Entity:
+        """Call the builder of an added entity to add it to a world.
+
+        Parameters:
+            world (World): The world to add the entity to.
+            entity (tuple<str, int, int, tuple>): The (entity_id, x, y, args) of the entity.
+
+        Returns:
+            (Entity): The entity returned by the builder.
+
+        Raises:
+            KeyError: If there is no associated builder for the entity id and no
+                      fallback builder has been set.
+        """
+        entity_id, x, y, args = entity
+
+        if entity_id not in self._builders:
+            if self._fallback is None:
+                raise KeyError(f"Unable to build world,"
+                               f"no matching processor for entity id of {entity_id}")
+            return self._fallback(world, *entity)
+
+        processor = self._builders[entity_id]
+        return processor(world, entity_id, x, y, *args)
+
+    def get_entities(self) -> Tuple[Tuple[str, int, int, tuple], ...]:
+        """(tuple<tuple<str, int, int, tuple>, ...>) Returns the (entity_id, x, y, args)
+        of each added entity."""
+        return tuple(self._entities)
+
+    def get_block_size(self) -> int:
+        """(int) Returns the pixel dimensions of blocks."""
+        return self._block_size
+
+    def get_merged_blocks(self) -> Tuple[str, ...]:
+        """(tuple<str, ...>) Returns the ids of the blocks merged once built."""
+        return self._merged_blocks
+
     def clear(self):
         """
         Removes all the entities that were added
@@ -169,9 +269,183 @@ def load_level(filename: str) -> str:
     return "\n".join(level)
 
 
+class CompiledLevel(NamedTuple):
+    """A level compiled from its level string.
+
+    The grid holds the palette index of the entity in each cell plus one, row by row,
+    with zero for empty cells. The entities are each (entity_id, x, y) in the order
+    load_world would find them.
+    """
+    columns: int
+    rows: int
+    palette: str
+    grid: bytes
+    entities: Tuple[Tuple[str, int, int], ...]
+
+
+def compile_level(level: str) -> CompiledLevel:
+    """Compile a level string into a grid and a table of its entities.
+
+    Parameters:
+        level (str): The level string, see load_level.
+
+    Returns:
+        (CompiledLevel): The compiled level.
+    """
+    lines = level.split('\n')
+    columns = max(map(len, lines))
+
+    palette = []
+    grid = bytearray(columns * len(lines))
+    entities = []
+    for y, line in enumerate(lines):
+        for x, character in enumerate(line):
+            if character in ('\n', ' '):
+                continue
+
+            if character not in palette:
+                if len(palette) == 255:
+                    raise ValueError("A level can use at most 255 different entity ids")
+                palette.append(character)
+
+            grid[y * columns + x] = palette.index(character) + 1
+            entities.append((character, x, y))
+
+    return CompiledLevel(columns, len(lines), "".join(palette), bytes(grid), tuple(entities))
+
+
+def _source_key(filename: str) -> Tuple[int, int]:
+    """(tuple<int, int>) Returns the modification time (ns) and size of a level file"""
+    stat = os.stat(filename)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _source_hash(filename: str) -> bytes:
+    """(bytes) Returns the sha1 digest of a level file"""
+    with open(filename, 'rb') as file:
+        return hashlib.sha1(file.read()).digest()
+
+
+def encode_compiled_level(level: CompiledLevel, mtime: int, size: int, digest: bytes) -> bytes:
+    """Encode a compiled level with the key of the level file it was compiled from.
+
+    Parameters:
+        level (CompiledLevel): The compiled level.
+        mtime (int): The modification time of the level file, in nanoseconds.
+        size (int): The size of the level file, in bytes.
+        digest (bytes): The sha1 digest of the level file.
+
+    Returns:
+        (bytes): The header, palette, grid and entity table.
+    """
+    palette = level.palette.encode('utf-8')
+    codes = {character: index for index, character in enumerate(level.palette)}
+
+    parts = [COMPILED_HEADER.pack(COMPILED_MAGIC, COMPILED_VERSION, mtime, size, digest,
+                                  level.columns, level.rows, len(level.palette)),
+             COMPILED_COUNT.pack(len(palette)), palette,
+             level.grid,
+             COMPILED_COUNT.pack(len(level.entities))]
+    parts.extend(COMPILED_ENTITY.pack(x, y, codes[character]) for character, x, y in level.entities)
+
+    return b"".join(parts)
+
+
+def decode_compiled_level(data: bytes) -> Tuple[Tuple[int, int, bytes], CompiledLevel]:
+    """Decode a compiled level encoded by encode_compiled_level.
+
+    Parameters:
+        data (bytes): The encoded level.
+
+    Returns:
+        (tuple<tuple<int, int, bytes>, CompiledLevel>):
+            The (mtime, size, digest) key of the level file, and the compiled level.
+
+    Raises:
+        ValueError: If the data is not a compiled level of this version.
+    """
+    try:
+        magic, version, mtime, size, digest, columns, rows, _ = COMPILED_HEADER.unpack_from(data)
+        if magic != COMPILED_MAGIC or version != COMPILED_VERSION:
+            raise ValueError("Not a compiled level of this version")
+
+        offset = COMPILED_HEADER.size
+        length, = COMPILED_COUNT.unpack_from(data, offset)
+        offset += COMPILED_COUNT.size
+        palette = data[offset:offset + length].decode('utf-8')
+        offset += length
+
+        grid = data[offset:offset + columns * rows]
+        offset += columns * rows
+
+        count, = COMPILED_COUNT.unpack_from(data, offset)
+        offset += COMPILED_COUNT.size
+        table = data[offset:offset + count * COMPILED_ENTITY.size]
+        entities = tuple((palette[code], x, y) for x, y, code in COMPILED_ENTITY.iter_unpack(table))
+    except (struct.error, UnicodeDecodeError, IndexError) as error:
+        raise ValueError("Corrupt compiled level") from error
+
+    if len(grid) != columns * rows or len(entities) != count:
+        raise ValueError("Corrupt compiled level")
+
+    return (mtime, size, digest), CompiledLevel(columns, rows, palette, bytes(grid), entities)
+
+
+def compiled_level_path(filename: str) -> str:
+    """(str) Returns the path a level file is cached at once compiled"""
+    directory, name = os.path.split(os.path.abspath(filename))
+    return os.path.join(directory, LEVEL_CACHE_DIR, name + LEVEL_CACHE_EXTENSION)
+
+
+def load_compiled_level(filename: str, cache: bool = True) -> CompiledLevel:
+    """Load a level file compiled, from the cache where possible.
+
+    A cached level is used if the level file has the same modification time and
+    size as when it was compiled, or otherwise the same sha1 digest. Otherwise the
+    level file is compiled again and, if possible, cached.
+
+    Parameters:
+        filename (str): The name of the level file to load.
+        cache (bool): Whether to read and write the cache of compiled levels.
+
+    Returns:
+        (CompiledLevel): The compiled level.
+    """
+    mtime, size = _source_key(filename)
+    if not cache:
+        return compile_level(load_level(filename))
+
+    path = compiled_level_path(filename)
+    try:
+        with open(path, 'rb') as file:
+            (cached_mtime, cached_size, cached_digest), level = decode_compiled_level(file.read())
+    except (OSError, ValueError):
+        cached_digest = level = None
+    else:
+        if (cached_mtime, cached_size) == (mtime, size):
+            return level
+
+    digest = _source_hash(filename)
+    if level is None or digest != cached_digest:
+        level = compile_level(load_level(filename))
+
+    # Rewritten even if only the modification time changed, so that the next load is quicker
+    try:
+        write_atomic(path, encode_compiled_level(level, mtime, size, digest))
+    except (OSError, struct.error):
+        # The cache is only an optimisation, e.g. the level may be in a read-only directory,
+        # or too big for the fields of the compiled format
+        pass
+
+    return level
+
+
 def load_world(builder: WorldBuilder, filename: str, *args):
     """Loads entities within a file into a world builder.
 
+    The level file is compiled, or its compiled form is loaded from the cache, see
+    load_compiled_level.
+
     Parameters:
         builder (WorldBuilder): The builder to append found entities to.
         filename (str): The game world file to load with blocks.
@@ -179,12 +453,429 @@ def load_world(builder: WorldBuilder, filename: str, *args):
     Returns:
         (World): The world produced by adding the found entities.
     """
-    level = load_level(filename)
-    for y, line in enumerate(level.split('\n')):
-        for x, character in enumerate(line):
-            if character in ('\n', ' '):
+    builder.add_entities(load_compiled_level(filename).entities, *args)
+
+    return builder.build()
+
+
+def load_chunked_world(builder: WorldBuilder, filename: str, chunk_width: int,
+                       load_distance: float, *args) -> "ChunkedLevel":
+    """Loads entities within a file into a world builder, to build chunk by chunk.
+
+    Parameters:
+        builder (WorldBuilder): The builder to append found entities to.
+        filename (str): The game world file to load with blocks.
+        chunk_width (int): The number of columns in each chunk.
+        load_distance (float): The distance from the player within which chunks are built.
+
+    Returns:
+        (ChunkedLevel): The chunked level, whose world is empty until it is updated.
+    """
+    builder.add_entities(load_compiled_level(filename).entities, *args)
+
+    return ChunkedLevel(builder, chunk_width, load_distance)
+
+
+class ChunkedLevel:
+    """A level whose entities are only built into its world while near the player.
+
+    The level is split into chunks of a fixed number of columns. Chunks within the
+    load distance of the player are built, and chunks further away are removed from
+    the world again. Entities which left the world while their chunk was built, such
+    as broken bricks, collected coins and defeated mobs, are not built again. The
+    state of the others, such as used mystery blocks and the positions of mobs, is
+    restored when they are.
+
+    Entities added while playing, like dropped coins and fireballs, are not part of
+    any chunk and are left in the world.
+    """
+
+    def __init__(self, builder: WorldBuilder, chunk_width: int, load_distance: float):
+        """Construct an empty world for the entities added to a world builder.
+
+        Parameters:
+            builder (WorldBuilder): The builder of the level's entities, which may
+                                    be cleared once the chunked level is constructed.
+            chunk_width (int): The number of columns in each chunk.
+            load_distance (float): The distance from the player within which chunks are built.
+        """
+        if chunk_width < 1:
+            raise ValueError("Chunks must be at least one column wide")
+
+        self._builder = builder
+        self._world = builder.create_world()
+        self._chunk_width = chunk_width
+        self._chunk_pixels = chunk_width * builder.get_block_size()
+        self._load_distance = load_distance
+
+        columns, _ = self._world.get_grid_size()
+        self._chunk_count = -(-columns // chunk_width)
+
+        # The (entity_id, x, y, args) of each entity in the level, by key
+        self._entities = builder.get_entities()
+        # The keys of the entities belonging to each chunk, in the order they were added
+        self._chunk_keys = [{} for _ in range(self._chunk_count)]
+        for key, (_, x, _, _) in enumerate(self._entities):
+            self._chunk_keys[x // chunk_width][key] = None
+
+        # The entities built for each built chunk, by key
+        self._loaded = {}
+        # The keys of entities which have been destroyed, and are not built again
+        self._removed = set()
+        # The built blocks taken out of the world for a while, see hide_block
+        self._hidden = set()
+        # The state of each entity when its chunk was last removed, by key
+        self._states = {}
+
+    def get_world(self) -> World:
+        """(World) Returns the world the chunks are built in."""
+        return self._world
+
+    def get_chunk(self, x: float) -> int:
+        """(int) Returns the index of the chunk containing the x-coordinate, in pixels."""
+        return min(max(int(x // self._chunk_pixels), 0), self._chunk_count - 1)
+
+    def get_loaded_chunks(self) -> Tuple[int, ...]:
+        """(tuple<int, ...>) Returns the indices of the chunks which are built."""
+        return tuple(self._loaded)
+
+    def hide_block(self, block: Block):
+        """Removes a block from the world for a while, like a brick hidden by a switch.
+
+        A hidden block is not destroyed, so it is built again with its chunk if the
+        chunk is removed before the block is shown again.
+        """
+        self._hidden.add(block)
+        self._world.remove_block(block)
+
+    def show_block(self, block: Block):
+        """Adds a hidden block back to the world, unless its chunk has been removed since"""
+        if block in self._hidden:
+            self._hidden.discard(block)
+            x, y = block.get_position()
+            self._world.add_block(block, x, y)
+
+    def update(self, x: float):
+        """Builds the chunks near a position and removes those far from it.
+
+        Chunks are only removed once they are a chunk beyond the load distance, so
+        that moving back and forth over a chunk boundary does not rebuild chunks.
+
+        Parameters:
+            x (float): The x-coordinate of the player, in pixels.
+        """
+        first = self.get_chunk(x - self._load_distance)
+        last = self.get_chunk(x + self._load_distance)
+
+        for index in list(self._loaded):
+            if index < first - 1 or index > last + 1:
+                self._unload_chunk(index)
+
+        for index in range(first, last + 1):
+            if index not in self._loaded:
+                self._load_chunk(index)
+
+    def _load_chunk(self, index: int):
+        """Builds the entities of a chunk which are still in the level."""
+        world = self._world
+        world.defer_blocks()
+
+        built = self._loaded[index] = {}
+        for key in self._chunk_keys[index]:
+            if key in self._removed:
                 continue
 
-            builder.add_entity(character, x, y, *args)
+            entity = self._builder.build_entity(world, self._entities[key])
+            if entity is None:
+                continue
 
-    return builder.build()
+            state = self._states.pop(key, None)
+            if state is not None:
+                entity.set_state(state)
+            built[key] = entity
+
+        merged_blocks = self._builder.get_merged_blocks()
+        if merged_blocks:
+            world.merge_blocks(merged_blocks)
+
+        world.add_deferred_blocks()
+
+    def _unload_chunk(self, index: int):
+        """Removes the entities of a chunk from the world, remembering their state."""
+        world = self._world
+        blocks = []
+
+        for key, entity in self._loaded.pop(index).items():
+            if entity in self._hidden:
+                self._hidden.discard(entity)
+                self._states[key] = entity.get_state()
+                continue
+
+            if not world.has_thing(entity):
+                self._removed.add(key)
+                continue
+
+            if isinstance(entity, DynamicEntity):
+                # Entities which have moved into another chunk now belong to that chunk
+                home = self.get_chunk(entity.get_position()[0])
+                if home != index:
+                    del self._chunk_keys[index][key]
+                    self._chunk_keys[home][key] = None
+
+                    if home in self._loaded:
+                        self._loaded[home][key] = entity
+                        continue
+
+            self._states[key] = entity.get_state()
+
+            if isinstance(entity, Block):
+                blocks.append(entity)
+            elif isinstance(entity, DroppedItem):
+                world.remove_item(entity)
+            elif isinstance(entity, Mob):
+                world.remove_mob(entity)
+            else:
+                world.remove_thing(entity)
+
+        world.remove_blocks(blocks)
+
+
+class ReloadableLevel:
+    """A level whose world is updated in place when its level file changes.
+
+    The entity built in each cell of the level is remembered, so that when the level
+    file changes, only the cells which differ between the old and new levels are
+    built again. Everything else in the world, including the player and the state
+    of the entities which did not change, is left as it was.
+    """
+
+    def __init__(self, builder: WorldBuilder, filename: str, *args):
+        """Build the world of a level file.
+
+        The world is built in the same way as by load_world.
+
+        Parameters:
+            builder (WorldBuilder): The builder to build the level's entities with,
+                                    which may be cleared once the level is constructed.
+            filename (str): The level file.
+            *args: Any additional arguments, passed to the builder for every entity.
+        """
+        self._builder = builder
+        self._filename = filename
+        self._args = args
+        self._level = load_compiled_level(filename)
+
+        builder.add_entities(self._level.entities, *args)
+        self._world = world = builder.create_world()
+        world.defer_blocks()
+
+        # The entity built in each cell, by (x, y) cell
+        self._built = {}
+        for entity in builder.get_entities():
+            built = builder.build_entity(world, entity)
+            if built is not None:
+                self._built[entity[1], entity[2]] = built
+
+        if builder.get_merged_blocks():
+            world.merge_blocks(builder.get_merged_blocks())
+        world.add_deferred_blocks()
+
+    def get_world(self) -> World:
+        """(World) Returns the world of the level."""
+        return self._world
+
+    def reload(self) -> Optional[List[Tuple[int, int]]]:
+        """Updates the world to match the level file, rebuilding only the cells which changed.
+
+        Entities of changed cells which are still in the world are removed, wherever
+        they have moved to, and the entities of the new level are built in their place.
+
+        Returns:
+            (list<tuple<int, int>>): The (x, y) cells which changed, or None if the level
+                                     changed size, or would build a world of another size,
+                                     and must be built again instead.
+        """
+        level = load_compiled_level(self._filename)
+        if (level.columns, level.rows) != (self._level.columns, self._level.rows):
+            return None
+
+        # The world is sized by its entities rather than by the level's columns and rows,
+        # so the new level's entities may reach outside the world even at the same size
+        size = _world_size(level.entities, self._builder.get_block_size())
+        if size != self._world.get_grid_size():
+            return None
+
+        old_rows, new_rows = _grid_rows(self._level), _grid_rows(level)
+        changes = []
+        for y, (old_row, new_row) in enumerate(zip(old_rows, new_rows)):
+            if old_row != new_row:
+                changes.extend((x, y, entity_id) for x, (old_id, entity_id) in enumerate(zip(old_row, new_row))
+                               if old_id != entity_id)
+        self._level = level
+
+        world = self._world
+        blocks = []
+        for x, y, _ in changes:
+            entity = self._built.pop((x, y), None)
+            if entity is None or not world.has_thing(entity):
+                continue
+
+            if isinstance(entity, Block):
+                blocks.append(entity)
+            elif isinstance(entity, DroppedItem):
+                world.remove_item(entity)
+            elif isinstance(entity, Mob):
+                world.remove_mob(entity)
+            else:
+                world.remove_thing(entity)
+        world.remove_blocks(blocks)
+
+        world.defer_blocks()
+        for x, y, entity_id in changes:
+            if entity_id == " ":
+                continue
+
+            entity = self._builder.build_entity(world, (entity_id, x, y, self._args))
+            if entity is not None:
+                self._built[x, y] = entity
+
+        merged_blocks = self._builder.get_merged_blocks()
+        if merged_blocks:
+            world.merge_blocks(merged_blocks)
+        world.add_deferred_blocks()
+
+        return [(x, y) for x, y, _ in changes]
+
+
+def _world_size(entities: Iterable[Tuple[str, int, int]], block_size: int) -> Tuple[int, int]:
+    """(tuple<int, int>) Returns the grid size of the world an empty builder would create
+    for the given (entity_id, x, y) entities, see WorldBuilder.add_entities"""
+    width = height = 0
+    half_block = block_size // 2
+    for _, x, y in entities:
+        if x >= width:
+            width = x + half_block
+        if y >= height:
+            height = y + half_block
+    return width, height
+
+
+def _grid_rows(level: CompiledLevel) -> List[str]:
+    """(list<str>) Returns each row of a compiled level as the entity id in each cell, or a space"""
+    ids = {0: " "}
+    ids.update((index + 1, entity_id) for index, entity_id in enumerate(level.palette))
+    cells = level.grid.decode('latin-1').translate(ids)
+    return [cells[row * level.columns:(row + 1) * level.columns] for row in range(level.rows)]
+
+
+class LevelPrefetcher:
+    """Builds the worlds of levels on a background thread, ahead of them being played.
+
+    Each prefetched world is built by its own world builder, so it can be built
+    while the game steps the current world. A prefetched world is only played once,
+    so it is forgotten when it is taken.
+    """
+
+    def __init__(self, create_builder: Callable[[], WorldBuilder]):
+        """Constructor
+
+        Parameters:
+            create_builder (Callable<> -> WorldBuilder): Creates a world builder for a level
+        """
+        self._create_builder = create_builder
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+
+        # The world of each prefetched level, which may still be being built, by level
+        self._worlds: Dict[str, Future] = {}
+
+    def _build(self, filename: str) -> World:
+        """(World) Builds the world of a level with a new world builder"""
+        return load_world(self._create_builder(), filename)
+
+    def prefetch(self, filenames: Iterable[str]):
+        """Build the worlds of the given levels, in order, forgetting any other prefetched levels
+
+        Parameters:
+            filenames (iterable<str>): The level files which may be played next.
+        """
+        worlds = {}
+        for filename in filenames:
+            world = self._worlds.pop(filename, None)
+            worlds[filename] = world if world is not None else self._executor.submit(self._build, filename)
+
+        for world in self._worlds.values():
+            world.cancel()
+        self._worlds = worlds
+
+    def take(self, filename: str) -> Optional[World]:
+        """Returns the prefetched world of a level, waiting for it to be built if need be
+
+        Parameters:
+            filename (str): The level file.
+
+        Returns:
+            (World): The world, or None if the level was not prefetched or could not be built.
+                     A level which could not be built raises its error when built again.
+        """
+        world = self._worlds.pop(filename, None)
+        if world is None or world.cancelled():
+            return None
+
+        try:
+            return world.result()
+        except Exception:
+            return None
+
+    def shutdown(self):
+        """Forget the prefetched levels and stop the background thread"""
+        for world in self._worlds.values():
+            world.cancel()
+        self._worlds = {}
+        self._executor.shutdown(wait=False)
+
+
+class LevelTemplates:
+    """Keeps the world of each level built once, as a template, and hands out the template
+    restored to how it was built each time the level is played.
+
+    Restoring a world from a snapshot is much cheaper than building it again from the
+    level file, see World.restore. The same world is handed out each time a level is
+    played, so only one game may play a level at a time, e.g. the games of a batch run
+    one after another in each process.
+    """
+
+    def __init__(self, create_builder: Callable[[], WorldBuilder]):
+        """Constructor
+
+        Parameters:
+            create_builder (Callable<> -> WorldBuilder): Creates a world builder for a level
+        """
+        self._create_builder = create_builder
+
+        # The template world of each level and the snapshot of it as it was built, by level
+        self._templates: Dict[str, Tuple[World, dict]] = {}
+
+    def take(self, filename: str) -> World:
+        """Returns the world of a level as it was built, building it the first time
+        the level is taken
+
+        Parameters:
+            filename (str): The level file.
+
+        Returns:
+            (World): The template world of the level, which the game last given it
+                     must no longer use.
+        """
+        template = self._templates.get(filename)
+        if template is None:
+            world = load_world(self._create_builder(), filename)
+            self._templates[filename] = world, world.snapshot()
+            return world
+
+        world, snapshot = template
+        world.restore(snapshot)
+        return world
+
+    def clear(self):
+        """Forget the template of every level"""
+        self._templates.clear()
@@ -59,5 +59,19 @@ class Player(DynamicEntity):
         """Retrieves the health of the player during invincibility"""
         return self._invincibility_health
 
+    def get_state(self) -> dict:
+        state = super().get_state()
+        state.update(score=self._score, invincible=self._invincible,
+                     invincibility_time=self._invincibility_time,
+                     invincibility_health=self._invincibility_health)
+        return state
+
+    def set_state(self, state: dict):
+        super().set_state(state)
+        self._score = state["score"]
+        self._invincible = state["invincible"]
+        self._invincibility_time = state["invincibility_time"]
+        self._invincibility_health = state["invincibility_health"]
+
     def __repr__(self):
         return f"Player({self._name!r})"
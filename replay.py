@@ -0,0 +1,285 @@
+"""
+Recording and replaying of games of Mario.
+
+A replay holds the seed the game was played with, the config and start level,
+and every input to the game along with the tick it happened before. Replaying
+these inputs headless reproduces the game exactly, which is verified against
+digests of the world state recorded every CHECKPOINT_INTERVAL ticks.
+
+Usage:
+    python replay.py game.replay
+"""
+
+__version__ = "1.1.0"
+
+import hashlib
+import json
+import struct
+import sys
+from typing import List, NamedTuple, Tuple
+
+from config import config_from_dict
+
+# Replay file header: magic, version, seed, config length, start level length
+MAGIC = b"MREP"
+VERSION = 1
+HEADER = struct.Struct("<4sBQIH")
+# An input: tick, event code
+EVENT = struct.Struct("<IB")
+# A level name payload length
+NAME = struct.Struct("<H")
+# A state digest: tick, digest
+CHECKPOINT = struct.Struct("<I8s")
+COUNT = struct.Struct("<I")
+
+# The number of ticks between state digests
+CHECKPOINT_INTERVAL = 50
+
+# Event codes for key presses, in the order of KEYS
+KEYS = ('w', 'Up', 'space', 'a', 'Left', 's', 'Down', 'd', 'Right')
+KEY_CODES = {key: code for code, key in enumerate(KEYS)}
+
+# Event codes for changes of level made through popups
+RESTART_LEVEL = 32
+NEXT_LEVEL = 33
+LOAD_LEVEL = 34
+
+
+class ReplayEvent(NamedTuple):
+    """An input made before a tick of the game"""
+    tick: int
+    code: int
+    level: str = None
+
+
+class Replay(NamedTuple):
+    """A recorded game"""
+    seed: int
+    config: dict
+    level: str
+    events: List[ReplayEvent]
+    checkpoints: List[Tuple[int, bytes]]
+
+
+def state_digest(world, player) -> bytes:
+    """Returns a digest of the state of a world, which differs if any moving thing differs
+
+    Parameters:
+        world (World): The world to digest
+        player (Player): The player in the world
+
+    Returns:
+        (bytes): An 8 byte digest
+    """
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(struct.pack("<ddi", player.get_health(), player.get_score(),
+                              len(world.get_space().shapes)))
+
+    for shape in world.get_space().shapes:
+        body = shape.body
+        if body.body_type != body.STATIC:
+            digest.update(struct.pack("<4d", *body.position, *body.velocity))
+
+    return digest.digest()
+
+
+class ReplayRecorder:
+    """Records the inputs to a game, to be written to a replay file"""
+
+    def __init__(self, seed: int, config: dict, level: str):
+        """Construct a new recorder for a game which has just started.
+
+        Parameters:
+            seed (int): The seed of the game's random number generator
+            config (dict): The parsed config file of the game, see Config.to_dict
+            level (str): The level the game started on
+        """
+        self._seed = seed
+        self._config = config
+        self._level = level
+        self._events = []
+        self._checkpoints = []
+
+    def record_key(self, tick: int, key: str):
+        """Records a key being pressed before the given tick"""
+        if key in KEY_CODES:
+            self._events.append(ReplayEvent(tick, KEY_CODES[key]))
+
+    def record_level(self, tick: int, code: int, level: str = None):
+        """Records a change of level before the given tick
+
+        Parameters:
+            tick (int): The tick the change happened before
+            code (int): One of RESTART_LEVEL, NEXT_LEVEL or LOAD_LEVEL
+            level (str): The level loaded, for LOAD_LEVEL
+        """
+        self._events.append(ReplayEvent(tick, code, level))
+
+    def checkpoint(self, tick: int, world, player):
+        """Records a digest of the world state after the given tick, every CHECKPOINT_INTERVAL ticks"""
+        if tick % CHECKPOINT_INTERVAL == 0:
+            self._checkpoints.append((tick, state_digest(world, player)))
+
+    def get_replay(self) -> Replay:
+        """(Replay) Returns the game recorded so far"""
+        return Replay(self._seed, self._config, self._level, list(self._events), list(self._checkpoints))
+
+    def save(self, filename: str):
+        """Writes the game recorded so far to a replay file"""
+        save_replay(self.get_replay(), filename)
+
+
+def save_replay(replay: Replay, filename: str):
+    """Writes a replay to a file.
+
+    Parameters:
+        replay (Replay): The replay to write.
+        filename (str): The name of the replay file to write.
+    """
+    config = json.dumps(replay.config).encode()
+    level = replay.level.encode()
+
+    parts = [HEADER.pack(MAGIC, VERSION, replay.seed, len(config), len(level)), config, level,
+             COUNT.pack(len(replay.events))]
+    for event in replay.events:
+        parts.append(EVENT.pack(event.tick, event.code))
+        if event.code == LOAD_LEVEL:
+            name = event.level.encode()
+            parts.append(NAME.pack(len(name)))
+            parts.append(name)
+
+    parts.append(COUNT.pack(len(replay.checkpoints)))
+    for tick, digest in replay.checkpoints:
+        parts.append(CHECKPOINT.pack(tick, digest))
+
+    with open(filename, 'wb') as file:
+        file.write(b"".join(parts))
+
+
+def load_replay(filename: str) -> Replay:
+    """Reads a replay from a file.
+
+    Parameters:
+        filename (str): The name of the replay file to read.
+
+    Returns:
+        (Replay): The replay in the file.
+
+    Raises:
+        ValueError: If the file is not a replay file of a supported version.
+    """
+    with open(filename, 'rb') as file:
+        data = file.read()
+
+    magic, version, seed, config_length, level_length = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{filename} is not a version {VERSION} replay file")
+
+    offset = HEADER.size
+    config = json.loads(data[offset:offset + config_length].decode())
+    offset += config_length
+    level = data[offset:offset + level_length].decode()
+    offset += level_length
+
+    events = []
+    count, = COUNT.unpack_from(data, offset)
+    offset += COUNT.size
+    for _ in range(count):
+        tick, code = EVENT.unpack_from(data, offset)
+        offset += EVENT.size
+
+        name = None
+        if code == LOAD_LEVEL:
+            length, = NAME.unpack_from(data, offset)
+            offset += NAME.size
+            name = data[offset:offset + length].decode()
+            offset += length
+
+        events.append(ReplayEvent(tick, code, name))
+
+    checkpoints = []
+    count, = COUNT.unpack_from(data, offset)
+    offset += COUNT.size
+    for _ in range(count):
+        checkpoints.append(CHECKPOINT.unpack_from(data, offset))
+        offset += CHECKPOINT.size
+
+    return Replay(seed, config, level, events, checkpoints)
+
+
+def play_replay(replay: Replay) -> dict:
+    """Replays a recorded game headless, verifying the world state at every checkpoint.
+
+    Returns:
+        (dict): The summary of the replayed game, see HeadlessGame.get_summary,
+                with the first tick at which the world state differed from the recording
+                under 'diverged', or None if the replay matched throughout.
+    """
+    # Imported here as the app imports this module to record games
+    from headless import HeadlessGame
+
+    class ReplayGame(HeadlessGame):
+        """A headless game whose popups are answered by the recorded events"""
+
+        def health(self):
+            """Pauses the game once it is lost, until the level is restarted"""
+            if self.is_game_lost():
+                self._game_status = True
+
+        def player_name(self):
+            """The popup to move on to the next level is answered by a recorded event"""
+            pass
+
+    game = ReplayGame(config_from_dict(replay.config), level=replay.level, seed=replay.seed)
+    actions = {
+        RESTART_LEVEL: lambda event: game.reset_level(),
+        NEXT_LEVEL: lambda event: game.next_level(),
+        LOAD_LEVEL: lambda event: game.load_level(event.level),
+    }
+
+    events = iter(replay.events)
+    pending = next(events, None)
+    checkpoints = iter(replay.checkpoints)
+    checkpoint = next(checkpoints, None)
+    diverged = None
+
+    while pending is not None or checkpoint is not None:
+        while pending is not None and pending.tick <= game.get_ticks():
+            if pending.code in actions:
+                actions[pending.code](pending)
+            else:
+                game.press(KEYS[pending.code])
+            pending = next(events, None)
+
+        # A paused game only resumes through a recorded event
+        if game.get_result() is not None or (game.is_paused() and
+                                             (pending is None or pending.tick > game.get_ticks())):
+            break
+
+        game.tick()
+        game.health()
+
+        if checkpoint is not None and checkpoint[0] == game.get_ticks():
+            if checkpoint[1] != state_digest(game.get_world(), game.get_player()) and diverged is None:
+                diverged = checkpoint[0]
+            checkpoint = next(checkpoints, None)
+
+    summary = game.get_summary()
+    summary["diverged"] = diverged
+    return summary
+
+
+def main(args=None):
+    """Replay a recorded game from the command line and print its summary as JSON"""
+    args = sys.argv[1:] if args is None else args
+    if len(args) != 1:
+        print("Usage: python replay.py <replay file>")
+        return 2
+
+    summary = play_replay(load_replay(args[0]))
+    print(json.dumps(summary))
+    return 0 if summary["diverged"] is None else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
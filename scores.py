@@ -0,0 +1,191 @@
+"""
+High scores of each level, kept in an append-only log per level.
+
+Each level's log, high_scores_<level>, holds one name:score line per score saved.
+A later score for a name replaces its earlier one. New scores are appended
+rather than the whole file being rewritten. Once the log has grown well past
+the number of names in it, it is compacted: it is rewritten atomically with one
+line per name.
+
+Each level's log is read once, the first time its scores are needed. After
+that the top scores are kept up to date as scores are added, so the leaderboard
+is returned without sorting every score.
+"""
+
+__version__ = "1.1.0"
+
+import bisect
+import heapq
+import os
+from typing import Dict, Iterable, List, Tuple
+
+from game.util import write_atomic
+
+# The number of scores on a leaderboard
+TOP_SCORES = 10
+
+# The start of the file name of each level's log, which is followed by the level
+HIGH_SCORES_PREFIX = "high_scores_"
+
+# A log is compacted once it has more than COMPACT_RATIO lines per name in it,
+# and at least COMPACT_MIN_LINES lines
+COMPACT_RATIO = 2
+COMPACT_MIN_LINES = 64
+
+
+def high_scores_path(directory: str, level: str) -> str:
+    """(str) Returns the path of the log of high scores of a level"""
+    return os.path.join(directory, HIGH_SCORES_PREFIX + level)
+
+
+def _clean_name(name: str) -> str:
+    """(str) Returns a name which can be written as a single line of a log"""
+    return " ".join(name.splitlines())
+
+
+class LevelScores:
+    """The high scores of a single level, backed by its log.
+
+    Scores which tie are ranked in the order their names were first saved.
+    """
+
+    def __init__(self, filename: str, top: int = TOP_SCORES):
+        """Read the log of high scores, if there is one.
+
+        Lines which cannot be read, e.g. a line cut short by the game being
+        closed while it was written, are skipped.
+
+        Parameters:
+            filename (str): The path of the log.
+            top (int): The number of scores on the leaderboard.
+        """
+        self._filename = filename
+        self._top_count = top
+
+        # The score of each name and the order the name was first saved in, by name
+        self._scores: Dict[str, Tuple[int, int]] = {}
+        # The lines in the log, including those of scores since replaced
+        self._lines = 0
+        # Whether the last line of the log was cut short, so must be ended before appending
+        self._torn = False
+
+        try:
+            with open(filename, 'r', encoding='utf-8') as file:
+                for line in file:
+                    if not line.endswith("\n"):
+                        self._torn = True
+                        continue
+
+                    name, _, score = line[:-1].rpartition(":")
+                    try:
+                        self._set_score(name, int(score))
+                    except ValueError:
+                        continue
+                    self._lines += 1
+        except FileNotFoundError:
+            pass
+
+        # The names with the highest scores, ranked from highest to lowest
+        self._top: List[str] = []
+        self._rank_top()
+
+    def _set_score(self, name: str, score: int):
+        """Set the score of a name, keeping its place among names with equal scores"""
+        current = self._scores.get(name)
+        order = len(self._scores) if current is None else current[1]
+        self._scores[name] = (score, order)
+
+    def _rank_key(self, name: str) -> Tuple[int, int]:
+        """(tuple<int, int>) Returns the key names are ranked by, lowest first"""
+        score, order = self._scores[name]
+        return -score, order
+
+    def _rank_top(self):
+        """Rank the top scores from all of the scores"""
+        self._top = heapq.nsmallest(self._top_count, self._scores, key=self._rank_key)
+
+    def add_score(self, name: str, score: int):
+        """Save a score, replacing the earlier score of the same name
+
+        Parameters:
+            name (str): The name of the player.
+            score (int): The player's score.
+        """
+        name = _clean_name(name)
+        current = self._scores.get(name)
+        self._set_score(name, score)
+
+        with open(self._filename, 'a', encoding='utf-8') as file:
+            file.write(("\n" if self._torn else "") + f"{name}:{score}\n")
+        self._torn = False
+        self._lines += 1
+
+        if name in self._top and score < current[0]:
+            # A name lower down may now be in the top scores instead
+            self._rank_top()
+        else:
+            if name in self._top:
+                self._top.remove(name)
+            keys = [self._rank_key(top) for top in self._top]
+            self._top.insert(bisect.bisect(keys, self._rank_key(name)), name)
+            del self._top[self._top_count:]
+
+        if self._lines > max(COMPACT_RATIO * len(self._scores), COMPACT_MIN_LINES):
+            self.compact()
+
+    def compact(self):
+        """Rewrite the log with a single line for each name"""
+        write_atomic(self._filename, "".join(f"{name}:{score}\n" for name, (score, _)
+                                              in self._scores.items()).encode('utf-8'))
+        self._lines = len(self._scores)
+
+    def get_score(self, name: str) -> int:
+        """(int) Returns the score of a name, or None if it has not been saved"""
+        score = self._scores.get(name)
+        return None if score is None else score[0]
+
+    def get_scores(self) -> Dict[str, int]:
+        """(dict<str: int>) Returns the score of every name, in the order the names were first saved"""
+        return {name: score for name, (score, _) in self._scores.items()}
+
+    def get_leaderboard(self) -> List[Tuple[str, int]]:
+        """(list<tuple<str, int>>) Returns the (name, score) of the top scores, highest first"""
+        return [(name, self._scores[name][0]) for name in self._top]
+
+
+class ScoreStore:
+    """The high scores of every level, each read the first time it is needed"""
+
+    def __init__(self, directory: str = ".", top: int = TOP_SCORES):
+        """Constructor
+
+        Parameters:
+            directory (str): The directory the logs of high scores are kept in.
+            top (int): The number of scores on each leaderboard.
+        """
+        self._directory = directory
+        self._top = top
+        self._levels: Dict[str, LevelScores] = {}
+
+    def get_level(self, level: str) -> LevelScores:
+        """(LevelScores) Returns the high scores of a level"""
+        scores = self._levels.get(level)
+        if scores is None:
+            scores = self._levels[level] = LevelScores(high_scores_path(self._directory, level), self._top)
+        return scores
+
+    def add_score(self, level: str, name: str, score: int):
+        """Save a score for a level, see LevelScores.add_score"""
+        self.get_level(level).add_score(name, score)
+
+    def add_scores(self, scores: Iterable[Tuple[str, str, int]]):
+        """Save the (level, name, score) of many scores, in order"""
+        for level, name, score in scores:
+            self.add_score(level, name, score)
+
+    def get_leaderboard(self, level: str) -> List[Tuple[str, int]]:
+        """(list<tuple<str, int>>) Returns the (name, score) of the top scores of a level, highest first"""
+        return self.get_level(level).get_leaderboard()
+
+    def close(self):
+        """Does nothing, as each log is only open while it is written to"""
@@ -0,0 +1,246 @@
+"""Sprites of the game, baked from the image files and the frames of the sprite
+sheets into a single cached atlas image.
+"""
+
+__version__ = "1.1.0"
+
+import io
+import json
+import os
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+from PIL import Image, ImageTk
+
+from game.util import write_atomic
+
+IMAGES_DIR = "images"
+SHEETS_DIR = "spritesheets"
+
+# The directory in which the baked atlas is cached, next to the images directory
+SPRITE_CACHE_DIR = "__spritecache__"
+ATLAS_IMAGE = "atlas.png"
+ATLAS_INDEX = "atlas.json"
+ATLAS_VERSION = 1
+
+# The width of the atlas, in pixels, which sprites are packed into in rows
+ATLAS_WIDTH = 512
+
+# The extensions of image files, in order of preference for images with more than one
+IMAGE_EXTENSIONS = (".png", ".gif")
+
+
+class Frame(NamedTuple):
+    """A frame cut out of a sprite sheet.
+
+    The box is the (left, top, right, bottom) of the frame within the sheet, and
+    flipped frames are mirrored left to right.
+    """
+    sheet: str
+    box: Tuple[int, int, int, int]
+    flipped: bool = False
+
+
+def strip(sheet: str, name: str, positions: Iterable[Tuple[int, int]], size: int = 15,
+          flipped: bool = False) -> Dict[str, Frame]:
+    """Describe square frames of a sprite sheet, named by number from one.
+
+    Parameters:
+        sheet (str): The file name of the sprite sheet.
+        name (str): The name of the frames, which is followed by the frame number.
+        positions (iterable<tuple<int, int>>): The (x, y) top left corner of each frame.
+        size (int): The width and height of the frames.
+        flipped (bool): Whether to mirror the frames left to right.
+
+    Returns:
+        (dict<str: Frame>): The frames, by name.
+    """
+    return {f"{name}{number}": Frame(sheet, (x, y, x + size, y + size), flipped)
+            for number, (x, y) in enumerate(positions, start=1)}
+
+
+# Mario runs in frames 1-3 and Luigi in frames 4-6
+RUNNING_POSITIONS = [(97, 34), (114, 34), (131, 34), (97, 99), (114, 99), (131, 99)]
+
+# The frames of the sprite sheets, by the name they are drawn by
+SHEET_FRAMES = {
+    **strip("characters.png", "character/running", RUNNING_POSITIONS),
+    **strip("characters.png", "character/back_running", RUNNING_POSITIONS, flipped=True),
+    **strip("characters.png", "character/jumping", [(165, 34), (165, 99)]),
+    **strip("items.png", "coin/coin", [(0, 112), (15, 112), (30, 112), (45, 112)]),
+    **strip("enemies.png", "mushroom_mob/walking", [(0, 15), (15, 15)]),
+}
+
+
+def image_files(directory: str) -> Dict[str, str]:
+    """(dict<str: str>) Returns the path of each image in a directory, by its name
+    without an extension, preferring the extensions earlier in IMAGE_EXTENSIONS"""
+    files = {}
+    for file in sorted(os.listdir(directory)):
+        name, extension = os.path.splitext(file)
+        if extension not in IMAGE_EXTENSIONS:
+            continue
+
+        current = files.get(name)
+        if current is None or IMAGE_EXTENSIONS.index(extension) < \
+                IMAGE_EXTENSIONS.index(os.path.splitext(current)[1]):
+            files[name] = os.path.join(directory, file)
+
+    return files
+
+
+def bake_atlas(images: Dict[str, str], frames: Dict[str, Frame],
+               sheets_dir: str = SHEETS_DIR) -> Tuple[Image.Image, Dict[str, Tuple[int, int, int, int]]]:
+    """Bake images and sprite sheet frames into a single atlas image.
+
+    Sprites are packed into rows of the atlas from tallest to shortest.
+
+    Parameters:
+        images (dict<str: str>): The path of each image file, by name.
+        frames (dict<str: Frame>): The frames of the sprite sheets, by name.
+        sheets_dir (str): The directory of the sprite sheets.
+
+    Returns:
+        (tuple<Image, dict<str: tuple<int, int, int, int>>>):
+            The atlas, and the (left, top, right, bottom) box of each sprite in it.
+    """
+    sprites = {}
+    for name, path in images.items():
+        with Image.open(path) as image:
+            sprites[name] = image.convert("RGBA")
+
+    sheets = {}
+    for name, frame in frames.items():
+        if frame.sheet not in sheets:
+            with Image.open(os.path.join(sheets_dir, frame.sheet)) as sheet:
+                sheets[frame.sheet] = sheet.convert("RGBA")
+
+        sprite = sheets[frame.sheet].crop(frame.box)
+        if frame.flipped:
+            sprite = sprite.transpose(Image.FLIP_LEFT_RIGHT)
+        sprites[name] = sprite
+
+    boxes = {}
+    x = y = row_height = 0
+    for name in sorted(sprites, key=lambda name: (-sprites[name].height, name)):
+        width, height = sprites[name].size
+        if x + width > ATLAS_WIDTH:
+            x, y, row_height = 0, y + row_height, 0
+
+        boxes[name] = (x, y, x + width, y + height)
+        x += width
+        row_height = max(row_height, height)
+
+    atlas = Image.new("RGBA", (ATLAS_WIDTH, max(y + row_height, 1)))
+    for name, box in boxes.items():
+        atlas.paste(sprites[name], box[:2])
+
+    return atlas, boxes
+
+
+def _source_key(filename: str) -> List[int]:
+    """(list<int, int>) Returns the modification time (ns) and size of a file"""
+    stat = os.stat(filename)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def load_atlas(directory: str = ".", frames: Dict[str, Frame] = None,
+               cache: bool = True) -> Tuple[Image.Image, Dict[str, Tuple[int, int, int, int]]]:
+    """Load the atlas of the game's sprites, from the cache where possible.
+
+    The cached atlas is used if every image file and sprite sheet has the same
+    modification time and size as when it was baked, and the frames are described
+    the same way. Otherwise the atlas is baked again and, if possible, cached.
+
+    Parameters:
+        directory (str): The directory containing the images and sprite sheets.
+        frames (dict<str: Frame>): The frames of the sprite sheets, defaults to SHEET_FRAMES.
+        cache (bool): Whether to read and write the cached atlas.
+
+    Returns:
+        (tuple<Image, dict<str: tuple<int, int, int, int>>>):
+            The atlas, and the (left, top, right, bottom) box of each sprite in it.
+    """
+    if frames is None:
+        frames = SHEET_FRAMES
+
+    images = image_files(os.path.join(directory, IMAGES_DIR))
+    sheets_dir = os.path.join(directory, SHEETS_DIR)
+    sources = sorted(set(images.values()) | {os.path.join(sheets_dir, frame.sheet) for frame in frames.values()})
+
+    key = {
+        "version": ATLAS_VERSION,
+        "sources": {os.path.relpath(path, directory): _source_key(path) for path in sources},
+        "frames": {name: [frame.sheet, list(frame.box), frame.flipped] for name, frame in frames.items()},
+    }
+
+    cache_dir = os.path.join(directory, SPRITE_CACHE_DIR)
+    if cache:
+        try:
+            with open(os.path.join(cache_dir, ATLAS_INDEX), 'r') as file:
+                index = json.load(file)
+            if index["key"] == key:
+                with Image.open(os.path.join(cache_dir, ATLAS_IMAGE)) as atlas:
+                    atlas.load()
+                return atlas, {name: tuple(box) for name, box in index["boxes"].items()}
+        except (OSError, ValueError, KeyError):
+            pass
+
+    atlas, boxes = bake_atlas(images, frames, sheets_dir)
+
+    if cache:
+        data = io.BytesIO()
+        atlas.save(data, format="PNG")
+        try:
+            # The index is written last, so it never describes an older atlas image
+            write_atomic(os.path.join(cache_dir, ATLAS_IMAGE), data.getvalue())
+            write_atomic(os.path.join(cache_dir, ATLAS_INDEX),
+                          json.dumps({"key": key, "boxes": boxes}).encode('utf-8'))
+        except OSError:
+            # The cache is only an optimisation, e.g. the game may be in a read-only directory
+            pass
+
+    return atlas, boxes
+
+
+class SpriteAtlas:
+    """The sprites of the game, which are loaded from the atlas all at once and
+    converted to images which can be drawn on a canvas as they are first needed.
+    """
+
+    def __init__(self, directory: str = ".", cache: bool = True):
+        """Load the atlas of sprites, see load_atlas.
+
+        Parameters:
+            directory (str): The directory containing the images and sprite sheets.
+            cache (bool): Whether to read and write the cached atlas.
+        """
+        self._atlas, self._boxes = load_atlas(directory, cache=cache)
+        self._images = {}
+
+    def has_sprite(self, name: str) -> bool:
+        """(bool) Returns whether there is a sprite with the given name"""
+        return name in self._boxes
+
+    def get_names(self) -> Tuple[str, ...]:
+        """(tuple<str, ...>) Returns the names of all of the sprites"""
+        return tuple(self._boxes)
+
+    def get_sprite(self, name: str) -> ImageTk.PhotoImage:
+        """Returns the image of a sprite, converting it the first time it is needed.
+
+        Parameters:
+            name (str): The name of the sprite, e.g. 'brick' or 'coin/coin1'.
+
+        Raises:
+            KeyError: If there is no sprite with the given name.
+        """
+        image = self._images.get(name)
+        if image is None:
+            image = self._images[name] = ImageTk.PhotoImage(self._atlas.crop(self._boxes[name]))
+        return image
+
+    def preload(self, names: Iterable[str]):
+        """Converts the images of sprites ahead of them being needed, ignoring unknown names"""
+        for name in names:
+            if name in self._boxes:
+                self.get_sprite(name)